@@ -0,0 +1,48 @@
+###################################################
+#
+# Name: tests/conftest.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Shared helpers of the tests: the package directory on sys.path, small
+# replay fixtures from tools/generate_fixtures.py and a runner for the
+# plugins as the monitoring would start them.
+#
+#   python3 -m pytest -q tests
+#
+###################################################
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LIBRARY = os.path.join(ROOT, "usr", "lib", "python3", "dist-packages")
+PLUGINS = os.path.join(ROOT, "usr", "lib", "nagios", "plugins")
+TOOLS = os.path.join(ROOT, "tools")
+
+sys.path.insert(0, LIBRARY)
+sys.path.insert(0, TOOLS)
+
+def getEnvironment(**variables):
+    # no collector, history or replay unless a test asks for it
+    env = dict(os.environ, PYTHONPATH=LIBRARY, NCM_COLLECTOR_SOCKET="", NCM_HISTORY_DIR="", NCM_REPLAY="", NCM_RECORD="")
+    env.update(variables)
+    return env
+
+def runPlugin(name, arguments, timeout=60, **variables):
+    # (exit code, output) of a plugin under usr/lib/nagios/plugins or a path
+    path = name if os.sep in name else os.path.join(PLUGINS, name)
+    process = subprocess.run([sys.executable, path] + arguments, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=getEnvironment(**variables), timeout=timeout)
+    return process.returncode, process.stdout.decode("utf-8", "replace")
+
+@pytest.fixture(scope="session")
+def fixtures(tmp_path_factory):
+    # a small cluster, enough for every category
+    directory = str(tmp_path_factory.mktemp("fixtures"))
+    subprocess.run([sys.executable, os.path.join(TOOLS, "generate_fixtures.py"), directory,
+        "--nodes", "4", "--vms", "40", "--local-vms", "12", "--osds", "24", "--log-lines", "2000",
+        "--datastores", "3", "--containers", "20", "--bbb-servers", "4"], check=True, stdout=subprocess.DEVNULL)
+    return directory
@@ -0,0 +1,104 @@
+###################################################
+#
+# Name: tests/test_agent.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Batch mode of ni-ncm-agent against tools/fake_ticket_server.py and
+# tools/fake_icinga2: the JSON report alone on stdout, permissions of the
+# bundles, failing inventory entries and bundles used with --certs.
+#
+###################################################
+
+import json
+import os
+import stat
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import fake_ticket_server
+from conftest import ROOT, TOOLS, getEnvironment
+
+AGENT = os.path.join(ROOT, "usr", "bin", "ni-ncm-agent")
+
+@pytest.fixture
+def ticketUrl():
+    server = fake_ticket_server.Server(("127.0.0.1", 0), fake_ticket_server.createHandler(0, False))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://127.0.0.1:" + str(server.server_address[1]) + "/tools/getTicket.php"
+    server.shutdown()
+    server.server_close()
+
+def runAgent(arguments):
+    # (exit code, stdout, stderr), stdout and stderr kept apart
+    process = subprocess.run([sys.executable, AGENT] + arguments, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        env=getEnvironment(NO_PROXY="*", no_proxy="*"), timeout=60)
+    return process.returncode, process.stdout.decode("utf-8"), process.stderr.decode("utf-8")
+
+def runBatch(tmp_path, ticketUrl, inventory, *arguments):
+    filename = tmp_path / "hosts.csv"
+    filename.write_text("name,parent,parent-address\n" + inventory)
+    return runAgent(["--inventory", str(filename), "--output-dir", str(tmp_path / "certs"), "--ticket-url", ticketUrl,
+        "--icinga2", os.path.join(TOOLS, "fake_icinga2"), "--workers", "4"] + list(arguments))
+
+def getMode(path):
+    return stat.S_IMODE(os.stat(str(path)).st_mode)
+
+def testReportAloneOnStdout(tmp_path, ticketUrl):
+    code, stdout, stderr = runBatch(tmp_path, ticketUrl, "web01,,\napp01,sat01,10.0.0.5\n")
+    assert code == 0, stderr
+    report = json.loads(stdout)
+    assert (report["hosts"], report["ok"], report["failed"]) == (2, 2, 0)
+    assert "Agent Installer" in stderr and "2 of 2 host(s) prepared" in stderr
+    with open(str(tmp_path / "certs" / "app01" / "endpoint.json"), "r") as f:
+        assert json.load(f) == {"name": "sat01", "address": "10.0.0.5", "port": "5665"}
+
+def testReportFile(tmp_path, ticketUrl):
+    code, stdout, stderr = runBatch(tmp_path, ticketUrl, "web01,,\n", "--report", str(tmp_path / "report.json"))
+    assert code == 0, stderr
+    assert stdout == ""
+    assert json.loads((tmp_path / "report.json").read_text())["ok"] == 1
+
+def testBundlePermissions(tmp_path, ticketUrl):
+    code, stdout, stderr = runBatch(tmp_path, ticketUrl, "web01,,\n")
+    assert code == 0, stderr
+    bundle = tmp_path / "certs" / "web01"
+    assert getMode(tmp_path / "certs") == 0o700
+    assert getMode(bundle) == 0o700
+    files = sorted(os.listdir(str(bundle)))
+    assert files == ["ca.crt", "endpoint.json", "name", "ticket", "trusted-master.crt", "web01.crt", "web01.key"]
+    assert all(getMode(bundle / filename) == 0o600 for filename in files)
+
+def testFailedHosts(tmp_path, ticketUrl):
+    inventory = "web01,,\nfail01,,\nbroken01,,\napp01,sat01,\n../etc,,\nweb01,,\n"
+    code, stdout, stderr = runBatch(tmp_path, ticketUrl, inventory)
+    assert code == 1
+    report = json.loads(stdout)
+    assert (report["hosts"], report["ok"], report["failed"]) == (6, 0, 6)
+    steps = [(result["name"], result["step"]) for result in report["results"]]
+    assert steps == [("web01", "inventory"), ("fail01", "ticket"), ("broken01", "pki"), ("app01", "inventory"), ("../etc", "inventory"), ("web01", "inventory")]
+    assert "[ERROR] fail01 (ticket): " in stderr
+    assert not os.path.exists(str(tmp_path / "etc"))
+
+def testCertsOfOtherHost(tmp_path, ticketUrl):
+    code, stdout, stderr = runBatch(tmp_path, ticketUrl, "web01,,\n")
+    assert code == 0, stderr
+    bundle = str(tmp_path / "certs" / "web01")
+    code, stdout, stderr = runAgent(["--name", "app01", "--certs", bundle, "--quiet", "--icinga2", os.path.join(TOOLS, "fake_icinga2")])
+    assert code == 1
+    assert "belongs to web01, not to app01" in stdout
+
+def testCertsIncomplete(tmp_path, ticketUrl):
+    code, stdout, stderr = runBatch(tmp_path, ticketUrl, "web01,,\n")
+    assert code == 0, stderr
+    bundle = tmp_path / "certs" / "web01"
+    os.unlink(str(bundle / "ca.crt"))
+    code, stdout, stderr = runAgent(["--name", "web01", "--certs", str(bundle), "--quiet"])
+    assert code == 1
+    assert "has no ca.crt" in stdout
+    code, stdout, stderr = runAgent(["--name", "web01", "--certs", str(tmp_path / "missing"), "--quiet"])
+    assert code == 1
+    assert "No valid certificate bundle" in stdout
@@ -0,0 +1,175 @@
+###################################################
+#
+# Name: tests/test_apcupsd.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# NIS client of ncm_plugin.apcupsd and check_usb_apc.py against
+# tools/fake_apcupsd.py: status parsing, answers in small pieces, cut
+# off and empty answers, unreachable ports and the apcaccess backend.
+#
+###################################################
+
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import pytest
+
+import fake_apcupsd
+from conftest import runPlugin
+from ncm_plugin import apcupsd
+
+def startServer(handler):
+    server = fake_apcupsd.Server(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+@pytest.fixture
+def ups():
+    # two UPS like "fake_apcupsd.py --port A --port B", the second on battery
+    servers = [startServer(fake_apcupsd.createHandler(index, 0, 0, False)) for index in range(2)]
+    yield ["127.0.0.1:" + str(server.server_address[1]) for server in servers]
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def createRawHandler(data, chunk):
+    # answers every request with data, chunk bytes per send
+    class RawHandler(socketserver.BaseRequestHandler):
+        def handle(self):
+            header = self.request.recv(2)
+            self.request.recv(struct.unpack(">H", header)[0])
+            for offset in range(0, len(data), chunk):
+                self.request.sendall(data[offset:offset + chunk])
+                time.sleep(0.001)
+    return RawHandler
+
+def encode(lines):
+    return b"".join(struct.pack(">H", len(line)) + line.encode() for line in lines) + struct.pack(">H", 0)
+
+def getFreePort():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def testParseStatus(ups):
+    host, port = apcupsd.parseHost(ups[0])
+    status = apcupsd.getStatus(host, port, 5)
+    assert status["STATUS"] == "ONLINE"
+    assert status["LINEV"] == "231.0 Volts"
+    assert status["UPSNAME"] == "ups01"
+    # "END APC" ends the record, the time in it contains colons as well
+    assert status["END APC"].count(":") == 2
+    assert apcupsd.parseStatus(["no separator", "KEY:  value with: colon "]) == {"KEY": "value with: colon"}
+
+def testParseHost():
+    assert apcupsd.parseHost("ups01") == ("ups01", 3551)
+    assert apcupsd.parseHost("ups01:3552") == ("ups01", 3552)
+    assert apcupsd.parseHost("[::1]:3553") == ("::1", 3553)
+    assert apcupsd.parseHost("[::1]") == ("::1", 3551)
+
+def testShortReads():
+    lines = fake_apcupsd.getRecord(0, 0)
+    server = startServer(createRawHandler(encode(lines), 1))
+    try:
+        status = apcupsd.getStatus("127.0.0.1", server.server_address[1], 5)
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert status == apcupsd.parseStatus(lines)
+
+@pytest.mark.parametrize("data", [
+    # cut off inside a line, inside a length header, before the end marker
+    encode(fake_apcupsd.getRecord(0, 0))[:50],
+    encode(fake_apcupsd.getRecord(0, 0))[:1],
+    encode(fake_apcupsd.getRecord(0, 0))[:-2],
+])
+def testConnectionClosedEarly(data):
+    server = startServer(createRawHandler(data, 7))
+    try:
+        with pytest.raises(ConnectionError):
+            apcupsd.getStatus("127.0.0.1", server.server_address[1], 5)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def testEmptyRecord():
+    server = startServer(createRawHandler(struct.pack(">H", 0), 2))
+    try:
+        with pytest.raises(ValueError):
+            apcupsd.getStatus("127.0.0.1", server.server_address[1], 5)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def testUnreachablePort():
+    with pytest.raises(ConnectionRefusedError):
+        apcupsd.getStatus("127.0.0.1", getFreePort(), 2)
+    code, message = runPlugin("check_usb_apc.py", ["-i", "STATUS", "-H", "127.0.0.1:" + str(getFreePort()), "--backend", "nis", "--cache-ttl", "0"])
+    assert code == 3
+    assert "apcupsd is running" in message
+
+def testSingleFieldOutput(ups):
+    code, message = runPlugin("check_usb_apc.py", ["-i", "LOADPCT", "-w", "80", "-c", "90", "-p", "-H", ups[0], "--cache-ttl", "0"])
+    assert (code, message) == (0, "OK - Value = 27.0 Percent | loadpct=27.0;80;90\n")
+
+def testSeveralUps(ups):
+    unreachable = "127.0.0.1:" + str(getFreePort())
+    code, message = runPlugin("check_usb_apc.py", ["-i", "STATUS,BCHARGE", "--threshold", "BCHARGE=50,20", "-H", ups[0], "-H", ups[1], "-H", unreachable, "--cache-ttl", "0"])
+    # WARNING of the battery outranks UNKNOWN of the unreachable UPS
+    assert code == 1, message
+    assert "[WARNING] " + ups[1] + " BCHARGE = 42.0 Percent" in message
+    assert unreachable + " not reachable: ConnectionRefusedError" in message
+
+def testCacheSharedBetweenChecks(tmp_path):
+    queries = []
+
+    class CountingHandler(fake_apcupsd.createHandler(0, 0, 0, False)):
+        def handle(self):
+            queries.append(1)
+            super().handle()
+
+    server = startServer(CountingHandler)
+    host = "127.0.0.1:" + str(server.server_address[1])
+    try:
+        for field in ["STATUS", "LINEV", "LOADPCT"]:
+            code, message = runPlugin("check_usb_apc.py", ["-i", field, "-H", host, "--cache-dir", str(tmp_path), "--cache-ttl", "60"])
+            assert code == 0, message
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert len(queries) == 1
+
+@pytest.fixture
+def apcaccess(tmp_path):
+    # answers "apcaccess -p FIELD" like apcaccess of the first fake UPS
+    values = apcupsd.parseStatus(line.rstrip("\n") for line in fake_apcupsd.getRecord(0, 0))
+    script = tmp_path / "apcaccess"
+    script.write_text("#!/bin/sh\ncase \"$2\" in\n" + "".join("  " + key + ") echo '" + value + "' ;;\n" for key, value in values.items() if " " not in key) + "  *) exit 1 ;;\nesac\n")
+    script.chmod(0o755)
+    return str(script)
+
+def testApcaccessBackend(apcaccess):
+    code, message = runPlugin("check_usb_apc.py", ["-i", "STATUS,LINEV", "--backend", "apcaccess", "--apcaccess", apcaccess])
+    assert code == 0, message
+    assert "STATUS = ONLINE" in message and "LINEV = 231.0 Volts" in message
+    code, message = runPlugin("check_usb_apc.py", ["-i", "BCHARGE", "-w", "50", "-c", "20", "-r", "--backend", "apcaccess", "--apcaccess", apcaccess])
+    assert (code, message) == (0, "OK - Value = 100.0 Percent\n")
+
+def testApcaccessFallback(apcaccess):
+    # auto only falls back for the local apcupsd on the default port
+    with socket.socket() as sock:
+        if sock.connect_ex(("127.0.0.1", apcupsd.PORT)) == 0:
+            pytest.skip("apcupsd is running here")
+    code, message = runPlugin("check_usb_apc.py", ["-i", "STATUS", "--apcaccess", apcaccess, "--cache-ttl", "0"])
+    assert (code, message) == (0, "OK - Value = ONLINE\n")
+
+def testApcaccessFails(tmp_path):
+    script = tmp_path / "apcaccess"
+    script.write_text("#!/bin/sh\necho 'Error contacting host localhost port 3551: Connection refused' >&2\nexit 1\n")
+    script.chmod(0o755)
+    code, message = runPlugin("check_usb_apc.py", ["-i", "STATUS", "--backend", "apcaccess", "--apcaccess", str(script)])
+    assert code == 3
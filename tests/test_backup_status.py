@@ -0,0 +1,141 @@
+###################################################
+#
+# Name: tests/test_backup_status.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# backup-status of check_proxmox.py: intervals of calendar events, the
+# guests of a job (all with exclude, pool, vmid list, node) and the
+# verdict per guest with replayed jobs and tasks.
+#
+###################################################
+
+import importlib.util
+import json
+import os
+import shutil
+
+import pytest
+
+import fake_pveproxy
+from conftest import PLUGINS, runPlugin
+from ncm_plugin import replay
+
+def loadPlugin():
+    spec = importlib.util.spec_from_file_location("check_proxmox", os.path.join(PLUGINS, "check_proxmox.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+plugin = loadPlugin()
+
+HOUR = 3600
+DAY = 86400
+
+@pytest.mark.parametrize("schedule,interval", [
+    ("daily", DAY),
+    ("hourly", HOUR),
+    ("weekly", 7 * DAY),
+    ("01:00", DAY),
+    ("sat 02:00", 7 * DAY),
+    ("Sat 03:30", 7 * DAY),
+    # friday evening to monday evening
+    ("mon..fri 21:30", 3 * DAY),
+    ("fri..mon 21:30", 4 * DAY),
+    ("mon,wed,fri 03:00", 3 * DAY),
+    ("*/6:00", 6 * HOUR),
+    ("2,14:00", 12 * HOUR),
+    ("8..18/2:00", 14 * HOUR),
+    ("*:0/15", 15 * 60),
+    ("*/15", 15 * 60),
+    ("*-*-01 02:00", 31 * DAY),
+    ("sun *-*-* 04:00", 7 * DAY),
+    # unknown events count as daily
+    ("whenever", DAY),
+    ("mon..xyz 01:00", DAY),
+])
+def testScheduleInterval(schedule, interval):
+    assert plugin.getScheduleInterval(schedule) == interval
+
+def testCalendarValues():
+    assert plugin.parseCalendarValues("*", 24) is None
+    assert plugin.parseCalendarValues("*/15", 60) == [0, 15, 30, 45]
+    assert plugin.parseCalendarValues("2,14", 24) == [2, 14]
+    assert plugin.parseCalendarValues("8..11", 24) == [8, 9, 10, 11]
+    assert plugin.parseCalendarValues("5/20", 60) == [5, 25, 45]
+    assert plugin.getMaxGap([23, 1], 24) == 22
+    assert plugin.getMaxGap([], 7) == 7
+
+GUESTS = {
+    "100": {"node": "pve01", "pool": "prod"},
+    "101": {"node": "pve01"},
+    "102": {"node": "pve02", "pool": "prod"},
+    "103": {"node": "pve02", "pool": "test"},
+}
+
+@pytest.mark.parametrize("job,vmids", [
+    ({"all": 1}, {"100", "101", "102", "103"}),
+    ({"all": "1", "exclude": "101, 103"}, {"100", "102"}),
+    ({"all": 1, "exclude": "102", "node": "pve02"}, {"103"}),
+    ({"pool": "prod"}, {"100", "102"}),
+    ({"pool": "prod", "node": "pve01"}, {"100"}),
+    ({"pool": "missing"}, set()),
+    ({"vmid": "101,103,999"}, {"101", "103"}),
+    ({"vmid": 102}, {"102"}),
+    ({}, set()),
+])
+def testJobGuests(job, vmids):
+    assert plugin.getJobGuests(job, GUESTS) == vmids
+
+def testGuestInTwoJobs():
+    jobs = [{"id": "daily", "all": 1, "exclude": "103"}, {"id": "prod", "pool": "prod"}]
+    covered = [[job["id"] for job in jobs if vmid in plugin.getJobGuests(job, GUESTS)] for vmid in sorted(GUESTS)]
+    assert covered == [["daily", "prod"], ["daily"], ["daily", "prod"], []]
+
+@pytest.fixture
+def cluster(tmp_path, fixtures):
+    # copy of the fixtures, pvesh answers replaced by the test
+    directory = str(tmp_path / "fixtures")
+    shutil.copytree(fixtures, directory)
+
+    def replace(path, append, data):
+        filename = replay.getFixtureFile(directory, fake_pveproxy.getKey(path, append))
+        with open(filename, "r") as f:
+            fixture = json.load(f)
+        fixture["result"]["stdout"] = json.dumps(data)
+        with open(filename, "w") as f:
+            json.dump(fixture, f)
+    return directory, replace
+
+def runCheck(directory):
+    return runPlugin("check_proxmox.py", ["-i", "backup-status", "-w", "26", "-c", "50", "--no-cache", "--backend", "pvesh", "--pmxcfs", "off"], NCM_REPLAY=directory)
+
+def getLine(message, text):
+    lines = [line for line in message.splitlines() if text in line]
+    assert len(lines) == 1, message
+    return lines[0]
+
+def testJobsAndExclude(cluster):
+    directory, replace = cluster
+    replace("/cluster/backup", "", [
+        {"id": "daily", "type": "vzdump", "enabled": 1, "schedule": "01:00", "all": 1, "exclude": "103,104"},
+        {"id": "weekly", "type": "vzdump", "enabled": 1, "schedule": "sat 02:00", "vmid": "100,103"},
+        {"id": "disabled", "type": "vzdump", "enabled": 0, "schedule": "01:00", "vmid": "104"},
+    ])
+    code, message = runCheck(directory)
+    assert getLine(message, "(100, pve01)").startswith("[OK] ") and getLine(message, "(100, pve01)").endswith(" [daily, weekly]")
+    assert getLine(message, "(103, pve01)").endswith(" [weekly]")
+    assert "(104, pve01)" not in message
+    assert "guest(s) in 2 backup job(s)" in message and "1 guest(s) without backup job" in message
+    assert "Job weekly: schedule 'sat 02:00', every 168.0 hour(s) at most, 2 guest(s), 0 not ok" in message
+
+def testNodeWithoutTasks(cluster):
+    directory, replace = cluster
+    code, message = runCheck(directory)
+    assert getLine(message, "(115, pve03)").startswith("[OK] ")
+    # pve03 is online, but has no vzdump tasks
+    replace("/nodes/pve03/tasks", "typefilter=vzdump&limit=100", [])
+    code, message = runCheck(directory)
+    assert code == 2
+    assert getLine(message, "(115, pve03)").startswith("[CRITICAL] vm-0115 (115, pve03) - no successful backup in the last 50 hour(s)")
+    assert getLine(message, "(114, pve02)").startswith("[OK] ")
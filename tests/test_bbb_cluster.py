@@ -0,0 +1,85 @@
+###################################################
+#
+# Name: tests/test_bbb_cluster.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Redis backend of check_bbb_cluster.py against tools/fake_scalelite.py:
+# totals, a BBB server whose API fails and errors of the config and of
+# Redis itself.
+#
+###################################################
+
+import socket
+import threading
+
+import pytest
+
+import fake_scalelite
+from conftest import runPlugin
+
+@pytest.fixture
+def scalelite():
+    servers = fake_scalelite.createServers(12, 1)
+    redis = fake_scalelite.Server(("127.0.0.1", 0), fake_scalelite.createRedisHandler(servers, False))
+    http = fake_scalelite.Server(("127.0.0.1", 0), fake_scalelite.createHttpHandler(servers, False))
+    for server in [redis, http]:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield servers, redis.server_address[1], "http://127.0.0.1:" + str(http.server_address[1])
+    for server in [redis, http]:
+        server.shutdown()
+        server.server_close()
+
+def writeConfig(tmp_path, port):
+    filename = tmp_path / "scalelite.ini"
+    filename.write_text("[redis]\nurl = redis://127.0.0.1:" + str(port) + "/0\n\n[bbb]\ntimeout = 2\n")
+    return str(filename)
+
+def runCheck(arguments, proxy):
+    return runPlugin("check_bbb_cluster.py", arguments, HTTP_PROXY=proxy, http_proxy=proxy, NO_PROXY="", no_proxy="")
+
+def getFreePort():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def testTotals(tmp_path, scalelite):
+    servers, port, proxy = scalelite
+    code, message = runCheck(["--backend", "redis", "--config", writeConfig(tmp_path, port)], proxy)
+    assert code == 0, message
+    online = [server for server in servers.values() if server["online"] == "true"]
+    meetings = sum(len(server["meetings"]) for server in online)
+    users = sum(users for server in online for users, videos in server["meetings"])
+    assert "Meetings: " + str(meetings) + ", User: " + str(users) in message.splitlines()[0]
+    assert "Error" not in message
+
+def testBrokenApiIsDegraded(tmp_path, scalelite):
+    servers, port, proxy = scalelite
+    servers["id001"]["broken"] = True
+    passive = tmp_path / "results.cmd"
+    code, message = runCheck(["--backend", "redis", "--config", writeConfig(tmp_path, port), "--passive-file", str(passive)], proxy)
+    assert code == 0, message
+    line = [line for line in message.splitlines() if line.startswith("[WARNING] bbb001 ")]
+    assert line and "Error: HTTPError: 500" in line[0]
+    result = [line for line in passive.read_text().splitlines() if ";BBB_bbb001;" in line][0]
+    assert ";BBB_bbb001;1;WARNING - ****API ERROR: HTTPError: 500" in result
+
+def testMissingConfig(tmp_path, scalelite):
+    servers, port, proxy = scalelite
+    code, message = runCheck(["--backend", "redis", "--config", str(tmp_path / "missing.ini")], proxy)
+    assert code == 3
+    assert "no url is configured" in message
+
+def testRedisNotReachable(tmp_path, scalelite):
+    servers, port, proxy = scalelite
+    code, message = runCheck(["--backend", "redis", "--config", writeConfig(tmp_path, getFreePort())], proxy)
+    assert code == 3
+    assert "ConnectionRefusedError" in message
+
+def testInvalidRedisUrl(tmp_path, scalelite):
+    servers, port, proxy = scalelite
+    filename = tmp_path / "scalelite.ini"
+    filename.write_text("[redis]\nurl = http://127.0.0.1/\n")
+    code, message = runCheck(["--backend", "redis", "--config", str(filename)], proxy)
+    assert code == 3
+    assert "Unsupported redis url" in message
@@ -0,0 +1,54 @@
+###################################################
+#
+# Name: tests/test_benchmark_replay.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# tools/benchmark_replay.py against the small fixtures of conftest.py:
+# every category ends with OK, WARNING or CRITICAL and stays within its
+# budget of backend calls (= forks without replay).
+#
+###################################################
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import TOOLS, getEnvironment
+
+# 4 nodes, 12 local VMs, 3 datastores: one call per category except the
+# per-guest snapshots, the vzdump task logs and the per-datastore tasks
+CALLS = {
+    "check_proxmox.py -i vms-status": 1 + 12,
+    "check_proxmox.py -i backup-status": 20,
+    "check_proxmox.py -i osd-status": 2,
+    "check_pbs.py -i datastores": 1 + 3 * 3,
+}
+
+def runBenchmark(fixtures, *arguments):
+    process = subprocess.run([sys.executable, os.path.join(TOOLS, "benchmark_replay.py"), fixtures, "--runs", "1"] + list(arguments),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=getEnvironment(), timeout=300)
+    return process.returncode, process.stdout.decode("utf-8"), process.stderr.decode("utf-8")
+
+@pytest.fixture(scope="module")
+def results(fixtures):
+    code, stdout, stderr = runBenchmark(fixtures, "--json", "--max-wall-ms", "10000", "--max-rss-kb", "262144")
+    assert code == 0, stderr
+    return dict((result["plugin"] + " " + result["mode"], result) for result in json.loads(stdout))
+
+def testEveryCategoryEvaluated(results):
+    assert len(results) == 14
+    for mode, result in results.items():
+        assert result["exit_code"] in (0, 1, 2), mode
+
+def testBackendCalls(results):
+    for mode, result in results.items():
+        assert result["backend_calls"] <= CALLS.get(mode, 1), mode
+
+def testLimitFails(fixtures):
+    code, stdout, stderr = runBenchmark(fixtures, "--plugin", "check_pbs.py", "--max-calls", "0")
+    assert code == 1
+    assert "REGRESSION: check_pbs.py -i host-version made 1 backend calls" in stderr
@@ -0,0 +1,141 @@
+###################################################
+#
+# Name: tests/test_ceph_rados.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# rados backend of check_proxmox.py with tools/fake_rados.py: answers of
+# the mon commands, errors, timeouts and broken JSON, and the fallback to
+# the ceph CLI (a stub answering from the fixtures, no replay).
+#
+###################################################
+
+import json
+import os
+
+import pytest
+
+import fake_pveproxy
+from conftest import LIBRARY, TOOLS, runPlugin
+from ncm_plugin import replay
+
+# "sudo ceph ..." and "sudo pvesh ..." answered from the fixtures, every call logged
+STUB = """#!/usr/bin/env python3
+import json, os, sys
+sys.path.insert(0, %r)
+from ncm_plugin import replay
+key = ["sudo", os.path.basename(sys.argv[0])] + sys.argv[1:]
+with open(os.environ["NCM_TEST_CLI_LOG"], "a") as f:
+    f.write(" ".join(key) + "\\n")
+with open(replay.getFixtureFile(os.environ["NCM_TEST_FIXTURES"], key), "r") as f:
+    result = json.load(f)["result"]
+sys.stdout.write(result["stdout"])
+sys.exit(result["returncode"])
+"""
+
+OSD_STATUS = ["-i", "osd-status", "-w", "80", "-c", "90"]
+
+def loadStdout(fixtures, key):
+    with open(replay.getFixtureFile(fixtures, key), "r") as f:
+        return json.loads(json.load(f)["result"]["stdout"])
+
+@pytest.fixture
+def cluster(tmp_path, fixtures):
+    bin = tmp_path / "bin"
+    bin.mkdir()
+    (bin / "sudo").write_text('#!/bin/sh\ncommand="$(basename "$1")"\nshift\nexec "$command" "$@"\n')
+    for name in ["ceph", "pvesh"]:
+        (bin / name).write_text(STUB % LIBRARY)
+    for name in ["sudo", "ceph", "pvesh"]:
+        os.chmod(str(bin / name), 0o755)
+
+    conf = tmp_path / "ceph" / "ceph.conf"
+    conf.parent.mkdir()
+    conf.write_text("[global]\nmon_host = 127.0.0.1\n")
+    (conf.parent / "ceph.client.ncm.keyring").write_text("[client.ncm]\nkey = fake\n")
+
+    responses = {
+        "status": loadStdout(fixtures, fake_pveproxy.getKey("/cluster/ceph/status", "")),
+        "osd df tree": loadStdout(fixtures, ["sudo", "ceph", "osd", "df", "tree", "-f", "json"]),
+        "osd dump": loadStdout(fixtures, ["sudo", "ceph", "osd", "dump", "-f", "json"]),
+    }
+    environment = {
+        "PATH": str(bin) + os.pathsep + os.environ["PATH"],
+        "PYTHONPATH": LIBRARY + os.pathsep + TOOLS,
+        "NCM_RADOS_MODULE": "fake_rados",
+        "NCM_FAKE_RADOS": str(tmp_path / "responses.json"),
+        "NCM_FAKE_RADOS_LOG": str(tmp_path / "rados.log"),
+        "NCM_TEST_CLI_LOG": str(tmp_path / "cli.log"),
+        "NCM_TEST_FIXTURES": fixtures,
+    }
+
+    class Cluster:
+        def write(self, **changes):
+            # None removes the answer of a command
+            current = dict(responses, **changes)
+            with open(environment["NCM_FAKE_RADOS"], "w") as f:
+                json.dump(dict((key, value) for key, value in current.items() if value is not None), f)
+
+        def run(self, arguments, backend, **variables):
+            for name in ["NCM_FAKE_RADOS_LOG", "NCM_TEST_CLI_LOG"]:
+                open(environment[name], "w").close()
+            return runPlugin("check_proxmox.py", arguments + ["--ceph-backend", backend, "--ceph-conf", str(conf), "--no-cache", "--pmxcfs", "off"], **dict(environment, **variables))
+
+        def log(self, name):
+            with open(environment[name], "r") as f:
+                return f.read().splitlines()
+
+    cluster = Cluster()
+    cluster.write()
+    return cluster
+
+def testRadosSameAsCli(cluster):
+    for arguments in [OSD_STATUS, ["-i", "ceph-status"]]:
+        expected = cluster.run(arguments, "cli")
+        assert cluster.log("NCM_TEST_CLI_LOG")
+        assert expected[0] in (0, 1, 2), expected[1]
+        assert cluster.run(arguments, "rados") == expected
+        assert cluster.log("NCM_TEST_CLI_LOG") == []
+    assert cluster.log("NCM_FAKE_RADOS_LOG") == ["connect client.ncm", "mon_command status", "shutdown"]
+
+def testOneConnectionPerRun(cluster):
+    code, message = cluster.run(OSD_STATUS, "auto")
+    assert code in (0, 1, 2), message
+    assert cluster.log("NCM_FAKE_RADOS_LOG") == ["connect client.ncm", "mon_command osd df tree", "mon_command osd dump", "shutdown"]
+    code, message = cluster.run(["-i", "ceph-status,osd-status", "-w", "80", "-c", "90"], "auto")
+    assert cluster.log("NCM_FAKE_RADOS_LOG").count("connect client.ncm") == 1
+
+# connect fails, monitor timeout, broken JSON, command refused (-EINVAL)
+BROKEN = [
+    ({"NCM_FAKE_RADOS_FAIL": "1"}, {}),
+    ({"NCM_FAKE_RADOS_TIMEOUT": "osd df tree"}, {}),
+    ({}, {"osd df tree": {"__raw__": "{\"nodes\": ["}}),
+    ({}, {"osd df tree": None}),
+]
+
+@pytest.mark.parametrize("variables,responses", BROKEN)
+def testFallbackToCli(cluster, variables, responses):
+    cluster.write(**responses)
+    expected = cluster.run(OSD_STATUS, "cli")
+    assert cluster.run(OSD_STATUS, "auto", **variables) == expected
+    # after the first failure the CLI answers the rest of the run
+    assert cluster.log("NCM_TEST_CLI_LOG") == ["sudo ceph osd df tree -f json", "sudo ceph osd dump -f json"]
+    assert "mon_command osd dump" not in cluster.log("NCM_FAKE_RADOS_LOG")
+
+@pytest.mark.parametrize("variables,responses,message", [
+    (BROKEN[0][0], BROKEN[0][1], "connect failed"),
+    (BROKEN[1][0], BROKEN[1][1], "TimedOut: mon_command osd df tree timed out"),
+    (BROKEN[2][0], BROKEN[2][1], "ceph osd df returned invalid JSON"),
+    (BROKEN[3][0], BROKEN[3][1], "ceph osd df failed: unknown command osd df tree"),
+])
+def testRadosWithoutFallback(cluster, variables, responses, message):
+    cluster.write(**responses)
+    code, output = cluster.run(OSD_STATUS, "rados", **variables)
+    assert code == 3
+    assert message in output
+    assert cluster.log("NCM_TEST_CLI_LOG") == []
+
+def testWithoutKeyringUsesCli(cluster, tmp_path):
+    os.unlink(str(tmp_path / "ceph" / "ceph.client.ncm.keyring"))
+    assert cluster.run(OSD_STATUS, "auto") == cluster.run(OSD_STATUS, "cli")
+    assert cluster.log("NCM_FAKE_RADOS_LOG") == []
@@ -0,0 +1,64 @@
+###################################################
+#
+# Name: tests/test_cluster_mode.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# --cluster-mode elected of check_proxmox.py on a node that is not
+# elected: UNKNOWN without passive publishing, nothing submitted for the
+# delegated categories with it, and the elected node itself.
+#
+###################################################
+
+import json
+import shutil
+
+import pytest
+
+import fake_pveproxy
+from conftest import runPlugin
+from ncm_plugin import replay
+
+@pytest.fixture
+def notElected(tmp_path, fixtures):
+    # pve01 stays the local node, but pve02 gets the lowest node ID
+    directory = str(tmp_path / "fixtures")
+    shutil.copytree(fixtures, directory)
+    filename = replay.getFixtureFile(directory, fake_pveproxy.getKey("/cluster/status", ""))
+    with open(filename, "r") as f:
+        fixture = json.load(f)
+    status = json.loads(fixture["result"]["stdout"])
+    for entry in status:
+        if entry.get("type") == "node":
+            entry["nodeid"] = 9 if entry["name"] == "pve01" else entry["nodeid"]
+    fixture["result"]["stdout"] = json.dumps(status)
+    with open(filename, "w") as f:
+        json.dump(fixture, f)
+    return directory
+
+def runCheck(arguments, directory):
+    return runPlugin("check_proxmox.py", arguments + ["--cluster-mode", "elected", "--no-cache", "--pmxcfs", "off", "--backend", "pvesh"], NCM_REPLAY=directory)
+
+def testSingleCheckWithoutPassive(notElected):
+    code, message = runCheck(["-i", "ceph-status"], notElected)
+    assert code == 3
+    assert message.startswith("UNKNOWN - Delegated to pve02, but no result arrives here")
+
+def testBatchWithoutPassive(notElected):
+    code, message = runCheck(["-i", "ceph-status,host-version"], notElected)
+    assert code == 3
+    assert "[UNKNOWN] proxmox-ceph-status: Delegated to pve02, but no result arrives here" in message
+    assert "[OK] proxmox-host-version: " in message
+
+def testBatchWithPassive(tmp_path, notElected):
+    passive = tmp_path / "results.cmd"
+    code, message = runCheck(["-i", "ceph-status,host-version", "--passive-file", str(passive)], notElected)
+    assert "[OK] proxmox-ceph-status: Delegated to pve02 (lowest online node ID of the cluster)" in message
+    submitted = passive.read_text()
+    assert ";proxmox-host-version;" in submitted
+    assert ";proxmox-ceph-status;" not in submitted
+
+def testElectedNode(fixtures):
+    code, message = runCheck(["-i", "ceph-status"], fixtures)
+    assert "Delegated" not in message
+    assert code in (0, 1, 2), message
@@ -0,0 +1,165 @@
+###################################################
+#
+# Name: tests/test_collector.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Result store of ni-ncm-collector, the age check of the client and the
+# docker-containers source against tools/fake_docker.py.
+#
+###################################################
+
+import importlib.machinery
+import importlib.util
+import json
+import os
+import socketserver
+import threading
+import time
+
+import pytest
+
+import fake_docker
+from conftest import ROOT
+from ncm_plugin import collector
+from ncm_plugin import containers
+
+def loadDaemon():
+    loader = importlib.machinery.SourceFileLoader("ni_ncm_collector", os.path.join(ROOT, "usr", "sbin", "ni-ncm-collector"))
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    return module
+
+daemon = loadDaemon()
+
+class Fetch:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+def testFirstRequestSynchronous():
+    store = daemon.Store(30, 300, 10)
+    fetch = Fetch({"returncode": 0, "stdout": "1"})
+    result, updated = store.get("a", fetch)
+    assert result["stdout"] == "1" and fetch.calls == 1
+    assert store.get("a", fetch)[0]["stdout"] == "1" and fetch.calls == 1
+
+def testFailedRefreshDropsResult():
+    store = daemon.Store(0, 300, 10)
+    fetch = Fetch({"returncode": 0, "stdout": "1"}, OSError("pvesh hangs"), {"returncode": 0, "stdout": "2"})
+    store.get("a", fetch)
+    store.get("a", fetch)
+    for entry in store.getDue(time.time() + 1):
+        with pytest.raises(OSError):
+            store.refresh(entry)
+    # the old result is gone, the next request fetches again
+    assert store.get("a", fetch)[0]["stdout"] == "2"
+    assert fetch.calls == 3
+
+def testFailedCommandIsNotKept():
+    store = daemon.Store(30, 300, 10)
+    fetch = Fetch({"returncode": 255, "stdout": ""}, {"returncode": 0, "stdout": "ok"})
+    with pytest.raises(RuntimeError):
+        store.get("a", fetch)
+    assert store.get("a", fetch)[0]["stdout"] == "ok"
+
+def testOldResultFetchedAgain():
+    store = daemon.Store(30, 300, 10, maxAge=60)
+    fetch = Fetch({"returncode": 0, "stdout": "1"}, {"returncode": 0, "stdout": "2"})
+    store.get("a", fetch)
+    store.entries["a"]["time"] -= 61
+    assert store.get("a", fetch)[0]["stdout"] == "2"
+
+def testOnlyUsedResultsArePolled():
+    store = daemon.Store(30, 300, 10)
+    store.get("once", Fetch({"returncode": 0, "stdout": "1"}))
+    store.get("used", Fetch({"returncode": 0, "stdout": "1"}, {"returncode": 0, "stdout": "2"}))
+    now = time.time() + 31
+    # nobody asked since the first fetch
+    assert store.getDue(now) == []
+    store.get("used", None)
+    assert [entry["key"] for entry in store.getDue(now)] == ["used"]
+
+def testUnusedCommandsExpire():
+    store = daemon.Store(30, 300, 10)
+    store.get("a", Fetch({"returncode": 0, "stdout": "1"}))
+    assert store.getDue(time.time() + 301) == []
+    assert store.entries == {}
+
+@pytest.fixture
+def fakeDaemon(tmp_path, monkeypatch):
+    # answers every request with the response in answer["response"]
+    answer = {}
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            self.rfile.readline()
+            self.wfile.write(json.dumps(answer["response"]).encode("utf-8") + b"\n")
+
+    path = str(tmp_path / "collector.sock")
+    server = socketserver.UnixStreamServer(path, Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("NCM_COLLECTOR_SOCKET", path)
+    yield answer
+    server.shutdown()
+    server.server_close()
+
+def testClientRejectsOldResult(fakeDaemon):
+    command = ["sudo", "pvesh", "get", "/version"]
+    fakeDaemon["response"] = {"status": "ok", "time": time.time(), "returncode": 0, "stdout": "{}"}
+    assert collector.execute(command)["stdout"] == "{}"
+    fakeDaemon["response"]["time"] = time.time() - collector.MAX_AGE - 5
+    assert collector.execute(command) is None
+    fakeDaemon["response"] = {"status": "error", "message": "OSError: pvesh hangs"}
+    assert collector.execute(command) is None
+
+@pytest.fixture
+def docker(tmp_path, monkeypatch):
+    path = str(tmp_path / "docker.sock")
+    server = fake_docker.createServer(path, fake_docker.createContainers(300, 1))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("DOCKER_HOST", "unix://" + path)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def testListWithoutInspects(docker):
+    running = [container for container in docker.containers if container["State"] == "running"]
+    result = containers.listContainers()
+    assert docker.stats == {"requests": 1, "events": 0, "inspects": 0}
+    assert len(result) == len(running)
+    # the creation time from the list stands in for the start time
+    assert result[0]["started"] == time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(running[0]["Created"])) + ".000000000Z"
+
+def testListInspectsNamedContainers(docker):
+    result = containers.listContainers(["web", "app002", "missing"])
+    assert docker.stats["inspects"] == 2
+    started = dict((container["name"], container["started"]) for container in result)
+    assert started["web"] == docker.containers[0]["StartedAt"]
+    assert started["app002"] == docker.containers[2]["StartedAt"]
+
+def testCollectorPassesNames(tmp_path, docker, monkeypatch):
+    path = str(tmp_path / "collector.sock")
+    server = daemon.Server(path, daemon.Handler)
+    server.store = daemon.Store(30, 300, 10)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("NCM_COLLECTOR_SOCKET", path)
+    try:
+        assert len(collector.getSource("docker-containers")) > 250
+        assert docker.stats["inspects"] == 0
+        result = collector.getSource("docker-containers", ["web"])
+        assert docker.stats["inspects"] == 1
+        assert [container["started"] for container in result if container["name"] == "web"] == [docker.containers[0]["StartedAt"]]
+        # same names, same entry of the store
+        collector.getSource("docker-containers", ["web"])
+        assert docker.stats["requests"] == 3
+    finally:
+        server.shutdown()
+        server.server_close()
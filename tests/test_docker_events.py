@@ -0,0 +1,136 @@
+###################################################
+#
+# Name: tests/test_docker_events.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# ni-ncm-docker-events and check_docker.py against tools/fake_docker.py:
+# seeding with stopped containers, replay after a reconnect without
+# counting events twice and a flush thread that survives write errors.
+#
+###################################################
+
+import importlib.machinery
+import importlib.util
+import os
+import threading
+import time
+
+import pytest
+
+import fake_docker
+from conftest import ROOT, runPlugin
+from ncm_plugin import containers
+from ncm_plugin import events
+
+def loadDaemon():
+    loader = importlib.machinery.SourceFileLoader("ni_ncm_docker_events", os.path.join(ROOT, "usr", "sbin", "ni-ncm-docker-events"))
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    return module
+
+daemon = loadDaemon()
+
+@pytest.fixture
+def docker(tmp_path, monkeypatch):
+    path = str(tmp_path / "docker.sock")
+    server = fake_docker.createServer(path, fake_docker.createContainers(8, 1))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("DOCKER_HOST", "unix://" + path)
+    yield server
+    fake_docker.disconnect(server)
+    server.shutdown()
+    server.server_close()
+
+def waitFor(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.02)
+
+def runWatch(server, table, done):
+    # one connection of the watcher, ended by a dockerd "restart" once done() is true
+    lock = threading.RLock()
+    thread = threading.Thread(target=daemon.watch, args=(table, lock, threading.Event(), threading.Event()), daemon=True)
+    thread.start()
+    waitFor(lambda: done(table))
+    fake_docker.disconnect(server)
+    thread.join(10)
+    assert not thread.is_alive()
+
+def testSeedKeepsStoppedContainers(docker):
+    web, stopped = docker.containers[0], docker.containers[6]
+    table = events.createTable()
+    events.getEntry(table, stopped["Id"])["restarts"] = [time.time()]
+    events.getEntry(table, "removed")
+    events.seed(table, containers.listContainers(stopped=True))
+    assert table["containers"][stopped["Id"]]["status"] == "exited"
+    assert table["containers"][stopped["Id"]]["restarts"]
+    assert table["containers"][web["Id"]]["status"] == "running"
+    assert "removed" not in table["containers"]
+    assert len(table["containers"]) == 8
+
+def testReplayDoesNotCountTwice(docker):
+    web, app = docker.containers[0], docker.containers[1]
+    nano = time.time_ns()
+    # two events in the same nanosecond, the second connection starts exactly there
+    fake_docker.addEvent(docker, fake_docker.createEvent("die", web, nano, exitCode="137"))
+    fake_docker.addEvent(docker, fake_docker.createEvent("start", web, nano + 1000))
+    fake_docker.addEvent(docker, fake_docker.createEvent("die", app, nano + 2000, exitCode="1"))
+    fake_docker.addEvent(docker, fake_docker.createEvent("oom", app, nano + 2000))
+
+    table = events.createTable()
+    # the first watcher has seen the events until "die" of app
+    for event in docker.events[:3]:
+        events.apply(table, event)
+    runWatch(docker, table, lambda table: table["containers"][app["Id"]]["oom_count"] == 1)
+    assert table["since"] == nano + 2000
+    assert table["containers"][web["Id"]]["restart_count"] == 1
+    assert table["containers"][app["Id"]]["last_exit_code"] == 1
+
+    # the replay of the second connection sends the two events of the last nanosecond again
+    streams = docker.stats["events"]
+    runWatch(docker, table, lambda table: docker.stats["events"] > streams and time.sleep(0.3) is None)
+    assert table["containers"][web["Id"]]["restart_count"] == 1
+    assert table["containers"][app["Id"]]["oom_count"] == 1
+
+    fake_docker.addEvent(docker, fake_docker.createEvent("die", web, nano + 3000, exitCode="0"))
+    fake_docker.addEvent(docker, fake_docker.createEvent("start", web, nano + 4000))
+    runWatch(docker, table, lambda table: table["since"] == nano + 4000)
+    assert table["containers"][web["Id"]]["restart_count"] == 2
+
+def testApplySkipsSeenEvent():
+    container = fake_docker.createContainers(1, 1)[0]
+    table = events.createTable()
+    event = fake_docker.createEvent("oom", container)
+    assert events.apply(table, event)
+    assert not events.apply(table, event)
+    assert table["containers"][container["Id"]]["oom_count"] == 1
+    assert events.getSince(table) == "%d.%09d" % divmod(event["timeNano"], 1000000000)
+
+def testFlushSurvivesWriteError(tmp_path, monkeypatch, capsys):
+    filename = str(tmp_path / "docker-events.json")
+    save = events.save
+    failures = []
+
+    def failingSave(table, filename):
+        if not failures:
+            failures.append(1)
+            raise OSError("No space left on device")
+        save(table, filename)
+
+    monkeypatch.setattr(daemon.events, "save", failingSave)
+    lock, dirty, stop = threading.RLock(), threading.Event(), threading.Event()
+    dirty.set()
+    thread = threading.Thread(target=daemon.flush, args=(events.createTable(), lock, dirty, stop, filename, 0.01, 60), daemon=True)
+    thread.start()
+    waitFor(lambda: os.path.exists(filename))
+    stop.set()
+    thread.join(5)
+    assert "No space left on device" in capsys.readouterr().err
+    assert events.load(filename)["containers"] == {}
+
+def testCheckDockerStoppedContainer(docker):
+    code, message = runPlugin("check_docker.py", ["--name", "web,app006"], DOCKER_HOST=os.environ["DOCKER_HOST"])
+    assert code == 2, message
+    assert "app006 with image n/a is not running" in message
@@ -0,0 +1,75 @@
+###################################################
+#
+# Name: tests/test_history.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Usage history: the fit cached in the ring file, recording without a
+# forecast and broken files.
+#
+###################################################
+
+import os
+
+import pytest
+
+from ncm_plugin import history
+
+def fill(directory, metric, now, samples=48):
+    # used grows by 1 per hour, full at 1000
+    for index in range(samples):
+        history.record(metric, 500 + index, 1000, now=now - (samples - 1 - index) * history.INTERVAL, directory=directory)
+
+@pytest.fixture
+def fits(monkeypatch):
+    calls = []
+    fitSamples = history.fitSamples
+
+    def countingFit(samples, method="robust"):
+        calls.append(method)
+        return fitSamples(samples, method)
+
+    monkeypatch.setattr(history, "fitSamples", countingFit)
+    return calls
+
+def testFitComputedOncePerSample(tmp_path, fits):
+    now = 1700000000.0
+    fill(str(tmp_path), "osd.1", now)
+    days = history.record("osd.1", 547, 1000, now=now + 60, directory=str(tmp_path), method="linear")
+    assert history.record("osd.1", 547, 1000, now=now + 120, directory=str(tmp_path), method="linear") < days
+    assert fits == ["linear"]
+    # a new sample or another method needs a new fit
+    history.record("osd.1", 548, 1000, now=now + history.INTERVAL, directory=str(tmp_path), method="linear")
+    history.record("osd.1", 548, 1000, now=now + history.INTERVAL, directory=str(tmp_path), method="robust")
+    assert fits == ["linear", "linear", "robust"]
+    assert round(days * 24) == 453
+    assert days == pytest.approx(history.forecast(history.load("osd.1", str(tmp_path))[:-1], "linear", now + 60))
+
+def testTooLittleDataCached(tmp_path, fits):
+    fill(str(tmp_path), "osd.2", 1700000000.0, samples=3)
+    for i in range(3):
+        assert history.record("osd.2", 503, 1000, now=1700000060.0, directory=str(tmp_path), method="robust") is None
+    assert fits == ["robust"]
+
+def testRecordOnly(tmp_path, fits):
+    fill(str(tmp_path), "osd.3", 1700000000.0)
+    assert history.record("osd.3", 548, 1000, now=1700003600.0, directory=str(tmp_path)) is None
+    assert fits == []
+    assert len(history.load("osd.3", str(tmp_path))) == 49
+
+@pytest.mark.parametrize("version,size", [
+    (0, 100),
+    # right size, but another version
+    (history.VERSION + 1, history.SLOTS * history.SLOT.size + history.FIT.size),
+    (history.VERSION, history.SLOTS * history.SLOT.size),
+])
+def testBrokenFileIgnored(tmp_path, monkeypatch, version, size):
+    monkeypatch.setenv("NCM_HISTORY_DIR", str(tmp_path))
+    filename = history.getFile("osd.5", str(tmp_path))
+    with open(filename, "wb") as f:
+        f.write(history.HEADER.pack(history.MAGIC, version, history.SLOTS, 0) + b"\0" * size)
+    assert history.daysUntilFull("osd.5", 1, 2) is None
+    with pytest.raises(ValueError):
+        history.load("osd.5", str(tmp_path))
+    # left as it is
+    assert os.path.getsize(filename) == history.HEADER.size + size
@@ -0,0 +1,78 @@
+###################################################
+#
+# Name: tests/test_output.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# ncm_plugin.output.Output: state lines, the line cap with the count of
+# the rest, footer and the min/max/avg/count aggregation of perfdata.
+#
+###################################################
+
+import pytest
+
+from ncm_plugin import output
+from ncm_plugin.output import OK, WARNING, CRITICAL, UNKNOWN
+
+def createOutput(maxLines=0, maxPerfdata=0):
+    result = output.Output(maxLines, maxPerfdata)
+    for state, text in [(OK, "a"), (WARNING, "b"), (OK, "c"), (CRITICAL, "d"), (UNKNOWN, "e"), (WARNING, "f")]:
+        result.add(state, text)
+    return result
+
+def testRenderAllLines():
+    result = createOutput()
+    assert result.getState() == CRITICAL
+    assert result.render("Summary") == "Summary\n\n[OK] a\n[WARNING] b\n[OK] c\n[CRITICAL] d\n[UNKNOWN] e\n[WARNING] f\n"
+
+def testEmptyOutput():
+    result = output.Output()
+    assert result.getState() == OK
+    assert result.getState(UNKNOWN) == UNKNOWN
+    assert result.render("Nothing") == "Nothing"
+
+@pytest.mark.parametrize("maxLines,expected", [
+    # at the boundary nothing is cut and the order stays
+    (6, "[OK] a\n[WARNING] b\n[OK] c\n[CRITICAL] d\n[UNKNOWN] e\n[WARNING] f"),
+    (5, "[CRITICAL] d\n[WARNING] b\n[WARNING] f\n[UNKNOWN] e\n[OK] a\n... 1 more (1 ok)"),
+    (3, "[CRITICAL] d\n[WARNING] b\n[WARNING] f\n... 3 more (1 unknown, 2 ok)"),
+    (1, "[CRITICAL] d\n... 5 more (2 warning, 1 unknown, 2 ok)"),
+])
+def testLineCap(maxLines, expected):
+    assert createOutput(maxLines).render("Summary") == "Summary\n\n" + expected + "\n"
+
+def testFooterNotCut():
+    result = createOutput(1)
+    result.addFooter("3 result(s) published")
+    assert result.render("Summary").endswith("... 5 more (2 warning, 1 unknown, 2 ok)\n\n3 result(s) published\n")
+
+def testPerfdataFormat():
+    result = output.Output()
+    result.addPerfdata("runtime", 0.12345, "s")
+    result.addPerfdata("used space", 10, "GB", 80, 90, 0, 100)
+    result.addPerfdata("it's", 1, "", "", 5)
+    assert result.render("OK") == "OK | runtime=0.123s 'used space'=10GB;80;90;0;100 'it''s'=1;;5"
+
+def addOsds(result, count):
+    for index in range(count):
+        result.addPerfdata("osd." + str(index), 10 + index, "%", 80, 90, 0, 100, group="osd_fill")
+    result.addPerfdata("osds", count)
+
+def testPerfdataAtLimit():
+    result = output.Output(maxPerfdata=4)
+    addOsds(result, 4)
+    assert result.getPerfdata() == "osd.0=10%;80;90;0;100 osd.1=11%;80;90;0;100 osd.2=12%;80;90;0;100 osd.3=13%;80;90;0;100 osds=4"
+
+def testPerfdataAggregated():
+    result = output.Output(maxPerfdata=4)
+    addOsds(result, 5)
+    # the ungrouped values first, then min/max/avg/count per group
+    assert result.getPerfdata() == "osds=5 osd_fill_min=10%;80;90;0;100 osd_fill_max=14%;80;90;0;100 osd_fill_avg=12.0%;80;90;0;100 osd_fill_count=5"
+
+def testPerfdataAggregatedPerGroup():
+    result = output.Output(maxPerfdata=2)
+    result.addPerfdata("a_used", 1.5, "TB", 8, 9, 0, 10, group="used")
+    result.addPerfdata("b_used", 4.5, "TB", 16, 18, 0, 20, group="used")
+    result.addPerfdata("a_full", 30, group="full")
+    # thresholds and maximum differ between the objects and are left out, the common minimum stays
+    assert result.getPerfdata() == "used_min=1.5TB;;;0 used_max=4.5TB;;;0 used_avg=3.0TB;;;0 used_count=2 full_min=30 full_max=30 full_avg=30.0 full_count=1"
@@ -0,0 +1,53 @@
+###################################################
+#
+# Name: tests/test_parallel.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# ncm_plugin.parallel.mapConcurrently: order of the results, the bound of
+# the worker pool and exceptions of a call.
+#
+###################################################
+
+import threading
+import time
+
+import pytest
+
+from ncm_plugin import parallel
+
+def testSequential():
+    threads = []
+
+    def function(value):
+        threads.append(threading.current_thread())
+        return value * 2
+
+    assert parallel.mapConcurrently(function, [1, 2, 3], 1) == [2, 4, 6]
+    assert parallel.mapConcurrently(function, iter([4]), 8) == [8]
+    assert set(threads) == {threading.current_thread()}
+
+def testBoundedPool():
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def function(value):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return value
+
+    assert parallel.mapConcurrently(function, range(20), 4) == list(range(20))
+    assert 1 < running[1] <= 4
+
+def testException():
+    def function(value):
+        if value == 3:
+            raise ValueError("broken " + str(value))
+        return value
+
+    with pytest.raises(ValueError):
+        parallel.mapConcurrently(function, range(6), 3)
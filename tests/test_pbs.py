@@ -0,0 +1,69 @@
+###################################################
+#
+# Name: tests/test_pbs.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# check_pbs.py with replayed datastores: the exit state of
+# datastore-status follows the worst datastore, whatever comes after it,
+# the datastores category gives the same result with any --workers and
+# garbage-collection-status prints only its status line.
+#
+###################################################
+
+import json
+import shutil
+import time
+
+import pytest
+
+from conftest import runPlugin
+from ncm_plugin import replay
+
+USAGE = ["sudo", "proxmox-backup-debug", "api", "get", "status/datastore-usage", "--output-format", "json"]
+TB = 1024 ** 4
+
+@pytest.fixture
+def datastores(tmp_path, fixtures):
+    # copy of the fixtures with the datastores given by the test
+    directory = str(tmp_path / "fixtures")
+    shutil.copytree(fixtures, directory)
+    filename = replay.getFixtureFile(directory, USAGE)
+
+    def write(days):
+        # days until full per datastore, 0 = PBS has no estimate
+        now = time.time()
+        usage = [{"store": "store%02d" % index, "total": 10 * TB, "used": 5 * TB, "estimated-full-date": int(now + value * 86400 + 3600) if value else 0}
+            for index, value in enumerate(days)]
+        with open(filename, "r") as f:
+            fixture = json.load(f)
+        fixture["result"]["stdout"] = json.dumps(usage)
+        with open(filename, "w") as f:
+            json.dump(fixture, f)
+        return directory
+    return write
+
+@pytest.mark.parametrize("days,code", [
+    ([100, 0], 0),
+    ([20, 0], 1),
+    ([5, 0], 2),
+    ([0, 5, 20, 0], 2),
+])
+def testWorstDatastore(datastores, days, code):
+    result = runPlugin("check_pbs.py", ["-i", "datastore-status", "-w", "30", "-c", "10"], NCM_REPLAY=datastores(days))
+    assert result[0] == code, result[1]
+    assert "Estimated Full: never" in result[1]
+
+def testDatastoresSameForAllWorkers(fixtures):
+    # task lists of every datastore and task type, sequential or concurrent
+    expected = runPlugin("check_pbs.py", ["-i", "datastores", "-w", "30", "-c", "10", "--workers", "1"], NCM_REPLAY=fixtures)
+    assert expected[0] == 0, expected[1]
+    assert "gc: OK" in expected[1] and "prune: OK" in expected[1] and "verify: OK" in expected[1]
+    assert runPlugin("check_pbs.py", ["-i", "datastores", "-w", "30", "-c", "10", "--workers", "8"], NCM_REPLAY=fixtures) == expected
+
+def testGarbageCollectionOutput(fixtures):
+    # nothing but the status line, no task dump before it
+    code, message = runPlugin("check_pbs.py", ["-i", "garbage-collection-status"], NCM_REPLAY=fixtures)
+    assert code == 0
+    assert message.startswith("OK - Last garbage_collection at store00 was successful!")
+    assert len(message.splitlines()) == 1
@@ -0,0 +1,167 @@
+###################################################
+#
+# Name: tests/test_pmxcfs.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# pmxcfs backend with a temporary /etc/pve tree: parsing of .members,
+# .vmlist, .version and the guest configs, the snapshot cache, and the
+# fallback of check_proxmox.py to pvesh when the files are missing or
+# malformed.
+#
+###################################################
+
+import json
+import os
+import re
+import shutil
+
+import pytest
+
+import fake_pveproxy
+from conftest import runPlugin
+from ncm_plugin import pmxcfs
+from ncm_plugin import replay
+
+CONFIG = """boot: order=scsi0
+memory: 2048
+parent: daily
+
+[daily]
+snaptime: 1700000000
+vmstate: local-lvm:vm-100-state-daily
+
+[weekly]
+parent: daily
+snaptime: 1700600000
+
+[PENDING]
+memory: 4096
+
+[special:cloudinit]
+ipconfig0: ip=dhcp
+"""
+
+def writeTree(directory, members=None, vmlist=None, version=None, configs=None):
+    # a minimal /etc/pve, None leaves the file out
+    for name, content in [(".members", members), (".vmlist", vmlist), (".version", version)]:
+        if content is not None:
+            with open(os.path.join(directory, name), "w") as f:
+                f.write(content if isinstance(content, str) else json.dumps(content))
+    for (node, vmid, guestType), content in (configs or {}).items():
+        filename = pmxcfs.getConfigPath(node, vmid, guestType, directory)
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename, "w") as f:
+            f.write(content)
+
+MEMBERS = {
+    "nodename": "pve02",
+    "version": 7,
+    "cluster": {"name": "lab", "version": 3, "nodes": 3, "quorate": 1},
+    "nodelist": {
+        "pve02": {"id": 2, "online": 1, "ip": "10.0.0.12"},
+        "pve01": {"id": 1, "online": 1, "ip": "10.0.0.11"},
+        "pve03": {"id": 3, "online": 0, "ip": "10.0.0.13"},
+    },
+}
+
+def testClusterStatus(tmp_path):
+    writeTree(str(tmp_path), members=MEMBERS)
+    assert pmxcfs.available(str(tmp_path))
+    status = pmxcfs.getClusterStatus(str(tmp_path))
+    assert status[0] == {"type": "cluster", "id": "cluster", "name": "lab", "nodes": 3, "quorate": 1, "version": 3}
+    assert [(entry["name"], entry["nodeid"], entry["online"], entry["local"], entry["ip"]) for entry in status[1:]] == [
+        ("pve01", 1, 1, 0, "10.0.0.11"), ("pve02", 2, 1, 1, "10.0.0.12"), ("pve03", 3, 0, 0, "10.0.0.13")]
+
+def testStandaloneNode(tmp_path):
+    # without a cluster .members has no nodelist, pvesh has to answer
+    writeTree(str(tmp_path), members={"nodename": "pve01", "version": 1})
+    assert pmxcfs.getClusterStatus(str(tmp_path)) is None
+    assert not pmxcfs.available(str(tmp_path / "missing"))
+
+def testParseGuestConfig():
+    snapshots = pmxcfs.parseGuestConfig(CONFIG)
+    assert snapshots == [
+        {"name": "current", "description": "You are here!", "parent": "daily"},
+        {"name": "daily", "description": "", "snaptime": 1700000000, "vmstate": 1},
+        {"name": "weekly", "description": "", "parent": "daily", "snaptime": 1700600000},
+    ]
+
+def testSnapshotsCachedByVersion(tmp_path):
+    pve, cacheFile = str(tmp_path), str(tmp_path / "cache.json")
+    vmlist = {"version": 4, "ids": {"100": {"node": "pve01", "type": "qemu", "version": 1}, "200": {"node": "pve02", "type": "lxc", "version": 1}}}
+    writeTree(pve, members=MEMBERS, vmlist=vmlist, version={"starttime": 1000},
+        configs={("pve01", 100, "qemu"): CONFIG, ("pve02", 200, "lxc"): "hostname: ct200\n"})
+    first = pmxcfs.getSnapshots("pve01", [100, 200], pve, cacheFile)
+    assert [len(snapshots) for snapshots in first] == [3, 1]
+
+    # same version in .vmlist: the config is not read again
+    writeTree(pve, configs={("pve01", 100, "qemu"): "memory: 2048\n"})
+    assert pmxcfs.getSnapshots("pve01", [100, 200], pve, cacheFile) == first
+    # a new version of the guest or a restart of pmxcfs reads it again
+    vmlist["ids"]["100"]["version"] = 2
+    writeTree(pve, vmlist=vmlist)
+    assert len(pmxcfs.getSnapshots("pve01", [100], pve, cacheFile)[0]) == 1
+    writeTree(pve, configs={("pve01", 100, "qemu"): CONFIG}, version={"starttime": 2000})
+    assert len(pmxcfs.getSnapshots("pve01", [100], pve, cacheFile)[0]) == 3
+
+    # removed guests only have "current" and are dropped from the cache
+    del vmlist["ids"]["200"]
+    writeTree(pve, vmlist=vmlist)
+    os.unlink(pmxcfs.getConfigPath("pve02", 200, "lxc", pve))
+    assert pmxcfs.getSnapshots("pve01", [200], pve, cacheFile) == [[{"name": "current", "description": "You are here!"}]]
+    with open(cacheFile, "r") as f:
+        assert list(json.load(f)["snapshots"]) == ["100"]
+
+@pytest.fixture
+def pve(tmp_path, fixtures):
+    # copy of the /etc/pve tree of the fixtures, changed by the tests
+    directory = str(tmp_path / "pve")
+    shutil.copytree(os.path.join(fixtures, "pve"), directory)
+    return directory
+
+def runCheck(arguments, fixtures, pve, mode):
+    code, message = runPlugin("check_proxmox.py", arguments + ["--pmxcfs", mode, "--pmxcfs-dir", pve, "--no-cache", "--backend", "pvesh"], NCM_REPLAY=fixtures)
+    # the runtime differs from run to run
+    return code, re.sub(r"runtime=[0-9.]+s", "runtime", message)
+
+VMS_STATUS = ["-i", "vms-status", "-w", "14", "-c", "30"]
+
+def testWithoutPvesh(tmp_path, fixtures, pve):
+    # fixtures without the answers pmxcfs replaces, so pvesh cannot have answered
+    directory = str(tmp_path / "fixtures")
+    shutil.copytree(fixtures, directory)
+    with open(replay.getFixtureFile(fixtures, fake_pveproxy.getKey("/nodes/" + replay.HOSTNAME + "/qemu", "")), "r") as f:
+        vmids = [entry["vmid"] for entry in json.loads(json.load(f)["result"]["stdout"])]
+    for path in ["/cluster/status"] + ["/nodes/" + replay.HOSTNAME + "/qemu/" + str(vmid) + "/snapshot" for vmid in vmids]:
+        os.unlink(replay.getFixtureFile(directory, fake_pveproxy.getKey(path, "")))
+    for arguments in [["-i", "cluster-status"], VMS_STATUS]:
+        expected = runCheck(arguments, fixtures, pve, "off")
+        assert expected[0] in (0, 1, 2), expected[1]
+        assert runCheck(arguments, directory, pve, "on") == expected
+        assert runCheck(arguments, directory, pve, "auto") == expected
+
+@pytest.mark.parametrize("category,name,content", [
+    (["-i", "cluster-status"], ".members", None),
+    (["-i", "cluster-status"], ".members", "{\"nodename\": "),
+    (["-i", "cluster-status"], ".members", "{\"nodename\": \"pve01\", \"version\": 1}"),
+    (VMS_STATUS, ".vmlist", None),
+    (VMS_STATUS, ".vmlist", "[1, 2"),
+    (VMS_STATUS, ".version", "not json"),
+])
+def testFallbackToPvesh(fixtures, pve, category, name, content):
+    filename = os.path.join(pve, name)
+    if content is None:
+        os.unlink(filename)
+    else:
+        with open(filename, "w") as f:
+            f.write(content)
+    expected = runCheck(category, fixtures, pve, "off")
+    assert runCheck(category, fixtures, pve, "auto") == expected
+
+def testBrokenFilesWithoutFallback(fixtures, pve):
+    with open(os.path.join(pve, ".vmlist"), "w") as f:
+        f.write("[1, 2")
+    code, message = runCheck(VMS_STATUS, fixtures, pve, "on")
+    assert code == 3
+    assert "JSONDecodeError" in message
@@ -0,0 +1,84 @@
+###################################################
+#
+# Name: tests/test_process.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# ncm_plugin.process with a hanging stub command: run and stream raise
+# CommandTimeout after the deadline, stream passes on the output while
+# the command runs and killGroup takes the children of the command with
+# it, also when they ignore SIGTERM.
+#
+###################################################
+
+import os
+import time
+
+import pytest
+
+from ncm_plugin import process
+
+def writeStub(directory, ignoreTerm=False):
+    # starts a child, writes its pid and sleeps itself
+    pidFile = os.path.join(directory, "child.pid")
+    stub = os.path.join(directory, "stub.sh")
+    with open(stub, "w") as f:
+        f.write("#!/bin/sh\n")
+        if ignoreTerm:
+            f.write("trap '' TERM\n")
+        f.write("sleep 60 &\necho $! > " + pidFile + "\necho started\nsleep 60\n")
+    os.chmod(stub, 0o755)
+    return [stub], pidFile
+
+def isRunning(pid):
+    # a killed child without a parent that reaps it stays as zombie
+    try:
+        with open("/proc/" + str(pid) + "/stat", "r") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+def assertChildGone(pidFile):
+    with open(pidFile, "r") as f:
+        pid = int(f.read())
+    deadline = time.time() + 5
+    while isRunning(pid) and time.time() < deadline:
+        time.sleep(0.05)
+    assert not isRunning(pid)
+
+@pytest.mark.parametrize("ignoreTerm", [False, True])
+def testRunTimeout(tmp_path, ignoreTerm):
+    command, pidFile = writeStub(str(tmp_path), ignoreTerm)
+    startTime = time.time()
+    with pytest.raises(process.CommandTimeout) as error:
+        process.run(command, timeout=1)
+    assert isinstance(error.value, process.CommandError)
+    assert error.value.timeout == 1
+    # SIGKILL follows after the grace period
+    assert time.time() - startTime < 1 + 2 * process.GRACE + 2
+    assertChildGone(pidFile)
+
+def testStreamTimeout(tmp_path):
+    command, pidFile = writeStub(str(tmp_path))
+    chunks = []
+    with pytest.raises(process.CommandTimeout):
+        for chunk in process.stream(command, timeout=1):
+            chunks.append(chunk)
+    assert "".join(chunks) == "started\n"
+    assertChildGone(pidFile)
+
+def testStreamStoppedEarly(tmp_path):
+    # the output comes while the command runs, the consumer leaves the
+    # loop and the command and its child are killed
+    command, pidFile = writeStub(str(tmp_path))
+    startTime = time.time()
+    chunks = process.stream(command, timeout=30)
+    assert next(chunks) == "started\n"
+    assert time.time() - startTime < 5
+    chunks.close()
+    assertChildGone(pidFile)
+
+def testCommandNotFound(tmp_path):
+    with pytest.raises(process.CommandError) as error:
+        process.run([str(tmp_path / "missing")])
+    assert "missing: " in str(error.value)
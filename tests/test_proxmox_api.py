@@ -0,0 +1,120 @@
+###################################################
+#
+# Name: tests/test_proxmox_api.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# API backend of check_proxmox.py against tools/fake_pveproxy.py: token
+# and ticket login, TLS with CA or pinned fingerprint and the fallback
+# to pvesh (replayed) when the API fails.
+#
+###################################################
+
+import argparse
+import hashlib
+import shutil
+import ssl
+import subprocess
+import threading
+
+import pytest
+
+import fake_pveproxy
+from conftest import runPlugin
+
+CATEGORIES = [["-i", "host-version"], ["-i", "storage-status", "-w", "80", "-c", "90"], ["-i", "backup-status", "-w", "24", "-c", "48"]]
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    if shutil.which("openssl") is None:
+        pytest.skip("openssl not installed")
+    directory = tmp_path_factory.mktemp("tls")
+    cert, key = str(directory / "cert.pem"), str(directory / "key.pem")
+    subprocess.run(["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "2", "-subj", "/CN=127.0.0.1",
+        "-addext", "subjectAltName=IP:127.0.0.1", "-keyout", key, "-out", cert], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    with open(cert, "r") as f:
+        fingerprint = hashlib.sha256(ssl.PEM_cert_to_DER_cert(f.read())).hexdigest()
+    return cert, key, ":".join(fingerprint[i:i + 2] for i in range(0, len(fingerprint), 2)).upper()
+
+@pytest.fixture
+def server(fixtures, certificate):
+    cert, key, fingerprint = certificate
+    args = fake_pveproxy.getParser().parse_args([fixtures, "--cert", cert, "--key", key])
+    server = fake_pveproxy.createServer(args, 0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = "https://127.0.0.1:" + str(server.server_address[1])
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def writeConfig(tmp_path, **options):
+    filename = tmp_path / "proxmox-api.ini"
+    filename.write_text("[api]\n" + "".join(name + " = " + value + "\n" for name, value in options.items()))
+    return str(filename)
+
+def runCheck(category, config, backend="api", replayDir=""):
+    return runPlugin("check_proxmox.py", category + ["--backend", backend, "--api-config", config, "--no-cache", "--pmxcfs", "off", "--workers", "1"], NCM_REPLAY=replayDir)
+
+@pytest.mark.parametrize("category", CATEGORIES)
+def testTokenSameAsPvesh(tmp_path, fixtures, certificate, server, category):
+    config = writeConfig(tmp_path, url=server.url, token=fake_pveproxy.TOKEN, verify=certificate[0])
+    assert runCheck(category, config) == runCheck(category, config, "pvesh", fixtures)
+    assert server.stats["requests"] > 0
+
+def testOneConnectionPerRun(tmp_path, certificate, server):
+    config = writeConfig(tmp_path, url=server.url, token=fake_pveproxy.TOKEN, verify=certificate[0])
+    code, message = runCheck(["-i", "backup-status", "-w", "24", "-c", "48"], config)
+    assert code in (0, 1, 2), message
+    assert server.stats["requests"] > 3
+    assert server.stats["connections"] == 1
+
+def testTicketWithCsrfHeader(tmp_path, fixtures, certificate, server):
+    config = writeConfig(tmp_path, url=server.url, user=fake_pveproxy.USER, password=fake_pveproxy.PASSWORD, verify=certificate[0])
+    category = ["-i", "storage-status", "-w", "80", "-c", "90"]
+    # the fake refuses ticket requests without CSRFPreventionToken
+    assert runCheck(category, config) == runCheck(category, config, "pvesh", fixtures)
+    assert server.stats["tickets"] == 1
+
+def testWrongPassword(tmp_path, certificate, server):
+    config = writeConfig(tmp_path, url=server.url, user=fake_pveproxy.USER, password="wrong", verify=certificate[0])
+    code, message = runCheck(["-i", "host-version"], config)
+    assert code == 3
+    assert "401" in message
+
+def testPinnedFingerprint(tmp_path, fixtures, certificate, server):
+    config = writeConfig(tmp_path, url=server.url, token=fake_pveproxy.TOKEN, fingerprint=certificate[2])
+    assert runCheck(["-i", "host-version"], config) == runCheck(["-i", "host-version"], config, "pvesh", fixtures)
+
+def testWrongFingerprint(tmp_path, certificate, server):
+    config = writeConfig(tmp_path, url=server.url, token=fake_pveproxy.TOKEN, fingerprint="00" * 32)
+    code, message = runCheck(["-i", "host-version"], config)
+    assert code == 3
+    assert server.stats["requests"] == 0
+
+def testUnknownCertificate(tmp_path, certificate, server):
+    # system CAs do not know the self-signed certificate
+    config = writeConfig(tmp_path, url=server.url, token=fake_pveproxy.TOKEN, verify="yes")
+    code, message = runCheck(["-i", "host-version"], config)
+    assert code == 3
+    assert server.stats["requests"] == 0
+
+@pytest.mark.parametrize("options", [{"token": "monitoring@pve!ncm=wrong"}, {"user": fake_pveproxy.USER, "password": "wrong"}, {"fingerprint": "00" * 32}])
+def testFallbackToPvesh(tmp_path, fixtures, certificate, server, options):
+    config = writeConfig(tmp_path, url=server.url, verify=certificate[0], **options)
+    category = ["-i", "storage-status", "-w", "80", "-c", "90"]
+    code, message = runCheck(category, config, "auto", fixtures)
+    assert (code, message) == runCheck(category, config, "pvesh", fixtures)
+    assert code != 3
+
+def testFallbackWithoutServer(tmp_path, fixtures):
+    config = writeConfig(tmp_path, url="https://127.0.0.1:9", token=fake_pveproxy.TOKEN, verify="no", timeout="2")
+    category = ["-i", "host-version"]
+    assert runCheck(category, config, "auto", fixtures) == runCheck(category, config, "pvesh", fixtures)
+
+def testWithoutConfigUsesPvesh(tmp_path, fixtures):
+    config = str(tmp_path / "missing.ini")
+    code, message = runCheck(["-i", "host-version"], config, "auto", fixtures)
+    assert code == 0, message
+    code, message = runCheck(["-i", "host-version"], config, "api", fixtures)
+    assert code == 3
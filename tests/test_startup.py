@@ -0,0 +1,44 @@
+###################################################
+#
+# Name: tests/test_startup.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Lazy imports of check_proxmox.py and tools/benchmark_startup.py with
+# the fake apcupsd, docker and Scalelite servers.
+#
+###################################################
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import PLUGINS, TOOLS, getEnvironment
+
+# passive only registers its options for --help, everything else waits for the first backend call
+LAZY = ["ceph", "collector", "history", "parallel", "pmxcfs", "process", "replay", "timing"]
+
+def getImports(arguments, **variables):
+    process = subprocess.run([sys.executable, "-X", "importtime", os.path.join(PLUGINS, "check_proxmox.py")] + arguments,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=getEnvironment(**variables), timeout=60)
+    return set(line.split("|")[-1].strip() for line in process.stderr.decode("utf-8").splitlines() if line.startswith("import time:"))
+
+def testHelpImportsNoBackend():
+    imports = getImports(["--help"])
+    for name in LAZY:
+        assert "ncm_plugin." + name not in imports
+
+def testPveshImportsNoCeph(fixtures):
+    imports = getImports(["-i", "host-version", "--no-cache", "--backend", "pvesh", "--pmxcfs", "off"], NCM_REPLAY=fixtures)
+    assert "ncm_plugin.replay" in imports
+    for name in ["ceph", "history", "pmxcfs"]:
+        assert "ncm_plugin." + name not in imports
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs unix sockets")
+def testBenchmarkModesExitOk():
+    process = subprocess.run([sys.executable, os.path.join(TOOLS, "benchmark_startup.py"), "--runs", "1"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=getEnvironment(), timeout=300)
+    assert process.returncode == 0, process.stderr.decode("utf-8")
+    assert "FAILED" not in process.stderr.decode("utf-8")
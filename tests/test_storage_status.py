@@ -0,0 +1,26 @@
+###################################################
+#
+# Name: tests/test_storage_status.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# storage-status of check_proxmox.py: the exit state follows the worst
+# storage line (usages of the fixtures: 39, 85, 80, 47, 62 and 59%).
+#
+###################################################
+
+import pytest
+
+from conftest import runPlugin
+
+@pytest.mark.parametrize("warning,critical,code,summary", [
+    ("95", "99", 0, "OK - Storage OK!"),
+    ("50", "90", 1, "WARNING - Storage warning. Please check:"),
+    ("80", "85", 2, "CRITICAL - Storage critical. Please check:"),
+])
+def testStateOfWorstStorage(fixtures, warning, critical, code, summary):
+    result = runPlugin("check_proxmox.py", ["-i", "storage-status", "-w", warning, "-c", critical, "--no-cache", "--backend", "pvesh", "--pmxcfs", "off"], NCM_REPLAY=fixtures)
+    assert result[0] == code, result[1]
+    assert result[1].startswith(summary)
+    if code == 2:
+        assert "[CRITICAL] Name: local-lvm, Usage: 85%" in result[1]
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+###################################################
+#
+# Name: benchmark_replay.py
+# Version: 1.0
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Runs every --info category of check_proxmox.py and check_pbs.py
+# against replay fixtures (see tools/generate_fixtures.py) and reports
+# wall time, backend calls (= forks without replay) and peak RSS. With
+# --max-wall-ms, --max-calls or --max-rss-kb it exits with 1 if a
+# category exceeds the limit, an UNKNOWN or a crash always fails.
+# --history runs with a usage history of 30 days per storage, OSD and
+# datastore (and adds storage-status/osd-status with forecast thresholds).
+#
+###################################################
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmark_startup import LIBRARY, PLUGINS, PROXMOX_CATEGORIES, PBS_CATEGORIES
+
+sys.path.insert(0, LIBRARY)
+
+MODES = []
+MODES += [("check_proxmox.py", ["-i", category, "-w", "80", "-c", "90", "--no-cache", "--backend", "pvesh"]) for category in PROXMOX_CATEGORIES]
+MODES += [("check_pbs.py", ["-i", category, "-w", "30", "-c", "10"]) for category in PBS_CATEGORIES]
+
+# only measured with --history
+FORECAST_MODES = [("check_proxmox.py", ["-i", category, "-w", "80", "-c", "90", "--no-cache", "--backend", "pvesh", "--forecast-warning", "30", "--forecast-critical", "7"]) for category in ["storage-status", "osd-status"]]
+
+def fillHistory(directory):
+    # every metric of the warm-up runs gets a full ring of growing samples,
+    # the newest one recent enough that the timed runs do not append
+    from ncm_plugin import history
+
+    now = time.time()
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".ring"):
+            continue
+        f, buffer = history.openRing(os.path.join(directory, name))
+        try:
+            timestamp, used, total = history.getLast(buffer)
+            history.HEADER.pack_into(buffer, 0, history.MAGIC, history.VERSION, history.SLOTS, 0)
+            for index in range(history.SLOTS):
+                history.append(buffer, now - 60 - (history.SLOTS - 1 - index) * history.INTERVAL, used * (0.8 + 0.2 * index / history.SLOTS), total)
+        finally:
+            buffer.close()
+            f.close()
+
+def runOnce(command, environment, logfile):
+    open(logfile, "w").close()
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=environment)
+    # wait4 gives the resource usage of exactly this child
+    pid, status, usage = os.wait4(process.pid, 0)
+    wall = (time.perf_counter() - start) * 1000
+    stderr = process.stderr.read().decode("utf-8", "replace")
+    process.stderr.close()
+    with open(logfile, "r") as f:
+        calls = sum(1 for line in f)
+    return {"wall": wall, "calls": calls, "rss": usage.ru_maxrss, "exit_code": os.waitstatus_to_exitcode(status), "stderr": stderr}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("fixtures", help="Directory with replay fixtures")
+    parser.add_argument("--runs", help="Runs per category, the median is reported", type=int, default=5)
+    parser.add_argument("--plugin", help="Only benchmark this plugin (can be repeated)", action="append", default=[])
+    parser.add_argument("--json", help="Print the results as JSON", action="store_true")
+    parser.add_argument("--max-wall-ms", help="Fail if a category takes longer", type=float)
+    parser.add_argument("--max-calls", help="Fail if a category makes more backend calls", type=int)
+    parser.add_argument("--max-rss-kb", help="Fail if a category needs more memory", type=int)
+    parser.add_argument("--history", help="Run with 30 days of usage history and forecasts", action="store_true")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="ncm-benchmark-")
+    try:
+        logfile = os.path.join(directory, "calls.log")
+        environment = dict(os.environ)
+        environment["PYTHONPATH"] = LIBRARY
+        environment["NCM_REPLAY"] = os.path.abspath(args.fixtures)
+        environment["NCM_REPLAY_LOG"] = logfile
+        environment["NCM_COLLECTOR_SOCKET"] = ""
+        environment["NCM_HISTORY_DIR"] = ""
+
+        modes = [(plugin, arguments) for plugin, arguments in MODES + (FORECAST_MODES if args.history else []) if not args.plugin or plugin in args.plugin]
+        if args.history:
+            environment["NCM_HISTORY_DIR"] = os.path.join(directory, "history")
+            for plugin, arguments in modes:
+                runOnce([sys.executable, os.path.join(PLUGINS, plugin)] + arguments, environment, logfile)
+            fillHistory(environment["NCM_HISTORY_DIR"])
+
+        results = []
+        for plugin, arguments in modes:
+            command = [sys.executable, os.path.join(PLUGINS, plugin)] + arguments
+            runs = [runOnce(command, environment, logfile) for i in range(args.runs)]
+            results.append({
+                "plugin": plugin,
+                "mode": " ".join(arguments[:2]) + (" forecast" if "--forecast-warning" in arguments else ""),
+                "wall_ms": round(statistics.median(run["wall"] for run in runs), 1),
+                "backend_calls": runs[-1]["calls"],
+                "peak_rss_kb": max(run["rss"] for run in runs),
+                "exit_code": runs[-1]["exit_code"],
+            })
+            if runs[-1]["exit_code"] not in (0, 1, 2):
+                print(plugin + " " + " ".join(arguments) + " failed:\n" + runs[-1]["stderr"], file=sys.stderr)
+    finally:
+        shutil.rmtree(directory)
+
+    failed = []
+    for result in results:
+        # the fixtures answer every call, UNKNOWN means the plugin is broken
+        if result["exit_code"] not in (0, 1, 2):
+            failed.append((result, "exited with " + str(result["exit_code"])))
+        if args.max_wall_ms is not None and result["wall_ms"] > args.max_wall_ms:
+            failed.append((result, "took " + str(result["wall_ms"]) + " ms"))
+        if args.max_calls is not None and result["backend_calls"] > args.max_calls:
+            failed.append((result, "made " + str(result["backend_calls"]) + " backend calls"))
+        if args.max_rss_kb is not None and result["peak_rss_kb"] > args.max_rss_kb:
+            failed.append((result, "needed " + str(result["peak_rss_kb"]) + " KB"))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("%-18s %-32s %10s %8s %12s %5s" % ("Plugin", "Mode", "Wall ms", "Calls", "Peak RSS KB", "Exit"))
+        for result in results:
+            print("%-18s %-32s %10.1f %8d %12d %5d" % (result["plugin"], result["mode"], result["wall_ms"], result["backend_calls"], result["peak_rss_kb"], result["exit_code"]))
+
+    for result, reason in failed:
+        print("REGRESSION: " + result["plugin"] + " " + result["mode"] + " " + reason, file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+###################################################
+#
+# Name: benchmark_startup.py
+# Version: 1.0
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Startup benchmark of the NCM plugins. Runs every plugin and mode with
+# "python3 -X importtime" against stub backend commands and reports the
+# import time and the wall clock per run. apcupsd, docker and the
+# Scalelite Redis/BBB API are not commands but sockets, for them the
+# fakes of this directory run in the background. A mode that does not
+# exit with 0 fails the benchmark, its timing would not mean anything.
+#
+###################################################
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import fake_apcupsd
+import fake_docker
+import fake_scalelite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGINS = os.path.join(ROOT, "usr", "lib", "nagios", "plugins")
+LIBRARY = os.path.join(ROOT, "usr", "lib", "python3", "dist-packages")
+
+PROXMOX_CATEGORIES = ["host-version", "cluster-status", "ceph-status", "storage-status", "disk-status", "vms-status", "backup-status", "osd-status", "guest-health"]
+PBS_CATEGORIES = ["host-version", "disk-status", "datastore-status", "garbage-collection-status", "datastores"]
+APC_FIELDS = ["STATUS", "LINEV", "LOADPCT", "BCHARGE", "TIMELEFT", "BATTDATE"]
+
+MODES = []
+MODES += [("check_proxmox.py", ["-i", category, "-w", "80", "-c", "90", "--no-cache", "--backend", "pvesh"]) for category in PROXMOX_CATEGORIES]
+MODES += [("check_pbs.py", ["-i", category, "-w", "30", "-c", "10"]) for category in PBS_CATEGORIES]
+MODES += [("check_usb_apc.py", ["-i", field, "-H", "{apcupsd}", "--backend", "nis", "--cache-ttl", "0"]) for field in APC_FIELDS]
+MODES += [("check_docker.py", ["--name", "web"])]
+MODES += [("check_bbb_cluster.py", ["--backend", "redis", "--config", "{scalelite}"])]
+MODES += [("check_linux_memory", ["-w", "20", "-c", "10", "--state-file", ""])]
+
+# Minimal valid answers of the backend commands, first match of the argv prefix wins
+STUBS = [
+    (["pvesh", "get", "/version"], '{"version": "8.2.4"}'),
+    (["pvesh", "get", "/cluster/ceph/status"], '{"health": {"status": "HEALTH_OK"}}'),
+    (["pvesh"], "[]"),
+    (["ceph"], '{"nodes": []}'),
+    (["proxmox-backup-manager", "versions"], '[{"Package": "proxmox-backup-server", "Version": "3.2.7", "OldVersion": "3.2.7", "ExtraInfo": "running version: 3.2.7"}]'),
+    (["proxmox-backup-manager"], "[]"),
+    (["proxmox-backup-debug"], "[]"),
+]
+
+STUB = """#!/usr/bin/env python3
+import json, os, sys
+argv = [os.path.basename(sys.argv[0])] + sys.argv[1:]
+for prefix, output in json.loads(os.environ["NCM_BENCHMARK_STUBS"]):
+    if argv[:len(prefix)] == prefix:
+        sys.stdout.write(output)
+        break
+"""
+
+def createStubs(directory):
+    with open(os.path.join(directory, "stub"), "w") as f:
+        f.write(STUB)
+    os.chmod(os.path.join(directory, "stub"), 0o755)
+    with open(os.path.join(directory, "sudo"), "w") as f:
+        # "sudo /usr/sbin/proxmox-backup-manager ..." runs the stub of the same name
+        f.write('#!/bin/sh\ncommand="$(basename "$1")"\nshift\nexec "$command" "$@"\n')
+    os.chmod(os.path.join(directory, "sudo"), 0o755)
+    for name in ["pvesh", "ceph", "proxmox-backup-manager", "proxmox-backup-debug"]:
+        os.symlink("stub", os.path.join(directory, name))
+
+def startFakes(directory):
+    # {placeholder: value} for the arguments of MODES and the servers to shut down
+    servers = []
+    apcupsd = fake_apcupsd.Server(("127.0.0.1", 0), fake_apcupsd.createHandler(0, 0, 0, False))
+    servers.append(apcupsd)
+    servers.append(fake_docker.createServer(os.path.join(directory, "docker.sock"), fake_docker.createContainers(20, 1)))
+    scalelite = fake_scalelite.createServers(20, 1)
+    redis = fake_scalelite.Server(("127.0.0.1", 0), fake_scalelite.createRedisHandler(scalelite, False))
+    http = fake_scalelite.Server(("127.0.0.1", 0), fake_scalelite.createHttpHandler(scalelite, False))
+    servers += [redis, http]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with open(os.path.join(directory, "scalelite.ini"), "w") as f:
+        f.write("[redis]\nurl = redis://127.0.0.1:" + str(redis.server_address[1]) + "/0\n")
+    placeholders = {
+        "apcupsd": "127.0.0.1:" + str(apcupsd.server_address[1]),
+        "scalelite": os.path.join(directory, "scalelite.ini"),
+        "proxy": "http://127.0.0.1:" + str(http.server_address[1]),
+    }
+    return placeholders, servers
+
+def parseImportTime(stderr):
+    # sum of the cumulative time of all top level imports in microseconds
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            total += int(cumulative)
+    return total
+
+def runMode(plugin, arguments, environment, runs, placeholders):
+    command = [sys.executable, "-X", "importtime", os.path.join(PLUGINS, plugin)] + [argument.format(**placeholders) for argument in arguments]
+    walls = []
+    imports = []
+    for i in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(command, capture_output=True, text=True, env=environment, check=False)
+        walls.append((time.perf_counter() - start) * 1000)
+        imports.append(parseImportTime(result.stderr) / 1000)
+    return {
+        "plugin": plugin,
+        "mode": " ".join(arguments[:2]) if arguments else "-",
+        "import_ms": round(statistics.median(imports), 1),
+        "wall_ms": round(statistics.median(walls), 1),
+        "exit_code": result.returncode,
+        "output": result.stdout.splitlines()[0] if result.stdout else "",
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", help="Runs per plugin and mode, the median is reported", type=int, default=5)
+    parser.add_argument("--plugin", help="Only benchmark this plugin (can be repeated)", action="append", default=[])
+    parser.add_argument("--json", help="Print the results as JSON", action="store_true")
+    parser.add_argument("--max-import-ms", help="Fail if a mode spends more time importing modules", type=float)
+    parser.add_argument("--max-wall-ms", help="Fail if a mode takes longer", type=float)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="ncm-benchmark-")
+    servers = []
+    try:
+        createStubs(directory)
+        placeholders, servers = startFakes(directory)
+        environment = dict(os.environ)
+        environment["PATH"] = directory + os.pathsep + environment.get("PATH", "")
+        environment["PYTHONPATH"] = LIBRARY
+        environment["NCM_BENCHMARK_STUBS"] = json.dumps(STUBS)
+        environment["NCM_COLLECTOR_SOCKET"] = ""
+        environment["NCM_HISTORY_DIR"] = ""
+        environment["DOCKER_HOST"] = "unix://" + os.path.join(directory, "docker.sock")
+        # the BBB servers of fake_scalelite are only reachable through its HTTP side
+        environment["HTTP_PROXY"] = placeholders["proxy"]
+        environment["NO_PROXY"] = ""
+
+        results = []
+        for plugin, arguments in MODES:
+            if args.plugin and plugin not in args.plugin:
+                continue
+            results.append(runMode(plugin, arguments, environment, args.runs, placeholders))
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+        shutil.rmtree(directory)
+
+    failed = []
+    broken = [result for result in results if result["exit_code"] != 0]
+    for result in results:
+        if args.max_import_ms is not None and result["import_ms"] > args.max_import_ms:
+            failed.append(result)
+        elif args.max_wall_ms is not None and result["wall_ms"] > args.max_wall_ms:
+            failed.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("%-22s %-32s %10s %10s %5s" % ("Plugin", "Mode", "Import ms", "Wall ms", "Exit"))
+        for result in results:
+            print("%-22s %-32s %10.1f %10.1f %5d" % (result["plugin"], result["mode"], result["import_ms"], result["wall_ms"], result["exit_code"]))
+
+    for result in broken:
+        print("FAILED: " + result["plugin"] + " " + result["mode"] + " exited with " + str(result["exit_code"]) + ": " + result["output"], file=sys.stderr)
+    for result in failed:
+        print("REGRESSION: " + result["plugin"] + " " + result["mode"] + " exceeds the limit", file=sys.stderr)
+    sys.exit(1 if failed or broken else 0)
+
+if __name__ == "__main__":
+    main()
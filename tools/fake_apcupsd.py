@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+###################################################
+#
+# Name: fake_apcupsd.py
+# Version: 1.0
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Local apcupsd network information server (NIS) to test check_usb_apc.py,
+# one UPS per port:
+#
+#   tools/fake_apcupsd.py --port 3551 --port 3552 --port 3553 --delay 0.5 &
+#   check_usb_apc.py -H 127.0.0.1:3551 -H 127.0.0.1:3552 -H 127.0.0.1:3553 \
+#       -i STATUS,LOADPCT,BCHARGE --threshold LOADPCT=70,90 --threshold BCHARGE=50,20
+#
+# The UPS on the second port runs on battery. Every status request is
+# written to stderr with --verbose.
+#
+###################################################
+
+import argparse
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+def getRecord(index, port):
+    onBattery = index == 1
+    values = [
+        ("APC", "001,036,0879"),
+        ("DATE", time.strftime("%Y-%m-%d %H:%M:%S +0000", time.gmtime())),
+        ("HOSTNAME", "fake"),
+        ("VERSION", "3.14.14 (31 May 2016) debian"),
+        ("UPSNAME", "ups%02d" % (index + 1)),
+        ("CABLE", "USB Cable"),
+        ("DRIVER", "USB UPS Driver"),
+        ("UPSMODE", "Stand Alone"),
+        ("MODEL", "Smart-UPS 1500"),
+        ("STATUS", "ONBATT" if onBattery else "ONLINE"),
+        ("LINEV", "0.0 Volts" if onBattery else "231.0 Volts"),
+        ("LOADPCT", "%.1f Percent" % (27.0 + index * 30)),
+        ("BCHARGE", "%.1f Percent" % (42.0 if onBattery else 100.0)),
+        ("TIMELEFT", "%.1f Minutes" % (11.0 if onBattery else 38.0)),
+        ("BATTDATE", "2023-04-12"),
+        ("END APC", time.strftime("%Y-%m-%d %H:%M:%S +0000", time.gmtime())),
+    ]
+    return ["%-9s: %s\n" % (key, value) for key, value in values]
+
+def createHandler(index, port, delay, verbose):
+    class Handler(socketserver.BaseRequestHandler):
+        def handle(self):
+            while True:
+                header = self.request.recv(2)
+                if len(header) < 2:
+                    return
+                command = self.request.recv(struct.unpack(">H", header)[0]).decode("ascii")
+                if verbose:
+                    print("port " + str(port) + ": " + command, file=sys.stderr)
+                time.sleep(delay)
+                lines = getRecord(index, port) if command == "status" else ["Not implemented\n"]
+                self.request.sendall(b"".join(struct.pack(">H", len(line)) + line.encode() for line in lines) + struct.pack(">H", 0))
+    return Handler
+
+class Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake apcupsd network information server")
+    parser.add_argument("--port", type=int, action="append", default=[])
+    parser.add_argument("--delay", type=float, default=0, help="Seconds before every answer")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    servers = [Server(("127.0.0.1", port), createHandler(index, port, args.delay, args.verbose)) for index, port in enumerate(args.port or [3551])]
+    for server in servers[1:]:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    servers[0].serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+###################################################
+#
+# Name: fake_docker.py
+# Version: 1.0
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Local stand-in for the docker daemon on a unix socket, enough for
+# check_docker.py and ncm_plugin.containers:
+#
+#   tools/fake_docker.py --socket /tmp/docker.sock --containers 20 &
+#   DOCKER_HOST=unix:///tmp/docker.sock check_docker.py --name web
+#
+# GET /containers/json (running only unless all=1) and
+# /containers/<id>/json. The first container is called "web", every
+# seventh container has exited.
+#
+# GET /events streams the events given to addEvent() like dockerd: past
+# events from since on (inclusive, "seconds.nanoseconds"), then new ones
+# until "until" or disconnect() ends the stream. Only the type filter is
+# supported.
+#
+###################################################
+
+import argparse
+import json
+import os
+import random
+import socketserver
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+def createContainers(count, seed):
+    rnd = random.Random(seed)
+    containers = []
+    for i in range(count):
+        running = i % 7 != 6
+        started = time.time() - rnd.randint(60, 86400 * 30)
+        containers.append({
+            "Id": "%064x" % rnd.getrandbits(256),
+            "Names": ["/web" if i == 0 else "/app%03d" % i],
+            "Image": rnd.choice(["nginx:1.25", "postgres:16", "redis:7", "registry:2"]),
+            "State": "running" if running else "exited",
+            "Status": "Up" if running else "Exited (1)",
+            "Created": int(started) - 5,
+            "StartedAt": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(started)) + ".123456789Z",
+        })
+    return containers
+
+def getListEntry(container):
+    # /containers/json has no start time, only the creation time
+    return dict((key, value) for key, value in container.items() if key != "StartedAt")
+
+def getInspect(container):
+    return {
+        "Id": container["Id"],
+        "Name": container["Names"][0],
+        "Config": {"Image": container["Image"]},
+        "State": {"Status": container["State"], "Running": container["State"] == "running", "StartedAt": container["StartedAt"]},
+    }
+
+def parseTime(value):
+    # "seconds[.nanoseconds]" to nanoseconds
+    seconds, sep, fraction = value.partition(".")
+    return int(seconds) * 1000000000 + int((fraction + "000000000")[:9])
+
+def createEvent(action, container, nano=None, **attributes):
+    # container event as dockerd sends it, attributes e.g. exitCode="137"
+    if nano is None:
+        nano = time.time_ns()
+    attributes = dict(attributes, name=container["Names"][0].lstrip("/"), image=container["Image"])
+    return {
+        "Type": "container",
+        "Action": action,
+        "Actor": {"ID": container["Id"], "Attributes": attributes},
+        "status": action,
+        "id": container["Id"],
+        "from": container["Image"],
+        "time": nano // 1000000000,
+        "timeNano": nano,
+    }
+
+def addEvent(server, event):
+    with server.condition:
+        server.events.append(event)
+        server.condition.notify_all()
+
+def disconnect(server):
+    # ends all open /events streams, like a restart of dockerd
+    with server.condition:
+        server.disconnects += 1
+        server.condition.notify_all()
+
+class DockerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        return "docker.sock"
+
+    def answer(self, code, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def sendChunk(self, data):
+        self.wfile.write(("%x\r\n" % len(data)).encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def streamEvents(self, query):
+        since = parseTime(query["since"][0]) if "since" in query else None
+        until = parseTime(query["until"][0]) if "until" in query else None
+        types = json.loads(query.get("filters", ["{}"])[0]).get("type")
+        self.server.stats["events"] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        condition = self.server.condition
+        with condition:
+            disconnects = self.server.disconnects
+            # without since only new events, as dockerd
+            index = 0 if since is not None else len(self.server.events)
+        while True:
+            with condition:
+                while index >= len(self.server.events) and self.server.disconnects == disconnects and (until is None or time.time_ns() < until):
+                    condition.wait(0.1)
+                pending = self.server.events[index:]
+                index = len(self.server.events)
+                closed = self.server.disconnects != disconnects
+            for event in pending:
+                if since is not None and event["timeNano"] < since or until is not None and event["timeNano"] > until:
+                    continue
+                if types and event["Type"] not in types:
+                    continue
+                self.sendChunk(json.dumps(event).encode("utf-8") + b"\n")
+            if closed or until is not None and time.time_ns() >= until:
+                break
+        self.wfile.write(b"0\r\n\r\n")
+        self.close_connection = True
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        # "/v1.24/containers/json" and "/containers/json"
+        parts = [part for part in url.path.split("/") if part and not part.startswith("v1.")]
+        self.server.stats["requests"] += 1
+        if self.server.verbose:
+            print("GET " + self.path, file=sys.stderr)
+        if parts == ["events"]:
+            return self.streamEvents(query)
+        if parts == ["containers", "json"]:
+            everything = query.get("all", ["0"])[0] in ("1", "true", "True")
+            return self.answer(200, [getListEntry(container) for container in self.server.containers if everything or container["State"] == "running"])
+        if len(parts) == 3 and parts[0] == "containers" and parts[2] == "json":
+            self.server.stats["inspects"] += 1
+            for container in self.server.containers:
+                if container["Id"].startswith(parts[1]) or container["Names"][0] == "/" + parts[1]:
+                    return self.answer(200, getInspect(container))
+            return self.answer(404, {"message": "No such container: " + parts[1]})
+        self.answer(404, {"message": "page not found"})
+
+    def log_message(self, *args):
+        pass
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def createServer(path, containers, verbose=False):
+    # server.containers can be changed while it runs, server.stats counts the requests, inspects and /events streams
+    if os.path.exists(path):
+        os.unlink(path)
+    server = Server(path, DockerHandler)
+    server.containers = containers
+    server.events = []
+    server.condition = threading.Condition()
+    server.disconnects = 0
+    server.verbose = verbose
+    server.stats = {"requests": 0, "events": 0, "inspects": 0}
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake docker daemon on a unix socket")
+    parser.add_argument("--socket", default="/tmp/docker.sock")
+    parser.add_argument("--containers", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    createServer(args.socket, createContainers(args.containers, args.seed), args.verbose).serve_forever()
+
+if __name__ == "__main__":
+    main()
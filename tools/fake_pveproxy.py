@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+###################################################
+#
+# Name: fake_pveproxy.py
+# Version: 1.0
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Local stand-in for pveproxy to test the API backend of check_proxmox.py.
+# GET /api2/json/<path> is answered from the pvesh fixtures of
+# tools/generate_fixtures.py (or NCM_RECORD), so API and pvesh give the
+# same data:
+#
+#   tools/fake_pveproxy.py /tmp/fixtures --port 8006 --cert cert.pem --key key.pem &
+#   check_proxmox.py -i storage-status -w 80 -c 90 --backend api --api-config api.ini
+#
+# Authentication like pveproxy: "Authorization: PVEAPIToken=<--token>" or
+# a ticket from POST /access/ticket (--user/--password) as PVEAuthCookie.
+# Unlike pveproxy, ticket requests need the CSRFPreventionToken header for
+# GET as well, so a client that forgets it fails. Without --cert the
+# server speaks plain HTTP.
+#
+###################################################
+
+import argparse
+import json
+import os
+import socketserver
+import ssl
+import sys
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "usr", "lib", "python3", "dist-packages"))
+
+from ncm_plugin import replay
+
+TOKEN = "monitoring@pve!ncm=8d0b6f2e-0c55-4c0e-a8a5-2d4b3f6e9a11"
+USER = "monitoring@pve"
+PASSWORD = "monitoring"
+TICKET = "PVE:monitoring@pve:6700AA00::fake-ticket"
+CSRF = "6700AA00:fake-csrf-token"
+
+def getKey(path, query):
+    # argv of the pvesh call check_proxmox.py would make for this request
+    key = ["sudo", "pvesh", "get", path]
+    for name, value in parse_qsl(query, keep_blank_values=True):
+        key += ["--" + name, value]
+    return key + ["--output-format", "json"]
+
+def loadFixture(directory, key):
+    filename = replay.getFixtureFile(directory, key)
+    if not os.path.exists(filename) and key[-3] == "1":
+        # flags like "--full" arrive as full=1
+        filename = replay.getFixtureFile(directory, key[:-3] + key[-2:])
+    with open(filename, "r") as f:
+        result = json.load(f)["result"]
+    if result["returncode"] != 0:
+        raise OSError("pvesh fixture failed")
+    return json.loads(result["stdout"])
+
+def createHandler(args, stats):
+    class ProxyHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            stats["connections"] += 1
+            if args.verbose:
+                print("connect", file=sys.stderr)
+
+        def answer(self, code, data):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json;charset=UTF-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def authorized(self):
+            if self.headers.get("Authorization") == "PVEAPIToken=" + args.token:
+                return True
+            cookies = dict(part.strip().split("=", 1) for part in self.headers.get("Cookie", "").split(";") if "=" in part)
+            return cookies.get("PVEAuthCookie") == TICKET and self.headers.get("CSRFPreventionToken") == CSRF
+
+        def do_POST(self):
+            stats["requests"] += 1
+            length = int(self.headers.get("Content-Length", 0))
+            form = parse_qs(self.rfile.read(length).decode("utf-8"))
+            if urlsplit(self.path).path != "/api2/json/access/ticket":
+                return self.answer(501, {"data": None})
+            if form.get("username", [""])[0] != args.user or form.get("password", [""])[0] != args.password:
+                return self.answer(401, {"data": None, "message": "authentication failure"})
+            stats["tickets"] += 1
+            self.answer(200, {"data": {"ticket": TICKET, "CSRFPreventionToken": CSRF, "username": args.user}})
+
+        def do_GET(self):
+            stats["requests"] += 1
+            url = urlsplit(self.path)
+            if args.verbose:
+                print("GET " + self.path, file=sys.stderr)
+            if not self.authorized():
+                return self.answer(401, {"data": None, "message": "no ticket"})
+            if not url.path.startswith("/api2/json/"):
+                return self.answer(404, {"data": None})
+            try:
+                data = loadFixture(args.fixtures, getKey(url.path[len("/api2/json"):], url.query))
+            except (OSError, ValueError):
+                return self.answer(500, {"data": None, "message": "no fixture"})
+            self.answer(200, {"data": data})
+
+        def log_message(self, *args):
+            pass
+    return ProxyHandler
+
+class Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def createServer(args, port=None):
+    # server with the statistics of the requests in server.stats, port 0 = any free port
+    stats = {"connections": 0, "requests": 0, "tickets": 0}
+    server = Server(("127.0.0.1", args.port if port is None else port), createHandler(args, stats))
+    server.stats = stats
+    if args.cert:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(args.cert, args.key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    return server
+
+def getParser():
+    parser = argparse.ArgumentParser(description="Fake pveproxy answering from pvesh fixtures")
+    parser.add_argument("fixtures", help="Directory of the pvesh fixtures")
+    parser.add_argument("--port", type=int, default=8006)
+    parser.add_argument("--cert", help="TLS certificate (PEM), plain HTTP without")
+    parser.add_argument("--key", help="TLS key (PEM)")
+    parser.add_argument("--token", default=TOKEN, help="Accepted API token (USER@REALM!ID=SECRET)")
+    parser.add_argument("--user", default=USER)
+    parser.add_argument("--password", default=PASSWORD)
+    parser.add_argument("--verbose", action="store_true")
+    return parser
+
+def main():
+    createServer(getParser().parse_args()).serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+###################################################
+#
+# Name: fake_rados.py
+# Version: 1.0
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Stand-in for the python3-rados module to test the rados backend of
+# check_proxmox.py without a Ceph cluster:
+#
+#   PYTHONPATH=tools:usr/lib/python3/dist-packages NCM_RADOS_MODULE=fake_rados \
+#   NCM_FAKE_RADOS=responses.json check_proxmox.py -i ceph-status --ceph-backend rados
+#
+# responses.json maps the prefix of a mon command (plus " " + output_method
+# if set, e.g. "osd df tree") to its JSON answer, {"__raw__": "..."} is
+# returned as it is (for broken JSON). Connects and commands are appended
+# to NCM_FAKE_RADOS_LOG if set. NCM_FAKE_RADOS_FAIL=1 fails the connect,
+# the commands in NCM_FAKE_RADOS_TIMEOUT (comma separated) raise TimedOut
+# like a monitor that does not answer in time.
+#
+###################################################
+
+import json
+import os
+
+class Error(Exception):
+    pass
+
+class TimedOut(Error):
+    pass
+
+def log(line):
+    if os.environ.get("NCM_FAKE_RADOS_LOG"):
+        with open(os.environ["NCM_FAKE_RADOS_LOG"], "a") as f:
+            f.write(line + "\n")
+
+class Rados:
+    def __init__(self, conffile=None, name=None, conf=None, **kwargs):
+        self.name = name
+        self.connected = False
+
+    def connect(self, timeout=0):
+        if os.environ.get("NCM_FAKE_RADOS_FAIL"):
+            raise Error("connect failed (NCM_FAKE_RADOS_FAIL)")
+        log("connect " + str(self.name))
+        self.connected = True
+
+    def mon_command(self, cmd, inbuf, timeout=0, target=None):
+        if not self.connected:
+            raise Error("not connected")
+        command = json.loads(cmd)
+        key = command["prefix"] + (" " + command["output_method"] if "output_method" in command else "")
+        log("mon_command " + key)
+        if key in os.environ.get("NCM_FAKE_RADOS_TIMEOUT", "").split(","):
+            raise TimedOut("mon_command " + key + " timed out after " + str(timeout) + " seconds")
+        with open(os.environ["NCM_FAKE_RADOS"], "r") as f:
+            responses = json.load(f)
+        if key not in responses:
+            return -22, b"", "unknown command " + key
+        if isinstance(responses[key], dict) and "__raw__" in responses[key]:
+            return 0, responses[key]["__raw__"].encode("utf-8"), ""
+        return 0, json.dumps(responses[key]).encode("utf-8"), ""
+
+    def shutdown(self):
+        log("shutdown")
+        self.connected = False
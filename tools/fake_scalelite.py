@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+###################################################
+#
+# Name: fake_scalelite.py
+# Version: 1.0
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Local stand-in for the Redis of a Scalelite cluster and the API of its
+# BBB servers, to test the redis backend of check_bbb_cluster.py:
+#
+#   tools/fake_scalelite.py --servers 50 --redis-port 6390 --http-port 8090 &
+#   printf '[redis]\nurl = redis://127.0.0.1:6390/0\n' > /tmp/scalelite.ini
+#   HTTP_PROXY=http://127.0.0.1:8090 check_bbb_cluster.py --config /tmp/scalelite.ini
+#
+# The BBB servers are http://bbbNNN.example.com/bigbluebutton/api/, the HTTP
+# side answers them as proxy. A server with "broken" set answers 500 although
+# Redis has it online. Every new HTTP connection and request is written to
+# stderr with --verbose.
+#
+###################################################
+
+import argparse
+import hashlib
+import random
+import socketserver
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+SECRET = "8cd8ef52e8e101574e400365b55e11a6"
+
+def createServers(count, seed):
+    rnd = random.Random(seed)
+    servers = {}
+    for i in range(1, count + 1):
+        state = "disabled" if i % 10 == 3 else "cordoned" if i % 13 == 0 else "enabled"
+        meetings = []
+        for m in range(rnd.randint(0, 12)):
+            meetings.append((rnd.randint(1, 80), rnd.randint(0, 10)))
+        servers["id%03d" % i] = {
+            "url": "http://bbb%03d.example.com/bigbluebutton/api/" % i,
+            "secret": SECRET,
+            "state": state,
+            "online": "false" if i % 17 == 5 else "true",
+            "load": str(len(meetings) * 1.5),
+            "meetings": meetings,
+            "version": "2.7.%d" % (i % 10),
+        }
+    return servers
+
+def encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":" + str(value).encode() + b"\r\n"
+    if isinstance(value, list):
+        return b"*" + str(len(value)).encode() + b"\r\n" + b"".join(encode(item) for item in value)
+    data = str(value).encode("utf-8")
+    return b"$" + str(len(data)).encode() + b"\r\n" + data + b"\r\n"
+
+def createRedisHandler(servers, verbose):
+    class RedisHandler(socketserver.StreamRequestHandler):
+        def readCommand(self):
+            line = self.rfile.readline()
+            if not line:
+                return None
+            args = []
+            for i in range(int(line[1:-2])):
+                length = int(self.rfile.readline()[1:-2])
+                args.append(self.rfile.read(length + 2)[:-2].decode("utf-8"))
+            return args
+
+        def handle(self):
+            while True:
+                args = self.readCommand()
+                if args is None:
+                    return
+                if verbose:
+                    print("redis " + " ".join(args), file=sys.stderr)
+                command = args[0].upper()
+                if command in ("AUTH", "SELECT", "PING"):
+                    self.wfile.write(b"+OK\r\n")
+                elif command == "SMEMBERS" and args[1] == "servers":
+                    self.wfile.write(encode(list(servers)))
+                elif command == "HGETALL" and args[1][7:] in servers:
+                    server = servers[args[1][7:]]
+                    self.wfile.write(encode([value for key in ("url", "secret", "state", "online") for value in (key, server[key])]))
+                elif command == "HGETALL":
+                    self.wfile.write(encode([]))
+                elif command == "ZSCORE" and args[2] in servers:
+                    server = servers[args[2]]
+                    cordoned = server["state"] == "cordoned"
+                    self.wfile.write(encode(server["load"] if server["state"] == "enabled" and args[1] == "server_load" or cordoned and args[1] == "cordoned_server_load" else None))
+                elif command == "ZSCORE":
+                    self.wfile.write(encode(None))
+                else:
+                    self.wfile.write(b"-ERR unknown command '" + command.encode() + b"'\r\n")
+    return RedisHandler
+
+def getMeetingsXml(server):
+    meetings = "".join("<meeting><meetingID>m%d</meetingID><participantCount>%d</participantCount><videoCount>%d</videoCount></meeting>" % (i, users, videos) for i, (users, videos) in enumerate(server["meetings"]))
+    return "<response><returncode>SUCCESS</returncode><meetings>" + meetings + "</meetings></response>"
+
+def createHttpHandler(servers, verbose):
+    byHost = dict((urlsplit(server["url"]).hostname, server) for server in servers.values())
+
+    class HttpHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            if verbose:
+                print("http connect", file=sys.stderr)
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            host = parts.hostname or self.headers.get("Host", "").split(":")[0]
+            if verbose:
+                print("http " + str(host) + " " + parts.path, file=sys.stderr)
+            server = byHost.get(host)
+            if server is None or server["online"] != "true":
+                return self.reply(502, "")
+            if server.get("broken"):
+                return self.reply(500, "")
+            action = parts.path.rstrip("/").rsplit("/", 1)[-1]
+            if action == "api":
+                return self.reply(200, "<response><returncode>SUCCESS</returncode><version>2.0</version><apiVersion>2.0</apiVersion><bbbVersion>" + server["version"] + "</bbbVersion></response>")
+            query = parse_qs(parts.query)
+            checksum = query.get("checksum", [""])[0]
+            rest = "&".join(part for part in parts.query.split("&") if not part.startswith("checksum="))
+            if checksum not in [hashlib.new(name, (action + rest + server["secret"]).encode()).hexdigest() for name in ("sha1", "sha256")]:
+                return self.reply(200, "<response><returncode>FAILED</returncode><messageKey>checksumError</messageKey><message>Checksums do not match</message></response>")
+            if action == "getMeetings":
+                return self.reply(200, getMeetingsXml(server))
+            self.reply(404, "")
+
+        def reply(self, status, body):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/xml")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+    return HttpHandler
+
+class Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Scalelite Redis and BBB API")
+    parser.add_argument("--servers", type=int, default=50)
+    parser.add_argument("--redis-port", type=int, default=6390, dest="redisport")
+    parser.add_argument("--http-port", type=int, default=8090, dest="httpport")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    servers = createServers(args.servers, args.seed)
+    redis = Server(("127.0.0.1", args.redisport), createRedisHandler(servers, args.verbose))
+    http = Server(("127.0.0.1", args.httpport), createHttpHandler(servers, args.verbose))
+    threading.Thread(target=redis.serve_forever, daemon=True).start()
+    http.serve_forever()
+
+if __name__ == "__main__":
+    main()
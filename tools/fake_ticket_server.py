@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+###################################################
+#
+# Name: fake_ticket_server.py
+# Version: 1.0
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Local stand-in for getTicket.php of the NCM master, to test the batch
+# mode of ni-ncm-agent together with tools/fake_icinga2:
+#
+#   tools/fake_ticket_server.py --port 8091 &
+#   ni-ncm-agent --inventory hosts.csv --ticket-url http://127.0.0.1:8091/tools/getTicket.php \
+#       --icinga2 tools/fake_icinga2 --output-dir /tmp/ncm-certs
+#
+# Hosts whose name starts with "fail" get an error answer. Every new
+# connection and request is written to stderr with --verbose.
+#
+###################################################
+
+import argparse
+import hashlib
+import json
+import socketserver
+import sys
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+PASSWORD = "d51c5b171d6cdfd896a2"
+
+def createHandler(delay, verbose):
+    class TicketHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            if verbose:
+                print("connect", file=sys.stderr)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            form = parse_qs(self.rfile.read(length).decode("utf-8"))
+            host = form.get("host", [""])[0]
+            if verbose:
+                print("ticket " + host, file=sys.stderr)
+            time.sleep(delay)
+            if form.get("pw", [""])[0] != PASSWORD:
+                answer = {"status": "error", "data": "wrong password"}
+            elif not host or host.startswith("fail"):
+                answer = {"status": "error", "data": "no ticket for " + host}
+            else:
+                answer = {"status": "success", "data": hashlib.sha1(("ticket " + host).encode("utf-8")).hexdigest()}
+            data = json.dumps(answer).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+    return TicketHandler
+
+class Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake NCM ticket service")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--delay", type=float, default=0, help="Seconds before every answer")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    Server(("127.0.0.1", args.port), createHandler(args.delay, args.verbose)).serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+###################################################
+#
+# Name: generate_fixtures.py
+# Version: 1.0
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Writes replay fixtures (see ncm_plugin/replay.py) of a large
+# installation: 32 node Proxmox cluster with 500 VMs, 200 OSDs, a
+# 50k line vzdump log, a PBS with 24 datastores, 300 docker containers,
+# 50 BBB servers and an APC UPS, plus a copy of /etc/pve with the
+# pmxcfs files of the cluster in <directory>/pve (--pmxcfs-dir). Recorded
+# on a real host with NCM_RECORD=<dir> the same files are written by the
+# plugins themselves.
+#
+###################################################
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "usr", "lib", "python3", "dist-packages"))
+
+from ncm_plugin import replay
+
+GB = 1024 * 1024 * 1024
+TB = 1024 * GB
+
+def pvesh(url, *append):
+    return ["sudo", "pvesh", "get", url] + list(append) + ["--output-format", "json"]
+
+def command(stdout, returncode=0):
+    return {"returncode": returncode, "stdout": stdout}
+
+def writePve(pve, name, content):
+    # file of the /etc/pve copy for --pmxcfs-dir
+    filename = os.path.join(pve, name)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, "w") as f:
+        f.write(content if isinstance(content, str) else json.dumps(content, indent=1))
+
+def getGuestConfig(vmid, cores, memory, snapshots):
+    lines = ["boot: order=scsi0", "cores: %d" % cores, "memory: %d" % memory, "name: vm-%04d" % vmid]
+    if snapshots:
+        lines.append("parent: " + snapshots[-1]["name"])
+    lines.append("scsi0: ceph-vm:vm-%d-disk-0,size=64G" % vmid)
+    for snapshot in snapshots:
+        lines += ["", "[" + snapshot["name"] + "]", "cores: %d" % cores, "memory: %d" % memory, "name: vm-%04d" % vmid, "scsi0: ceph-vm:vm-%d-disk-0,size=64G" % vmid, "snaptime: %d" % snapshot["snaptime"]]
+    return "\n".join(lines) + "\n"
+
+def generateProxmox(add, rnd, now, nodes, vms, localVms, osds, logLines, pve):
+    nodeNames = ["pve%02d" % i for i in range(1, nodes + 1)]
+    add(pvesh("/version"), {"version": "8.2.4", "release": "8.2", "repoid": "faa83925c9641325"})
+
+    status = [{"type": "cluster", "id": "cluster", "name": "cluster01", "nodes": nodes, "quorate": 1, "version": nodes + 7}]
+    for i, name in enumerate(nodeNames):
+        status.append({"type": "node", "id": "node/" + name, "name": name, "nodeid": i + 1, "ip": "10.0.0." + str(i + 11), "online": 0 if i == nodes - 1 else 1, "local": 1 if i == 0 else 0, "level": ""})
+    add(pvesh("/cluster/status"), status)
+    writePve(pve, ".members", {
+        "nodename": nodeNames[0],
+        "version": nodes + 7,
+        "cluster": {"name": "cluster01", "version": nodes + 7, "nodes": nodes, "quorate": 1},
+        "nodelist": dict((entry["name"], {"id": entry["nodeid"], "online": entry["online"], "ip": entry["ip"]}) for entry in status[1:]),
+    })
+
+    add(pvesh("/cluster/ceph/status"), {
+        "health": {"status": "HEALTH_WARN", "checks": {
+            "OSD_NEARFULL": {"severity": "HEALTH_WARN", "summary": {"message": "2 nearfull osd(s)", "count": 2}},
+            "POOL_NEARFULL": {"severity": "HEALTH_WARN", "summary": {"message": "3 pool(s) nearfull", "count": 3}},
+        }},
+        "fsid": "7a0e4c4a-2d4e-4b8e-9a6e-6b1f8c2d9e11",
+    })
+
+    storages = []
+    for name, total in [("local", 100 * GB), ("local-lvm", 800 * GB), ("ceph-vm", 400 * TB), ("ceph-fs", 50 * TB), ("pbs01", 120 * TB), ("nfs-iso", 2 * TB)]:
+        storages.append({"storage": name, "type": "rbd" if name.startswith("ceph") else "dir", "active": 1, "enabled": 1, "shared": 0 if name.startswith("local") else 1, "total": total, "used": int(total * rnd.uniform(0.3, 0.95)), "avail": 0, "content": "images,rootdir"})
+    add(pvesh("/nodes/{hostname}/storage"), storages)
+
+    disks = []
+    for i in range(24):
+        disks.append({"devpath": "/dev/sd" + chr(ord("a") + i), "vendor": "ATA     ", "model": "SAMSUNG MZ7L33T8HBLT-00A07", "serial": "S6ESNE0T" + str(100000 + i), "size": 3840755982336, "health": "PASSED" if i != 7 else "FAILED", "type": "ssd", "wearout": rnd.randint(80, 100), "used": "LVM"})
+    add(pvesh("/nodes/{hostname}/disks/list"), disks)
+
+    # local node carries a large share of the VMs, so vms-status has to query many snapshots
+    qemu = []
+    for i in range(localVms):
+        vmid = 100 + i
+        running = rnd.random() > 0.1
+        qemu.append({"vmid": vmid, "name": "vm-%04d" % vmid, "status": "running" if running else "stopped", "uptime": rnd.randint(3600, 90 * 86400) if running else 0, "cpus": rnd.choice([2, 4, 8]), "maxmem": rnd.choice([4, 8, 16]) * GB, "mem": rnd.randint(1, 4) * GB, "maxdisk": 64 * GB, "disk": 0, "cpu": rnd.random() / 4, "pid": 10000 + i})
+        snapshots = [{"name": "current", "description": "You are here!", "running": 1 if running else 0, "parent": "s0"}]
+        for s in range(rnd.choice([0, 0, 1, 2, 3])):
+            snapshots.append({"name": "snap%d" % s, "description": "", "snaptime": now - rnd.randint(1, 120) * 86400, "vmstate": 0})
+        add(pvesh("/nodes/{hostname}/qemu/" + str(vmid) + "/snapshot"), snapshots)
+        writePve(pve, "nodes/" + nodeNames[0] + "/qemu-server/" + str(vmid) + ".conf", getGuestConfig(vmid, qemu[-1]["cpus"], qemu[-1]["maxmem"] // (1024 * 1024), snapshots[1:]))
+    add(pvesh("/nodes/{hostname}/qemu"), qemu)
+
+    jobs = [
+        {"id": "backup-daily", "type": "vzdump", "enabled": 1, "schedule": "01:00", "starttime": "01:00", "storage": "pbs01", "mode": "snapshot", "all": 1},
+        {"id": "backup-weekly", "type": "vzdump", "enabled": 1, "schedule": "sat 03:30", "starttime": "03:30", "dow": "sat", "storage": "pbs01", "mode": "snapshot", "vmid": "100,101,102"},
+        {"id": "backup-hourly-db", "type": "vzdump", "enabled": 1, "schedule": "hourly", "storage": "pbs01", "mode": "snapshot", "vmid": "150"},
+    ]
+    add(pvesh("/cluster/backup"), jobs)
+
+    # guests are spread over all nodes, the local node carries the VMs of vms-status
+    # every 7th remote guest is a container, usage from its own generator so
+    # the other fixtures stay the same; guests of the offline node are "unknown"
+    usage = random.Random(vms)
+    resources = []
+    for vmid in range(100, 100 + vms):
+        node = "pve01" if vmid < 100 + localVms or nodes == 1 else nodeNames[1 + vmid % (nodes - 1)]
+        kind = "lxc" if vmid % 7 == 0 and vmid >= 100 + localVms else "qemu"
+        status = "unknown" if node == nodeNames[-1] and nodes > 1 else "stopped" if usage.random() < 0.05 else "running"
+        running = status == "running"
+        maxmem = usage.choice([2, 4, 8, 16, 32]) * GB
+        maxdisk = usage.choice([8, 32, 64, 256]) * GB
+        entry = {"id": kind + "/" + str(vmid), "type": kind, "vmid": vmid, "name": ("ct-%04d" if kind == "lxc" else "vm-%04d") % vmid, "node": node, "status": status,
+                 "maxcpu": usage.choice([1, 2, 4, 8]), "cpu": usage.random() ** 3 if running else 0, "maxmem": maxmem, "mem": int(maxmem * usage.uniform(0.2, 0.97)) if running else 0,
+                 "maxdisk": maxdisk, "disk": int(maxdisk * usage.uniform(0.1, 0.96)) if kind == "lxc" else 0, "uptime": usage.randint(600, 200 * 86400) if running else 0, "template": 0}
+        if vmid % 5 == 0:
+            entry["hastate"] = "started"
+        if vmid in (105, 330):
+            entry["hastate"], entry["status"], entry["cpu"], entry["mem"], entry["uptime"] = "started", "stopped", 0, 0, 0
+        if vmid == 345:
+            entry["hastate"] = "error"
+        if vmid in (212, 433):
+            entry["lock"] = "migrate" if vmid == 212 else "backup"
+        if vmid == 499:
+            entry["template"] = 1
+        resources.append(entry)
+    add(pvesh("/cluster/resources", "--type", "vm"), resources)
+    writePve(pve, ".vmlist", {"version": vms + 1, "ids": dict((str(entry["vmid"]), {"node": entry["node"], "type": entry["type"], "version": 1}) for entry in resources)})
+    writePve(pve, ".version", {"starttime": now, "clinfo": nodes + 7, "vmlist": vms + 1})
+
+    # one nightly vzdump task per online node and day, the log covers the guests of the node
+    today = time.localtime(now)
+    midnight = int(time.mktime((today.tm_year, today.tm_mon, today.tm_mday, 0, 0, 0, 0, 0, -1)))
+    perVm = max(logLines // vms - 8, 1)
+    for n, node in enumerate(nodeNames):
+        if n == nodes - 1 and nodes > 1:
+            continue
+        tasks = []
+        for day in range(10):
+            start = midnight - day * 86400 + 3600
+            upid = "UPID:%s:%08X:%08X:%08X:vzdump::root@pam:" % (node, 1000 + day, 2000 + day, start)
+            tasks.append({"upid": upid, "node": node, "pid": 1000 + day, "pstart": 2000 + day, "starttime": start, "endtime": start + 5400, "type": "vzdump", "user": "root@pam", "status": "OK"})
+        tasks.sort(key=lambda task: task["starttime"], reverse=True)
+        add(pvesh("/nodes/" + node + "/tasks", "--typefilter", "vzdump", "--limit", "100"), tasks)
+
+        lines = ["INFO: starting new backup job: vzdump --all 1 --storage pbs01 --mode snapshot --mailnotification always --node " + node]
+        for resource in resources:
+            if resource["node"] != node:
+                continue
+            vmid = resource["vmid"]
+            lines.append("INFO: Starting Backup of VM %d (qemu)" % vmid)
+            lines.append("INFO: Backup started at 2026-10-18 01:00:00")
+            lines.append("INFO: status = running")
+            lines.append("INFO: VM Name: vm-%04d" % vmid)
+            for percent in range(perVm):
+                lines.append("INFO: %3d%% (%.1f GiB of 64.0 GiB) in %ds, read: 512.0 MiB/s, write: 12.0 MiB/s" % (percent * 100 // perVm, percent * 64.0 / perVm, percent))
+            if vmid % 97 == 0:
+                lines.append("ERROR: Backup of VM %d failed - job errors" % vmid)
+                continue
+            lines.append("INFO: backup was done incrementally, reused 61.20 GiB (95%)")
+            lines.append("INFO: transferred 64.00 GiB in %d seconds (%.1f MiB/s)" % (perVm, 65536.0 / perVm))
+            lines.append("INFO: Finished Backup of VM %d (00:%02d:%02d)" % (vmid, perVm // 60, perVm % 60))
+        lines.append("INFO: Backup job finished with errors")
+        log = [{"n": i + 1, "t": line} for i, line in enumerate(lines)]
+        for task in tasks:
+            add(pvesh("/nodes/" + node + "/tasks/" + task["upid"] + "/log", "--limit", "9999999"), log)
+
+    osdNodes = [{"id": -1, "name": "default", "type": "root", "type_id": 11, "children": []}]
+    hosts = 20
+    osdId = 0
+    for h in range(hosts):
+        host = {"id": -(h + 2), "name": nodeNames[h % nodes], "type": "host", "type_id": 1, "children": []}
+        osdNodes[0]["children"].append(host["id"])
+        osdNodes.append(host)
+        for o in range(osds // hosts):
+            kb = rnd.choice([3750000000, 7500000000])
+            used = int(kb * rnd.uniform(0.45, 0.9))
+            host["children"].append(osdId)
+            osdNodes.append({"id": osdId, "device_class": rnd.choice(["ssd", "ssd", "nvme", "hdd"]), "name": "osd." + str(osdId), "type": "osd", "type_id": 0, "crush_weight": kb / 1024 / 1024 / 1024, "depth": 2, "pool_weights": {}, "reweight": 1, "kb": kb, "kb_used": used, "kb_used_data": used, "kb_avail": kb - used, "utilization": used / kb * 100, "var": 1.0, "pgs": rnd.randint(80, 160), "status": "down" if osdId == 17 else "up"})
+            osdId += 1
+    add(["sudo", "ceph", "osd", "df", "tree", "-f", "json"], command(json.dumps({"nodes": osdNodes, "stray": [], "summary": {"total_kb": sum(n.get("kb", 0) for n in osdNodes)}})))
+    add(["sudo", "ceph", "osd", "dump", "-f", "json"], command(json.dumps({"epoch": 4711, "full_ratio": 0.95, "backfillfull_ratio": 0.9, "nearfull_ratio": 0.85, "osds": [{"osd": n["id"], "up": 1 if n["status"] == "up" else 0, "in": 1} for n in osdNodes if n["type"] == "osd"]})))
+
+def generatePBS(add, rnd, now, datastores):
+    add(["sudo", "/usr/sbin/proxmox-backup-manager", "versions", "--output-format", "json"], command(json.dumps([{"Package": "proxmox-backup-server", "Version": "3.2.8", "OldVersion": "3.2.7", "ExtraInfo": "running version: 3.2.7"}])))
+    disks = [{"devpath": "/dev/sd" + chr(ord("a") + i), "vendor": "TOSHIBA ", "model": "MG08ACA16TE", "size": 16000900661248, "status": "passed", "disk-type": "hdd", "used": "zfs"} for i in range(24)]
+    add(["sudo", "/usr/sbin/proxmox-backup-manager", "disk", "list", "--output-format", "json"], command(json.dumps(disks)))
+    usage = []
+    for i in range(datastores):
+        total = rnd.randint(20, 200) * TB
+        usage.append({"store": "store%02d" % i, "total": total, "used": int(total * rnd.uniform(0.2, 0.9)), "avail": 0, "estimated-full-date": now + rnd.randint(5, 900) * 86400, "history-start": now - 30 * 86400, "history-delta": 86400, "gc-status": {}})
+    add(["sudo", "proxmox-backup-debug", "api", "get", "status/datastore-usage", "--output-format", "json"], command(json.dumps(usage)))
+    gc = [{"upid": "UPID:pbs01:%08X::garbage_collection:store%02d:root@pam:" % (i, i), "node": "pbs01", "worker_type": "garbage_collection", "worker_id": "store%02d" % i, "starttime": now - 3600 * (i + 1), "endtime": now - 3600 * i - 600, "status": "OK", "user": "root@pam"} for i in range(2)]
+    add(["sudo", "proxmox-backup-debug", "api", "get", "nodes/{hostname}/tasks", "--typefilter", "garbage_collection", "--limit", "2", "--output-format", "json"], command(json.dumps(gc)))
+    for i in range(datastores):
+        store = "store%02d" % i
+        for workerType, typefilter in [("garbage_collection", "garbage_collection"), ("prunejob", "prune"), ("verificationjob", "verif")]:
+            status = "OK" if rnd.random() > 0.05 else "TASK ERROR: interrupted"
+            tasks = [{"upid": "UPID:pbs01:%08X::%s:%s:root@pam:" % (j, workerType, store), "node": "pbs01", "worker_type": workerType, "worker_id": store, "starttime": now - 86400 * (j + 1), "endtime": now - 86400 * (j + 1) + 1800, "status": status if j == 0 else "OK", "user": "root@pam"} for j in range(2)]
+            add(["sudo", "proxmox-backup-debug", "api", "get", "nodes/{hostname}/tasks", "--typefilter", typefilter, "--store", store, "--limit", "2", "--output-format", "json"], command(json.dumps(tasks)))
+
+def generateDocker(add, rnd, containers):
+    result = []
+    for i in range(containers):
+        running = rnd.random() > 0.05
+        result.append({"id": "%064x" % rnd.getrandbits(256), "name": "ci-runner-%03d" % i, "image": "registry.example.com/ci/runner:%d" % rnd.randint(1, 9), "status": "running" if running else "exited", "started": "2026-10-17T08:00:00.123456789Z"})
+    add(["docker-containers"], result)
+
+def generateBBB(add, rnd, servers):
+    lines = ["HOSTNAME STATE STATUS MEETINGS USERS LARGEST MEETING VIDEOS LOAD BBB VERSION"]
+    status = []
+    for i in range(servers):
+        state = "disabled" if i % 17 == 0 else "enabled"
+        online = "offline" if i % 23 == 0 else "online"
+        meetings = rnd.randint(0, 40) if online == "online" else 0
+        load = rnd.uniform(0, 8)
+        version = "3.0.%d" % rnd.randint(0, 9)
+        lines.append(" bbb%03d.example.com   %s   %s   %d   %d   %d   %d   %.1f   %s" % (i, state, online, meetings, meetings * 12, 80, meetings * 4, load, version))
+        status.append({"hostname": "bbb%03d" % i, "state": state, "status": online, "meetings": str(meetings), "users": str(meetings * 12), "largestmeeting": "80", "videos": str(meetings * 4), "load": "%.1f" % load, "version": version})
+    add(["/usr/bin/docker", "exec", "scalelite-api", "./bin/rake", "status"], command("\n".join(lines) + "\n"))
+    # the same servers for the redis backend (ncm_plugin.scalelite)
+    add(["scalelite-status"], status)
+
+def generateAPC(add):
+    values = {"VERSION": "3.14.14 (31 May 2016) debian", "MODEL": "Smart-UPS 1500", "STATUS": "ONLINE", "LINEV": "231.0 Volts", "LOADPCT": "27.0 Percent", "BCHARGE": "100.0 Percent", "TIMELEFT": "38.0 Minutes", "BATTDATE": "2023-04-12"}
+    for field, value in values.items():
+        add(["/usr/sbin/apcaccess", "-p", field], command(value + "\n"))
+    # full status record of the network information server (ncm_plugin.apcupsd)
+    record = {"APC": "001,036,0879", "HOSTNAME": "{hostname}", "UPSNAME": "ups01", "CABLE": "USB Cable", "DRIVER": "USB UPS Driver", "UPSMODE": "Stand Alone"}
+    record.update(values)
+    record.update({"LOTRANS": "208.0 Volts", "HITRANS": "253.0 Volts", "BATTV": "27.2 Volts", "NUMXFERS": "0", "TONBATT": "0 Seconds", "SERIALNO": "AS1234567890", "END APC": "2026-10-18 10:00:00 +0200"})
+    add(["apcupsd", "127.0.0.1", "3551"], record)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", help="Target directory of the fixtures")
+    parser.add_argument("--nodes", type=int, default=32)
+    parser.add_argument("--vms", type=int, default=500)
+    parser.add_argument("--local-vms", type=int, default=160, dest="localvms")
+    parser.add_argument("--osds", type=int, default=200)
+    parser.add_argument("--log-lines", type=int, default=50000, dest="loglines")
+    parser.add_argument("--datastores", type=int, default=24)
+    parser.add_argument("--containers", type=int, default=300)
+    parser.add_argument("--bbb-servers", type=int, default=50, dest="bbbservers")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    now = int(time.time())
+    count = [0]
+
+    def add(key, result):
+        # pvesh fixtures are given as data, everything else as command result
+        if key[:2] == ["sudo", "pvesh"]:
+            result = command(json.dumps(result))
+        replay.save(args.directory, key, result)
+        count[0] += 1
+
+    generateProxmox(add, rnd, now, args.nodes, args.vms, args.localvms, args.osds, args.loglines, os.path.join(args.directory, "pve"))
+    generatePBS(add, rnd, now, args.datastores)
+    generateDocker(add, rnd, args.containers)
+    generateBBB(add, rnd, args.bbbservers)
+    generateAPC(add)
+    print(str(count[0]) + " fixtures written to " + args.directory)
+
+if __name__ == "__main__":
+    main()
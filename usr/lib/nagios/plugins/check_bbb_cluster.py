@@ -7,23 +7,62 @@
 # GPL v3
 #
 
-import os
-import sys
+import argparse
 import socket
 import re
-import hashlib
-import subprocess
-import requests
-from collections import defaultdict
-from xml.dom.minidom import parse, parseString
-
-def getStatus():
-    result = subprocess.run(
-        ["/usr/bin/docker", "exec", "scalelite-api", "./bin/rake", "status"],
-        capture_output=True, text=True, check=False,
-    )
+
+from ncm_plugin import output
+from ncm_plugin import process
+from ncm_plugin import replay
+from ncm_plugin import timing
+
+# Redis of Scalelite and options of the BBB API requests, without this file
+# the status comes from "rake status" in the scalelite-api container
+SCALELITE_CONFIG = "/etc/netzint/ni-ncm-agent/scalelite.ini"
+
+def runCommand(command):
+    return process.run(command)
+
+def getStatusFromScalelite(args):
+    import configparser
+    from ncm_plugin import scalelite
+
+    config = configparser.ConfigParser()
+    if not config.read(args.config) or not config.has_option("redis", "url"):
+        if args.backend == "redis":
+            raise RuntimeError("Redis backend requested, but no url is configured in " + args.config)
+        return None
+
+    verify = config.get("bbb", "verify", fallback="yes")
+    if verify.lower() in ("no", "false", "0"):
+        verify = False
+    elif verify.lower() in ("yes", "true", "1"):
+        verify = True
+    timeout = config.getfloat("bbb", "timeout", fallback=scalelite.TIMEOUT)
+    algorithm = config.get("bbb", "checksum", fallback="sha1")
+    url = config.get("redis", "url")
+    return replay.call(["scalelite-status"], lambda: scalelite.getStatus(url, timeout, args.workers, verify, algorithm))
+
+def getStatus(args):
+    if args.backend != "rake":
+        try:
+            allservers = getStatusFromScalelite(args)
+            if allservers is not None:
+                return allservers
+        except Exception:
+            if args.backend == "redis":
+                raise
+            # Redis not reachable, rake status still works
+    return getStatusFromRake()
+
+def getStatusFromRake():
+    command = ["/usr/bin/docker", "exec", "scalelite-api", "./bin/rake", "status"]
+    result = replay.call(command, lambda: runCommand(command))
+    return parseRakeStatus(result["stdout"])
+
+def parseRakeStatus(stdout):
     # Drop the rake header line (was: `| tail -n +2`)
-    lines = result.stdout.splitlines()[1:]
+    lines = stdout.splitlines()[1:]
     allservers = []
     for line in lines:
         fields = re.split(r'\s',line)
@@ -71,94 +110,138 @@ def getStatus():
 
     return allservers
 
-def generateCheckLine(bbb):
-    global totalMeetings
-    global totalAttendees
-    global totalVideousers
-    checkstate = 0 
-    statusline = ""
-
-    if bbb["state"] == "enabled":
-        statusline  = str(checkstate) + " " + "BBB_" + bbb["hostname"] + " "
-        statusline += "numMeetings=" + bbb["meetings"] + "|"
-        statusline += "numAttendees=" + bbb["users"] + "|"
-        statusline += "numWithVideo=" + bbb["videos"] + " "
-        statusline += "[" + bbb["hostname"] + " M:" + bbb["meetings"] + " "
-        statusline += "Att:" + bbb["users"] + " "
-        statusline += "Vid:" + bbb["videos"] + "]"
-    
-    if bbb["state"] == "disabled" and bbb["status"] == "online":
-        statusline  = str(checkstate) + " " + "BBB_" + bbb["hostname"] + " "
-        statusline += "numMeetings=" + bbb["meetings"] + "|"
-        statusline += "numAttendees=" + bbb["users"] + "|"
-        statusline += "numWithVideo=" + bbb["videos"] + " "
-        statusline += "****DISABLED IN SCALELITE**** [" + bbb["hostname"] + " M:" + bbb["meetings"] + " "
-        statusline += "Att:" + bbb["users"] + " "
-        statusline += "Vid:" + bbb["videos"] + "]"
-    
+def getServerRecord(bbb):
+    # state and text of one BBB server as passive result, offline servers
+    # count with zero meetings (was: generateCheckLine)
+    state = output.OK
+    note = ""
+    meetings, users, videos = int(bbb["meetings"]), int(bbb["users"]), int(bbb["videos"])
+
+    if bbb["state"] != "enabled" and bbb["status"] == "online":
+        note = "****" + bbb["state"].upper() + " IN SCALELITE**** "
+
     if bbb["state"] == "enabled" and bbb["status"] == "offline":
-        checkstate = 2
-        statusline  = str(checkstate) + " " + "BBB_" + bbb["hostname"] + " "
-        statusline += "numMeetings=0|"
-        statusline += "numAttendees=0|"
-        statusline += "numWithVideo=0 "
-        statusline += "****ENABLED BUT OFFLINE****" 
-    
-    if bbb["state"] == "disabled" and bbb["status"] == "offline":
-        checkstate = 1
-        statusline  = str(checkstate) + " " + "BBB_" + bbb["hostname"] + " "
-        statusline += "numMeetings=0|"
-        statusline += "numAttendees=0|"
-        statusline += "numWithVideo=0 "
-        statusline += "****DISABLED IN SCALELITE AND OFFLINE****" 
-
-    totalMeetings += int(bbb["meetings"])
-    totalAttendees += int(bbb["users"])
-    totalVideousers += int(bbb["videos"])
-
-    return statusline
-
-
-
-# Global metrics
-totalMeetings = 0
-totalAttendees = 0
-totalVideousers = 0
-
-allservers = getStatus()
-allservers_string = "\n"
-for server in allservers:
-  if server["state"] == "enabled" and server["status"] == "online":
-    allservers_string += "[OK] "
-  else:
-    allservers_string += "[WARNING] "
-  allservers_string += server["hostname"] + " "
-  allservers_string += "Meetings: " + server["meetings"] + ", "
-  allservers_string += "Users: " + server["users"] + ", "
-  allservers_string += "Videos: " + server["videos"] + ", "
-  allservers_string += "Largest-Meeting: " + server["largestmeeting"] + ", "
-  allservers_string += "BBB-Version: " + server["version"]
-  allservers_string += "\n"
-
-for bbb in allservers:
-    generateCheckLine(bbb)
-
-
-statusline  = "OK - " + socket.gethostname() + " - "
-statusline += "Meetings: " + str(totalMeetings) + ", "
-statusline += "User: " + str(totalAttendees) + ", "
-statusline += "Video: " + str(totalVideousers) + "\n\n"
-statusline += allservers_string + " "
-statusline += "| 'total_meetings'=" + str(totalMeetings) + " "
-statusline += "'total_user'=" + str(totalAttendees) + " "
-statusline += "'total_video'=" + str(totalVideousers)
-#statusline += "numMeetings=" + str(totalMeetings) + "|"
-#statusline += "numAttendees=" + str(totalAttendees) + "|"
-#statusline += "numWithVideo=" + str(totalVideousers) + " "
-#statusline += "[scale001 totals "
-#statusline += "M:" + str(totalMeetings) + " "
-#statusline += "Att:" + str(totalAttendees) + " "
-#statusline += "Vid:" + str(totalVideousers) + "]"
-
-print(statusline)
-#print(allservers_string)
+        state = output.CRITICAL
+        note = "****ENABLED BUT OFFLINE**** "
+
+    if bbb["state"] != "enabled" and bbb["status"] == "offline":
+        state = output.WARNING
+        note = "****" + bbb["state"].upper() + " IN SCALELITE AND OFFLINE**** "
+
+    if bbb["status"] == "degraded":
+        state = output.WARNING
+        note = "****API ERROR: " + bbb.get("error", "unknown") + "**** "
+
+    if bbb["status"] == "offline":
+        meetings, users, videos = 0, 0, 0
+
+    try:
+        load = float(bbb["load"])
+    except ValueError:
+        load = 0.0
+
+    return {
+        "hostname": bbb["hostname"],
+        "state": state,
+        "text": note + "[" + bbb["hostname"] + " M:" + str(meetings) + " Att:" + str(users) + " Vid:" + str(videos) + "]",
+        "perfdata": [("numMeetings", meetings), ("numAttendees", users), ("numWithVideo", videos), ("load", load)],
+    }
+
+def getServerRecords(allservers):
+    return [getServerRecord(bbb) for bbb in allservers]
+
+def getTotals(allservers):
+    # (meetings, attendees, video users) of all servers as reported by Scalelite
+    totalMeetings = sum(int(bbb["meetings"]) for bbb in allservers)
+    totalAttendees = sum(int(bbb["users"]) for bbb in allservers)
+    totalVideousers = sum(int(bbb["videos"]) for bbb in allservers)
+    return totalMeetings, totalAttendees, totalVideousers
+
+def getPassiveResults(args, records):
+    import time
+
+    now = time.time()
+    results = []
+    for record in records:
+        perfdata = " ".join(output.formatPerfdata(label, value) for label, value in record["perfdata"])
+        results.append({
+            "host": args.host.replace("{server}", record["hostname"]),
+            "service": args.serviceformat.replace("{server}", record["hostname"]),
+            "state": record["state"],
+            "output": output.STATES[record["state"]] + " - " + record["text"] + " | " + perfdata,
+            "time": now,
+        })
+    return results
+
+def main():
+    from ncm_plugin import passive
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max-lines', help='Show only the worst n servers in the long output, 0 = all (default: 0)', dest='maxlines', type=int, default=0)
+    parser.add_argument('--backend', help='Status source: redis (Scalelite Redis and BBB API), rake (rake status) or auto = redis if configured (default: auto)', dest='backend', choices=['auto', 'redis', 'rake'], default='auto')
+    parser.add_argument('--config', help='Config file of the redis backend (default: ' + SCALELITE_CONFIG + ')', dest='config', default=SCALELITE_CONFIG)
+    parser.add_argument('--workers', help='Parallel BBB API requests of the redis backend (default: 8)', dest='workers', type=int, default=8)
+    parser.add_argument('--timeout', help='Seconds until rake status is aborted (default: ' + str(process.TIMEOUT) + ')', dest='timeout', type=float, default=process.TIMEOUT)
+    parser.add_argument('--host', help='Passive results: host name, {server} is replaced by the BBB server (default: local host name)', dest='host', default=socket.gethostname())
+    parser.add_argument('--service-format', help='Passive results: service name, {server} is replaced by the BBB server (default: BBB_{server})', dest='serviceformat', default="BBB_{server}")
+    passive.addArguments(parser, "Passive results per BBB server: ")
+    args = parser.parse_args()
+    process.setDefaults(timeout=args.timeout)
+    timing.install()
+
+    try:
+        with timing.phase("status"):
+            allservers = getStatus(args)
+    except process.CommandError as e:
+        output.exitUnknown(str(e))
+    except Exception as e:
+        # missing config, Redis not reachable or answering garbage
+        output.exitUnknown("Unable to get the BBB server status: " + type(e).__name__ + ": " + str(e))
+    result = output.Output(args.maxlines)
+    for server in allservers:
+        line = server["hostname"] + " "
+        line += "Meetings: " + server["meetings"] + ", "
+        line += "Users: " + server["users"] + ", "
+        line += "Videos: " + server["videos"] + ", "
+        line += "Largest-Meeting: " + server["largestmeeting"] + ", "
+        line += "BBB-Version: " + server["version"]
+        if server.get("error"):
+            line += ", Error: " + server["error"]
+        if server["state"] == "enabled" and server["status"] == "online":
+            result.add(output.OK, line)
+        else:
+            result.add(output.WARNING, line)
+
+    totalMeetings, totalAttendees, totalVideousers = getTotals(allservers)
+
+    if passive.enabled(args):
+        records = getServerRecords(allservers)
+        try:
+            passive.submit(args, getPassiveResults(args, records))
+        except Exception as e:
+            output.exitUnknown("Unable to submit passive check results: " + type(e).__name__ + ": " + str(e))
+        result.addFooter(str(len(records)) + " passive result(s) submitted (" + result.getCounts([(record["state"], None) for record in records]) + ")")
+
+    result.addPerfdata("total_meetings", totalMeetings)
+    result.addPerfdata("total_user", totalAttendees)
+    result.addPerfdata("total_video", totalVideousers)
+
+    statusline  = "OK - " + socket.gethostname() + " - "
+    statusline += "Meetings: " + str(totalMeetings) + ", "
+    statusline += "User: " + str(totalAttendees) + ", "
+    statusline += "Video: " + str(totalVideousers)
+    statusline = result.render(statusline)
+    #statusline += "numMeetings=" + str(totalMeetings) + "|"
+    #statusline += "numAttendees=" + str(totalAttendees) + "|"
+    #statusline += "numWithVideo=" + str(totalVideousers) + " "
+    #statusline += "[scale001 totals "
+    #statusline += "M:" + str(totalMeetings) + " "
+    #statusline += "Att:" + str(totalAttendees) + " "
+    #statusline += "Vid:" + str(totalVideousers) + "]"
+
+    print(statusline)
+    #print(allservers_string)
+
+
+if __name__=="__main__":
+    main()
@@ -11,47 +11,63 @@
 
 import argparse
 import datetime
-import docker
+import time
 
-def __exit_ok(message):
-    print("OK - " + message)
-    exit(0)
+from ncm_plugin import collector
+from ncm_plugin import containers
+from ncm_plugin import events
+from ncm_plugin import output
+from ncm_plugin import replay
+from ncm_plugin import timing
 
-def __exit_warning(message):
-    print("WARNING - " + message)
-    exit(1)
+def getContainers(names):
+    # ask the resident collector first, query docker ourselves if it is not running
+    containerList = collector.getSource("docker-containers", names)
+    if containerList is not None:
+        return containerList
 
-def __exit_critical(message):
-    print("CRITICAL - " + message)
-    exit(2)
+    # the docker SDK is only needed without collector
+    import docker
 
-def __exit_unknown(message):
-    print("UNKNOWN - " + message)
-    exit(3)
+    try:
+        return containers.listContainers(names)
+    except docker.errors.DockerException:
+        output.exitUnknown("Could not get container. Please check permissons!")
+
+def getContainersFromEvents(filename, maxAge):
+    # state table of ni-ncm-docker-events, None if the watcher is not running
+    table = events.load(filename)
+    if table is None or time.time() - table["updated"] > maxAge:
+        return None
+    return [dict(entry, id=containerId) for containerId, entry in table["containers"].items()]
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--name", required = False, help = "Name of docker container to be monitored (separated by ',')", default = "") 
+    parser.add_argument("--events", required = False, help = "Read the state table of ni-ncm-docker-events instead of polling docker", action = "store_true")
+    parser.add_argument("--events-file", required = False, help = "State table of ni-ncm-docker-events", default = events.EVENTS_FILE)
+    parser.add_argument("--events-max-age", required = False, help = "Poll docker if the state table is older than this (seconds)", type = int, default = 300)
+    parser.add_argument("--restart-window", required = False, help = "Count restarts and OOM kills of the last n seconds (--events only, max. 86400)", type = int, default = 3600)
+    parser.add_argument("--restart-warning", required = False, help = "Warning if a container restarted this often in the window (--events only)", type = int, default = 1)
+    parser.add_argument("--restart-critical", required = False, help = "Critical if a container restarted this often in the window (--events only)", type = int, default = 5)
     args = parser.parse_args()
+    timing.install()
 
-    try:
-        dockerClient = docker.from_env()
-        containerList = dockerClient.containers.list()
-    except docker.errors.DockerException:
-        __exit_unknown("Could not get container. Please check permissons!")
+    names = [name for name in args.name.split(",") if name]
+    containerList = None
+    with timing.phase("containers"):
+        if args.events:
+            containerList = replay.call(["docker-events"], lambda: getContainersFromEvents(args.events_file, args.events_max_age))
+        if containerList is None:
+            containerList = replay.call(["docker-containers"], lambda: getContainers(names))
 
     if len(containerList) == 0:
         if not args.name:
-            __exit_ok("No containers currently running on this system!")
+            output.exitOk("No containers currently running on this system!")
 
     runningContainer = {}
     for container in containerList:
-        runningContainer[container.name] = {
-            "name": container.name,
-            "image": container.image.tags[0],
-            "status": container.status,
-            "attrs": container.attrs
-        }
+        runningContainer[container["name"]] = container
 
     dockertocheck = []
     dockernottocheck = []
@@ -62,14 +78,14 @@ def main():
                 dockertocheck.append(runningContainer[entry])
                 runningContainer.pop(entry)
             else: # container should be monitored but is not running, add dummy entry to dockertocheck array
-                dockertocheck.append({"name": entry, "image": "n/a", "status": "off", "attrs": {}})
+                dockertocheck.append({"name": entry, "image": "n/a", "status": "off", "started": None})
     else:
         if args.name != "":
             if args.name in runningContainer: # container should be monitored and is running, add container to dockertocheck array
                     dockertocheck.append(runningContainer[args.name])
                     runningContainer.pop(args.name)
             else: # container should be monitored but is not running, add dummy entry to dockertocheck array
-                dockertocheck.append({"name": args.name, "image": "n/a", "status": "off", "attrs": {}})
+                dockertocheck.append({"name": args.name, "image": "n/a", "status": "off", "started": None})
 
     for entry in runningContainer:
         if "running" in runningContainer[entry]["status"]:
@@ -77,14 +93,32 @@ def main():
 
     infoline = ""
     error = False
+    warning = False
 
     for entry in dockertocheck:
-        attrs = entry["attrs"]
-        if "State" in attrs and attrs["State"]["Running"]:
-            uptime = datetime.datetime.utcnow() - datetime.datetime.strptime(attrs["State"]["StartedAt"][:-4], '%Y-%m-%dT%H:%M:%S.%f')
-            infoline += "[OK] " + entry["name"].replace("/", "") + " with image " + entry["image"] + ", Uptime: " + str(uptime).split(".")[0] + "\n"
+        # restart history is only known with --events
+        history = ""
+        state = "OK"
+        if "restarts" in entry:
+            restarts = events.countSince(entry["restarts"], args.restart_window)
+            oomKills = events.countSince(entry["oom_kills"], args.restart_window)
+            history = ", Restarts: " + str(restarts) + ", OOM kills: " + str(oomKills)
+            if entry["last_exit_code"] is not None:
+                history += ", Last exit code: " + str(entry["last_exit_code"])
+            if restarts >= args.restart_critical:
+                state = "CRITICAL"
+            elif restarts >= args.restart_warning or oomKills > 0:
+                state = "WARNING"
+
+        if entry["status"] == "running" and entry["started"]:
+            uptime = datetime.datetime.utcnow() - datetime.datetime.strptime(entry["started"][:-4], '%Y-%m-%dT%H:%M:%S.%f')
+            infoline += "[" + state + "] " + entry["name"].replace("/", "") + " with image " + entry["image"] + ", Uptime: " + str(uptime).split(".")[0] + history + "\n"
+            if state == "CRITICAL":
+                error = True
+            elif state == "WARNING":
+                warning = True
         else:
-            infoline += "[CRITICAL] " + entry["name"].replace("/", "") + " with image " + entry["image"] + " is not running!\n"
+            infoline += "[CRITICAL] " + entry["name"].replace("/", "") + " with image " + entry["image"] + " is not running!" + history + "\n"
             error = True
 
     if len(dockernottocheck) >= 1:
@@ -93,9 +127,11 @@ def main():
             infoline += " - " + entry["name"] + "\n"
 
     if error:
-        __exit_critical("Some monitored containers are offline!\n\n" + infoline)
+        output.exitCritical("Some monitored containers are offline or restarting!\n\n" + infoline)
+    elif warning:
+        output.exitWarning("Some monitored containers restarted in the last " + str(args.restart_window) + " seconds!\n\n" + infoline)
     else:
-        __exit_ok("All monitored containers are online!\n\n" + infoline)
+        output.exitOk("All monitored containers are online!\n\n" + infoline)
 
 
 
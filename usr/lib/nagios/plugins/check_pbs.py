@@ -11,13 +11,16 @@
 
 import argparse
 import json
+import os
 import shlex
-import socket
-import subprocess
-import datetime
 
-from datetime import datetime as dt
-from datetime import timedelta
+from ncm_plugin import collector
+from ncm_plugin import history
+from ncm_plugin import output
+from ncm_plugin import parallel
+from ncm_plugin import process
+from ncm_plugin import replay
+from ncm_plugin import timing
 
 def __execute(command):
     args = []
@@ -25,24 +28,17 @@ def __execute(command):
         if not part:
             continue
         args.extend(shlex.split(part))
-    result = subprocess.run(args, capture_output=True, text=True, check=False)
-    return json.loads(result.stdout)
+    return json.loads(replay.call(args, lambda: __run(args))["stdout"])
 
-def __exit_ok(message):
-    print("OK - " + message)
-    exit(0)
+def __run(args):
+    # ask the resident collector first, run the command ourselves if it is not running
+    result = collector.execute(args)
+    if result is None:
+        result = process.run(args)
+    return result
 
-def __exit_warning(message):
-    print("WARNING - " + message)
-    exit(1)
-
-def __exit_critical(message):
-    print("CRITICAL - " + message)
-    exit(2)
-
-def __exit_unknown(message):
-    print("UNKNOWN - " + message)
-    exit(3)
+def getOutput(args):
+    return output.Output(args.maxlines, args.maxperfdata)
 
 def getValueFromPBS(url, method="list", append=""):
     return __execute(["sudo", "/usr/sbin/proxmox-backup-manager", url, method, append, "--output-format json"])
@@ -50,96 +46,223 @@ def getValueFromPBS(url, method="list", append=""):
 def KBToTB(value, calc=1):
     return str(round((value / 1024 / 1024 / 1024 / 1024) * calc, 2))
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('-i', '--info', help='Info category to choose', required = True, choices=["host-version", "disk-status", "datastore-status", "garbage-collection-status"], dest='info')
-    parser.add_argument('-w', '--warning', help='Warning in percent/days', dest='warning')
-    parser.add_argument('-c', '--critical', help='Critical in percent/days', dest='critical')
-    args = parser.parse_args()
+# task types of the datastores category, typefilter matches substrings
+# (prune + prunejob, verify + verificationjob)
+DATASTORE_TASKS = [
+    ("gc", "garbage_collection"),
+    ("prune", "prune"),
+    ("verify", "verif"),
+]
+
+def getDatastoreTasks(store, typefilter):
+    node = os.uname().nodename.split('.', 1)[0]
+    return __execute(["sudo", "proxmox-backup-debug", "api", "get", "nodes/" + node + "/tasks", "--typefilter " + typefilter, "--store " + store, "--limit 2", "--output-format json"])
+
+def getDatastoresTasks(stores, workers):
+    # one task list per datastore and task type, all of them concurrently
+    jobs = [(store, name, typefilter) for store in stores for name, typefilter in DATASTORE_TASKS]
+    results = parallel.mapConcurrently(lambda job: getDatastoreTasks(job[0], job[2]), jobs, workers)
+
+    tasks = {store: {} for store in stores}
+    for (store, name, typefilter), values in zip(jobs, results):
+        # the newest finished task, a running one is only reported if there is none
+        finished = [entry for entry in values if "endtime" in entry]
+        tasks[store][name] = finished[0] if finished else (values[0] if values else None)
+    return tasks
+
+def getDaysUntilFull(entry, now):
+    # the estimate of PBS, the local usage history if PBS has none yet
+    metric = "pbs/datastore/" + entry["store"]
+    if entry.get("estimated-full-date", 0) > 0:
+        history.daysUntilFull(metric, entry["used"], entry["total"], None)
+        return int((entry["estimated-full-date"] - now) // 86400)
+    days = history.daysUntilFull(metric, entry["used"], entry["total"])
+    if days is not None:
+        return int(days)
+    return 0
+
+def checkDatastores(args):
+    import time
+
+    if args.warning == None or args.critical == None:
+        output.exitUnknown("Commandline incomplete!")
+    values = __execute(["sudo", "proxmox-backup-debug", "api", "get", "status/datastore-usage", "--output-format json"])
+    if len(values) == 0:
+        output.exitOk("No datastores configured!")
+    tasks = getDatastoresTasks([entry["store"] for entry in values], args.workers)
+
+    now = time.time()
+    result = getOutput(args)
+    lines = []
+    totalUsed = 0
+    totalSize = 0
+    for entry in sorted(values, key=lambda entry: entry["store"]):
+        name = entry["store"]
+        total = entry["total"]
+        used = entry["used"]
+        totalUsed += used
+        totalSize += total
+        state = output.OK
+
+        line = name + " - Usage: " + KBToTB(used) + " / " + KBToTB(total) + " TB = " + str(round((used / total) * 100, 2)) + "%"
+        days = getDaysUntilFull(entry, now)
+        if days > 0 and (total - used) > 1000:
+            line += ", Full in " + str(days) + " days"
+            if days < int(args.critical):
+                state = output.CRITICAL
+            elif days < int(args.warning):
+                state = output.WARNING
+        else:
+            line += ", Full: never"
+            days = 0
+
+        for taskName, typefilter in DATASTORE_TASKS:
+            task = tasks[name][taskName]
+            if task is None:
+                line += ", " + taskName + ": never"
+            elif "endtime" not in task:
+                line += ", " + taskName + ": running"
+            else:
+                line += ", " + taskName + ": " + task["status"] + " (" + str(int((now - task["endtime"]) // 3600)) + "h ago)"
+                if task["status"] != "OK":
+                    # a failed verification means damaged backups
+                    if taskName == "verify":
+                        state = output.CRITICAL
+                    elif state == output.OK:
+                        state = output.WARNING
+
+        lines.append((state, line))
+        result.addPerfdata(name + "_usage", float(KBToTB(used)), "", float(KBToTB(total, 0.8)), float(KBToTB(total, 0.9)), 0, float(KBToTB(total)), group="datastore_usage")
+        result.addPerfdata(name + "_full", days, "", args.warning, args.critical, group="datastore_full")
+
+    # worst datastores first
+    lines.sort(key=lambda line: output.SEVERITY.index(line[0]), reverse=True)
+    for state, line in lines:
+        result.add(state, line)
+    critical = len([line for line in lines if line[0] == output.CRITICAL])
+    warning = len([line for line in lines if line[0] == output.WARNING])
+
+    result.addPerfdata("total_usage", float(KBToTB(totalUsed)), "", "", "", 0, float(KBToTB(totalSize)))
+    result.addPerfdata("datastores", len(values))
+    result.addPerfdata("datastores_warning", warning)
+    result.addPerfdata("datastores_critical", critical)
+
+    message = result.render(str(len(values)) + " datastores, " + str(critical) + " critical, " + str(warning) + " warning")
+    if critical:
+        output.exitCritical(message)
+    elif warning:
+        output.exitWarning(message)
+    output.exitOk(message)
+
+def runCheck(args):
+    if args.info == "datastores":
+        checkDatastores(args)
 
     if args.info == "host-version":
         values = getValueFromPBS("versions", "")
         if args.warning:
             if values[0]["Version"] != values[0]["OldVersion"]:
-                __exit_warning(socket.gethostname() + " - " + values[0]["Package"] + " " + values[0]["ExtraInfo"] + ", newest is " + values[0]["Version"])
+                output.exitWarning(os.uname().nodename + " - " + values[0]["Package"] + " " + values[0]["ExtraInfo"] + ", newest is " + values[0]["Version"])
         elif args.critical:
             if values[0]["Version"] != values[0]["OldVersion"]:
-                __exit_critical(socket.gethostname() + " - " + values[0]["Package"] + " " + values[0]["ExtraInfo"] + ", newest is " + values[0]["Version"])
-        __exit_ok(socket.gethostname() + " - " + values[0]["Package"] + " " + values[0]["ExtraInfo"])
+                output.exitCritical(os.uname().nodename + " - " + values[0]["Package"] + " " + values[0]["ExtraInfo"] + ", newest is " + values[0]["Version"])
+        output.exitOk(os.uname().nodename + " - " + values[0]["Package"] + " " + values[0]["ExtraInfo"])
 
     elif args.info == "disk-status":
         values = getValueFromPBS("disk")
-        message = ""
-        error = False
+        result = getOutput(args)
         for entry in values:
-            line = "Name: " + entry["vendor"].replace(" ", "") + " " + entry["model"] + ", Size: " + KBToTB(entry["size"]) + " GB, Path: " + entry["devpath"] + "\n"
+            line = "Name: " + entry["vendor"].replace(" ", "") + " " + entry["model"] + ", Size: " + KBToTB(entry["size"]) + " GB, Path: " + entry["devpath"]
             if entry["status"].upper() == "OK" or entry["status"].upper() == "PASSED" or entry["status"].upper() == "UNKNOWN":
-                message += "[OK] " + line
+                result.add(output.OK, line)
             else:
-                message += "[CRITICAL] " + line
-                error = True
+                result.add(output.CRITICAL, line)
 
-        if error:
-            __exit_critical("One or more disk are in error state. Please check: \n\n" + message)
+        if result.getState() == output.CRITICAL:
+            output.exitCritical(result.render("One or more disk are in error state. Please check:"))
         else:
-            __exit_ok("All disks are ok! \n\n" + message)
+            output.exitOk(result.render("All disks are ok!"))
 
     elif args.info == "datastore-status":
+        from datetime import datetime as dt, timedelta
+
         if args.warning == None or args.critical == None:
-            __exit_unknown("Commandline incomplete!")
+            output.exitUnknown("Commandline incomplete!")
         values = __execute(["sudo", "proxmox-backup-debug", "api", "get", "status/datastore-usage", "--output-format json"])
-        message = ""
-        prefdata = ""
-        error = False
-        warning = False
+        result = getOutput(args)
         for entry in values:
             name = entry["store"]
             total = entry["total"]
             used = entry["used"]
+            state = output.OK
 
-            message += name + " - Usage: " + KBToTB(used) + " / " + KBToTB(total) + " TB = " + str(round((used / total) * 100, 2)) 
+            line = name + " - Usage: " + KBToTB(used) + " / " + KBToTB(total) + " TB = " + str(round((used / total) * 100, 2))
 
-            estimatedFullDate = dt.fromtimestamp(entry["estimated-full-date"])
             now = dt.now()
-            timespanEstimatedFullDate = (estimatedFullDate - now)
-            timespanEstimatedFullDate = timespanEstimatedFullDate.days
+            timespanEstimatedFullDate = getDaysUntilFull(entry, now.timestamp())
+            if entry.get("estimated-full-date", 0) > 0:
+                estimatedFullDate = dt.fromtimestamp(entry["estimated-full-date"])
+            else:
+                estimatedFullDate = now + timedelta(days=timespanEstimatedFullDate)
 
             if timespanEstimatedFullDate < int(args.warning):
-                warning = True
+                state = output.WARNING
             if timespanEstimatedFullDate < int(args.critical):
-                error = True
+                state = output.CRITICAL
 
             if timespanEstimatedFullDate > 0 and (total - used) > 1000:
-                message += "% - Estimated Full: " + estimatedFullDate.strftime('%d.%m.%Y %H:%M:%S') + " (" + str(timespanEstimatedFullDate) + " days)"
+                line += "% - Estimated Full: " + estimatedFullDate.strftime('%d.%m.%Y %H:%M:%S') + " (" + str(timespanEstimatedFullDate) + " days)"
             else:
-                error = False
-                warning = False
-                message += "% - Estimated Full: never"
+                state = output.OK
+                line += "% - Estimated Full: never"
                 timespanEstimatedFullDate = 0
 
-            prefdata += " " + name + "_usage=" + KBToTB(used) + ";" + KBToTB(total, 0.8) + ";" + KBToTB(total, 0.9) + ";0;" + KBToTB(total)
-            prefdata += " " + name + "_full=" + str(timespanEstimatedFullDate) + ";" + args.warning + ";" + args.critical
+            result.add(state, line)
+            result.addPerfdata(name + "_usage", float(KBToTB(used)), "", float(KBToTB(total, 0.8)), float(KBToTB(total, 0.9)), 0, float(KBToTB(total)), group="datastore_usage")
+            result.addPerfdata(name + "_full", timespanEstimatedFullDate, "", args.warning, args.critical, group="datastore_full")
 
-        if error:
-            __exit_critical(message + " |" + prefdata)
-        elif warning:
-            __exit_warning(message + " |" + prefdata)
+        summary = str(len(values)) + " datastore(s)"
+        state = result.getState()
+        if state == output.CRITICAL:
+            output.exitCritical(result.render(summary))
+        elif state == output.WARNING:
+            output.exitWarning(result.render(summary))
         else:
-            __exit_ok(message + " |" + prefdata)
+            output.exitOk(result.render(summary))
 
     elif args.info == "garbage-collection-status":
-        values = __execute(["sudo", "proxmox-backup-debug", "api", "get", "nodes/" + socket.gethostname().split('.', 1)[0] + "/tasks", "--typefilter garbage_collection", "--limit 2", "--output-format json"])
+        from datetime import datetime as dt
+
+        values = __execute(["sudo", "proxmox-backup-debug", "api", "get", "nodes/" + os.uname().nodename.split('.', 1)[0] + "/tasks", "--typefilter garbage_collection", "--limit 2", "--output-format json"])
         if len(values) == 0:
-            __exit_ok("No garbage collection has run so far...")
+            output.exitOk("No garbage collection has run so far...")
         for entry in values:
-            print(entry)
             if "endtime" in entry:
                 starttime = dt.fromtimestamp(entry["starttime"])
                 endtime = dt.fromtimestamp(entry["endtime"])
                 timespan = (endtime - starttime)
                 if entry["status"] == "OK":
-                    __exit_ok("Last " + entry["worker_type"] + " at " + entry["worker_id"] + " was successful! Runtime was " + str(timespan))
-                __exit_warning("Last " + entry["worker_type"] + " at " + entry["worker_id"] + " failed!")
+                    output.exitOk("Last " + entry["worker_type"] + " at " + entry["worker_id"] + " was successful! Runtime was " + str(timespan))
+                output.exitWarning("Last " + entry["worker_type"] + " at " + entry["worker_id"] + " failed!")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--info', help='Info category to choose', required = True, choices=["host-version", "disk-status", "datastore-status", "garbage-collection-status", "datastores"], dest='info')
+    parser.add_argument('-w', '--warning', help='Warning in percent/days', dest='warning')
+    parser.add_argument('-c', '--critical', help='Critical in percent/days', dest='critical')
+    parser.add_argument('--workers', help='Number of parallel task queries of datastores (default: 8)', dest='workers', type=int, default=8)
+    parser.add_argument('--max-lines', help='Show only the worst n lines of the long output, 0 = all (default: 0)', dest='maxlines', type=int, default=0)
+    parser.add_argument('--max-perfdata', help='Aggregate per-datastore perfdata (min/max/avg/count) above n values, 0 = never (default: 0)', dest='maxperfdata', type=int, default=0)
+    parser.add_argument('--timeout', help='Seconds after which a hung proxmox-backup-* call is killed (default: ' + str(process.TIMEOUT) + ')', dest='timeout', type=float, default=process.TIMEOUT)
+    args = parser.parse_args()
+    process.setDefaults(timeout=args.timeout)
+    timing.install()
+
+    try:
+        with timing.phase("check " + args.info):
+            runCheck(args)
+    except process.CommandError as e:
+        output.exitUnknown(str(e))
 
 if __name__=="__main__":
     main()
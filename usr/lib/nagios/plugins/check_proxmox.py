@@ -10,302 +10,1266 @@
 ###################################################
 
 import argparse
+import fcntl
+import fnmatch
 import json
+import os
+import re
 import shlex
-import socket
-import subprocess
-import datetime
+import time
 
-from datetime import datetime as dt
+from ncm_plugin import output
+from ncm_plugin.output import OK, WARNING, CRITICAL, UNKNOWN, STATES, SEVERITY
 
-def __execute(command):
+# Modules only some categories or backends need (concurrent.futures,
+# configparser, datetime, hashlib, tempfile, requests and the ncm_plugin
+# modules except output) are imported where they are used to
+# keep the startup time of every check low.
+
+CATEGORIES = ["host-version", "cluster-status", "ceph-status", "storage-status", "disk-status", "vms-status", "backup-status", "osd-status", "guest-health"]
+
+# Categories with the same result on every node of a cluster, with
+# --cluster-mode elected only one node collects them
+CLUSTER_CATEGORIES = ["cluster-status", "ceph-status", "backup-status", "osd-status", "guest-health"]
+
+# Shared response cache for pvesh calls. All checks of a host share one
+# directory, so a single pvesh call serves every check within the TTL window.
+CACHE_DIR = "/var/cache/ni-ncm-agent/pvesh"
+
+# TTL in seconds per API path (fnmatch pattern, first match wins).
+# A TTL of 0 disables the cache for this path.
+CACHE_TTL = [
+    ("/version", 3600),
+    ("/cluster/backup", 300),
+    ("/cluster/backup/*", 300),
+    ("/nodes/*/disks/list", 300),
+    ("/nodes/*/qemu/*/snapshot", 120),
+    ("*", 30),
+]
+
+cache = {
+    "enabled": True,
+    "dir": CACHE_DIR,
+    "ttl": list(CACHE_TTL),
+}
+
+# responses fetched during this run, keyed by (url, append)
+responses = {}
+
+# Optional backend that talks HTTPS to the local pveproxy with an API token
+# instead of forking sudo+pvesh for every call. pvesh stays the fallback.
+API_CONFIG = "/etc/netzint/ni-ncm-agent/proxmox-api.ini"
+
+api = {
+    "backend": "auto",
+    "config": API_CONFIG,
+    "workers": 8,
+    "session": None,
+    "url": None,
+    "timeout": 10,
+    "failed": False,
+}
+
+# Optional backend that sends the ceph mon commands through python3-rados with
+# one connection per run instead of a new "ceph" client per command.
+cephBackend = {
+    "backend": "auto",
+    # None = defaults of ncm_plugin.ceph
+    "conf": None,
+    "user": None,
+    "failed": False,
+}
+
+# Optional source that reads /cluster/status and the VM snapshots from the
+# pmxcfs files in /etc/pve, no sudo+pvesh at all. pvesh stays the fallback.
+pmxcfsBackend = {
+    "backend": "auto",
+    # None = defaults of ncm_plugin.pmxcfs
+    "dir": None,
+    "cache": None,
+    "failed": False,
+}
+
+# Timeout of the pvesh/ceph commands (--timeout), None = default of ncm_plugin.process
+commands = {
+    "timeout": None,
+}
+
+# Parsed vzdump task logs per UPID. The log of a finished task never changes,
+# so it is parsed once and only fetched again after a day, in case the
+# first fetch got an incomplete log.
+VZDUMP_CACHE_DIR = "/var/cache/ni-ncm-agent/vzdump"
+VZDUMP_CACHE_MAX_AGE = 60 * 60 * 24
+
+VZDUMP_LOG_PATTERN = re.compile(
+    r"INFO: Starting Backup of VM (?P<start>\d+)"
+    r"|INFO: VM Name:(?P<name>.*)"
+    r"|INFO: transferred (?P<size>\S+) \S+ in (?P<time>\S+) seconds \((?P<rate>[^ )]+)"
+    r"|INFO: backup was done.*\((?P<reuse>[^)]+)\)"
+    r"|ERROR: Backup of VM (?P<failed>\d+) failed"
+)
+
+def __split(command):
     args = []
     for part in command:
         if not part:
             continue
         args.extend(shlex.split(part))
-    result = subprocess.run(args, capture_output=True, text=True, check=False)
-    return json.loads(result.stdout)
+    return args
 
-def __exit_ok(message):
-    print("OK - " + message)
-    exit(0)
+def __run(args):
+    from ncm_plugin import collector
 
-def __exit_warning(message):
-    print("WARNING - " + message)
-    exit(1)
+    # ask the resident collector first, run the command ourselves if it is not running
+    result = collector.execute(args)
+    if result is None:
+        from ncm_plugin import process
 
-def __exit_critical(message):
-    print("CRITICAL - " + message)
-    exit(2)
+        result = process.run(args, commands["timeout"])
+    return result
 
-def __exit_unknown(message):
-    print("UNKNOWN - " + message)
-    exit(3)
+def __execute(command):
+    from ncm_plugin import replay
 
-def getValueFromProxmox(url, append=""):
-    url = url.replace("$hostname$", socket.gethostname())
+    args = __split(command)
+    return json.loads(replay.call(args, lambda: __run(args))["stdout"])
+
+def __stream(command):
+    from ncm_plugin import process
+    from ncm_plugin import replay
+
+    # yields the items of a JSON list while the command is still writing it
+    if replay.active() or replay.getRecordDir():
+        yield from __execute(command)
+        return
+    decoder = json.JSONDecoder()
+    buffer = ""
+    for chunk in process.stream(__split(command), commands["timeout"]):
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n[,]":
+                pos += 1
+            if pos >= len(buffer):
+                break
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except ValueError:
+                # item is not complete yet, wait for the next chunk
+                break
+            yield item
+        buffer = buffer[pos:]
+    if buffer.strip(" \t\r\n[,]"):
+        raise process.CommandError(__split(command), "incomplete or invalid JSON output")
+
+def getCacheTTL(url):
+    for pattern, ttl in cache["ttl"]:
+        if fnmatch.fnmatchcase(url, pattern):
+            return ttl
+    return 0
+
+def getCacheFile(url, append):
+    import hashlib
+
+    key = hashlib.sha1(json.dumps([url, append]).encode("utf-8")).hexdigest()
+    return os.path.join(cache["dir"], key + ".json")
+
+def readCache(filename, ttl):
+    try:
+        with open(filename, "r") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - entry.get("time", 0) > ttl:
+        return None
+    return entry
+
+def writeCache(filename, url, append, data):
+    import tempfile
+
+    fd, tmpfile = tempfile.mkstemp(dir=cache["dir"], prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"path": url, "args": append, "time": time.time(), "data": data}, f)
+        os.replace(tmpfile, filename)
+    except OSError:
+        try:
+            os.unlink(tmpfile)
+        except OSError:
+            pass
+
+def getCachedValue(url, append, fetch):
+    ttl = getCacheTTL(url)
+    if not cache["enabled"] or ttl <= 0:
+        return fetch()
+
+    try:
+        os.makedirs(cache["dir"], exist_ok=True)
+        filename = getCacheFile(url, append)
+        lock = open(filename[:-5] + ".lock", "a")
+    except OSError:
+        # cache directory not usable, never fail the check because of the cache
+        return fetch()
+
+    with lock:
+        entry = readCache(filename, ttl)
+        if entry is not None:
+            return entry["data"]
+
+        # only one process per key refreshes the cache, all others wait for it
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        entry = readCache(filename, ttl)
+        if entry is not None:
+            return entry["data"]
+        data = fetch()
+        writeCache(filename, url, append, data)
+        return data
+
+
+def getApiSession():
+    if api["session"] is not None or api["backend"] == "pvesh":
+        return api["session"]
+
+    import configparser
+
+    config = configparser.ConfigParser()
+    if not config.read(api["config"]) or not (config.has_option("api", "token") or config.has_option("api", "user")):
+        if api["backend"] == "api":
+            raise RuntimeError("Proxmox API backend requested, but no token or user is configured in " + api["config"])
+        return None
+
+    import requests
+
+    class FingerprintAdapter(requests.adapters.HTTPAdapter):
+        # pins the certificate of pveproxy instead of verifying it against a CA
+        def __init__(self, fingerprint, **kwargs):
+            self.fingerprint = fingerprint
+            super().__init__(**kwargs)
+
+        def init_poolmanager(self, *args, **kwargs):
+            if self.fingerprint:
+                kwargs["assert_fingerprint"] = self.fingerprint
+            super().init_poolmanager(*args, **kwargs)
+
+    session = requests.Session()
+    # REQUESTS_CA_BUNDLE or a proxy from the environment would override verify/fingerprint
+    session.trust_env = False
+    # one keep-alive connection per worker, so parallel calls reuse their connections
+    fingerprint = config.get("api", "fingerprint", fallback="").replace(":", "").lower()
+    adapter = FingerprintAdapter(fingerprint, pool_connections=1, pool_maxsize=max(api["workers"], 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    verify = config.get("api", "verify", fallback="/etc/pve/local/pve-ssl.pem")
+    if fingerprint or verify.lower() in ("no", "false", "0"):
+        session.verify = False
+        requests.packages.urllib3.disable_warnings()
+    elif verify.lower() not in ("yes", "true", "1"):
+        session.verify = verify
+    api["url"] = config.get("api", "url", fallback="https://127.0.0.1:8006").rstrip("/") + "/api2/json"
+    api["timeout"] = config.getfloat("api", "timeout", fallback=10)
+    if config.has_option("api", "token"):
+        session.headers["Authorization"] = "PVEAPIToken=" + config.get("api", "token")
+    else:
+        # user and password: one ticket per run, the CSRF token is sent along like the web UI does
+        response = session.post(api["url"] + "/access/ticket", data={"username": config.get("api", "user"), "password": config.get("api", "password", fallback="")}, timeout=api["timeout"])
+        response.raise_for_status()
+        ticket = response.json()["data"]
+        session.cookies.set("PVEAuthCookie", ticket["ticket"])
+        session.headers["CSRFPreventionToken"] = ticket["CSRFPreventionToken"]
+    api["session"] = session
+    return session
+
+def parseAppend(append):
+    # "--typefilter vzdump --limit 10" -> {"typefilter": "vzdump", "limit": "10"}
+    params = {}
+    key = None
+    for part in shlex.split(append):
+        if part.startswith("--"):
+            key = part[2:]
+            params[key] = 1
+        elif key is not None:
+            params[key] = part
+            key = None
+    return params
+
+def requestFromProxmox(url, append):
+    session = getApiSession()
+    response = session.get(api["url"] + url, params=parseAppend(append), timeout=api["timeout"])
+    response.raise_for_status()
+    return response.json()["data"]
+
+def useApi():
+    if api["backend"] == "pvesh" or api["failed"]:
+        return False
+    try:
+        return getApiSession() is not None
+    except Exception:
+        if api["backend"] == "api":
+            raise
+        # login failed or pveproxy not reachable, use pvesh for the rest of this run
+        api["failed"] = True
+        return False
+
+def fetchFromProxmox(url, append):
+    if useApi():
+        try:
+            return requestFromProxmox(url, append)
+        except Exception:
+            if api["backend"] == "api":
+                raise
+            # pveproxy not reachable or token invalid, use pvesh for the rest of this run
+            api["failed"] = True
     return __execute(["sudo", "pvesh", "get", url, append, "--output-format json"])
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('-i', '--info', help='Info category to choose', required = True, choices=["host-version", "cluster-status", "ceph-status", "storage-status", "disk-status", "vms-status", "backup-status", "osd-status"], dest='info')
-    parser.add_argument('-w', '--warning', help='Warning in percent', dest='warning')
-    parser.add_argument('-c', '--critical', help='Critical in percent', dest='critical')
-    args = parser.parse_args()
+def useRados():
+    if cephBackend["backend"] == "cli" or cephBackend["failed"]:
+        return False
+    from ncm_plugin import ceph
 
-    if args.info == "host-version":
-        __exit_ok(socket.gethostname() + " - Proxmox Version: " + getValueFromProxmox("/version")["version"])
-
-    elif args.info == "cluster-status":
-        json = getValueFromProxmox("/cluster/status")
-        output = ""
-        error = False
-        for entry in json:
-            if entry["type"] == "node":
-                line = entry["name"] + " with IP " + entry["ip"] + " is "
-                if entry["online"] == 1:
-                    line += "online \n"
-                    output += "[OK] " + line
-                else:
-                    line += "offline \n"
-                    error = True
-                    output += "[CRITICAL] " + line
-        if error:
-            __exit_critical("One or more host(s) are offline! \n\n" + output)
-        else:
-            __exit_ok("Alle host(s) are ok! \n\n" + output)
-
-    elif args.info == "ceph-status":
-        json = getValueFromProxmox("/cluster/ceph/status")
-        if json["health"]["status"] == "HEALTH_OK":
-            __exit_ok("Ceph is healthy!")
-        elif json["health"]["status"] == "HEALTH_WARN":
-            message = ""
-            for key in json["health"]["checks"].keys():
-                message += "Warning: " + key + " Message: " + json["health"]["checks"][key]["summary"]["message"] + "\n"
-            __exit_warning("Ceph is in warn state. Please check: \n\n" + message)
-        elif json["health"]["status"] == "HEALTH_ERR":
-            message = ""
-            for key in json["health"]["checks"].keys():
-                message += "Error: " + key + " Message: " + json["health"]["checks"][key]["summary"]["message"] + "\n"
-            __exit_warning("Ceph is in error state. Please check: \n\n" + message)
+    cephBackend["conf"] = cephBackend["conf"] or ceph.CEPH_CONF
+    cephBackend["user"] = cephBackend["user"] or ceph.CEPH_USER
+    if cephBackend["backend"] == "rados":
+        return True
+    return ceph.available(cephBackend["conf"], cephBackend["user"])
+
+def fetchFromCeph(command, fallback):
+    # command is the mon command, fallback() fetches the same data without rados
+    if useRados():
+        from ncm_plugin import ceph
+        from ncm_plugin import replay
+
+        key = ["rados"] + [command[name] for name in sorted(command)]
+        try:
+            return replay.call(key, lambda: ceph.monCommand(command, cephBackend["conf"], cephBackend["user"]))
+        except Exception:
+            if cephBackend["backend"] == "rados":
+                raise
+            # monitors not reachable with the rados client, use the CLI for the rest of this run
+            cephBackend["failed"] = True
+    return fallback()
+
+def usePmxcfs():
+    if pmxcfsBackend["backend"] == "off" or pmxcfsBackend["failed"]:
+        return False
+    from ncm_plugin import pmxcfs
+
+    pmxcfsBackend["dir"] = pmxcfsBackend["dir"] or pmxcfs.PVE_DIR
+    pmxcfsBackend["cache"] = pmxcfsBackend["cache"] or pmxcfs.CACHE_FILE
+    if pmxcfsBackend["backend"] == "on":
+        return True
+    return pmxcfs.available(pmxcfsBackend["dir"])
+
+def fetchFromPmxcfs(fetch, fallback):
+    # fetch() reads the pmxcfs files and returns None if they do not cover the request
+    if usePmxcfs():
+        try:
+            data = fetch()
+            if data is not None:
+                return data
+        except Exception:
+            if pmxcfsBackend["backend"] == "on":
+                raise
+            # files not readable (nagios not in www-data) or unexpected content
+            pmxcfsBackend["failed"] = True
+    return fallback()
+
+def getValueFromProxmox(url, append=""):
+    url = url.replace("$hostname$", os.uname().nodename)
+    # every API path is fetched at most once per run, even if several categories need it
+    key = (url, append)
+    if key not in responses:
+        fallback = lambda: getCachedValue(url, append, lambda: fetchFromProxmox(url, append))
+        if url == "/cluster/status" and not append:
+            from ncm_plugin import pmxcfs
+
+            responses[key] = fetchFromPmxcfs(lambda: pmxcfs.getClusterStatus(pmxcfsBackend["dir"]), fallback)
         else:
-            __exit_unknown("Unable to get ceph health status!")
+            responses[key] = fallback()
+    return responses[key]
 
-    elif args.info == "storage-status":
-        if args.warning == None or args.critical == None:
-            __exit_unknown("Commandline incomplete!")
-        json = getValueFromProxmox("/nodes/$hostname$/storage")
-        message = ""
-        prefdata = ""
-        error = False
-        warning = False
-        for entry in json:
-            if entry["active"] == 1:
-                usage = round((entry["used"] / entry["total"]) * 100)
-                line = "Name: " + entry["storage"] + ", Usage: " + str(usage) + "% (" + str(round(entry["used"] / 1024 / 1024 / 1024)) + " GB / " + str(round(entry["total"] / 1024 / 1024 / 1024)) + " GB) \n"
-                
-                prefdata += " " + entry["storage"] + "="
-                prefdata += str(round(entry["used"] / 1024 / 1024 / 1024, 2)) + ";"
-                prefdata += str(round(entry["total"] * (int(args.warning) / 100) / 1024 / 1024 / 1024, 2)) + ";"
-                prefdata += str(round(entry["total"] * (int(args.critical) / 100) / 1024 / 1024 / 1024, 2)) + ";0;"
-                prefdata += str(round(entry["total"] / 1024 / 1024 / 1024, 2))
-
-                if usage >= int(args.warning) and usage < int(args.critical):
-                    warning = True
-                    message += "[WARNING] " + line
-                elif usage >= int(args.critical):
-                    critical = True
-                    message += "[CRITICAL] " + line
-                else:
-                    message += "[OK] " + line
+def getSnapshots(vmids, workers):
+    from ncm_plugin import pmxcfs
+
+    # snapshot lists of the local VMs, from the guest configs or one pvesh call per VM
+    node = os.uname().nodename
+    return fetchFromPmxcfs(
+        lambda: pmxcfs.getSnapshots(node, vmids, pmxcfsBackend["dir"], pmxcfsBackend["cache"] if cache["enabled"] else None),
+        lambda: getValuesFromProxmox(["/nodes/$hostname$/qemu/" + str(vmid) + "/snapshot" for vmid in vmids], workers))
+
+def streamValuesFromProxmox(url, append=""):
+    url = url.replace("$hostname$", os.uname().nodename)
+    if useApi():
+        try:
+            return iter(requestFromProxmox(url, append))
+        except Exception:
+            if api["backend"] == "api":
+                raise
+            api["failed"] = True
+    return __stream(["sudo", "pvesh", "get", url, append, "--output-format json"])
+
+def parseVzdumpLog(lines):
+    backupTasks = {}
+    lastBackupTask = None
+    for line in lines:
+        match = VZDUMP_LOG_PATTERN.search(line["t"])
+        if match is None:
+            continue
+        if match.group("start") is not None:
+            lastBackupTask = match.group("start")
+            backupTasks[lastBackupTask] = {"name": "n/a", "size": "n/a", "time": "n/a", "rate": "n/a", "reuse": "n/a", "status": "success", "message": ""}
+        elif lastBackupTask is None:
+            continue
+        elif match.group("name") is not None:
+            backupTasks[lastBackupTask]["name"] = match.group("name").strip()
+        elif match.group("size") is not None:
+            backupTasks[lastBackupTask]["size"] = match.group("size")
+            backupTasks[lastBackupTask]["time"] = match.group("time")
+            backupTasks[lastBackupTask]["rate"] = match.group("rate")
+        elif match.group("reuse") is not None:
+            backupTasks[lastBackupTask]["reuse"] = match.group("reuse")
+        elif match.group("failed") in backupTasks:
+            backupTasks[match.group("failed")]["status"] = "failed"
+            backupTasks[match.group("failed")]["message"] = line["t"]
+    return backupTasks
+
+def getBackupTasks(task):
+    import hashlib
+
+    finished = "endtime" in task
+    filename = os.path.join(VZDUMP_CACHE_DIR, hashlib.sha1(task["upid"].encode("utf-8")).hexdigest() + ".json")
+    if finished and cache["enabled"]:
+        try:
+            with open(filename, "r") as f:
+                entry = json.load(f)
+            if 0 <= time.time() - entry["time"] <= VZDUMP_CACHE_MAX_AGE:
+                return entry["tasks"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    backupTasks = parseVzdumpLog(streamValuesFromProxmox("/nodes/" + task.get("node", "$hostname$") + "/tasks/" + task["upid"] + "/log", "--limit 9999999"))
+
+    # a failed fetch raises before this point, an empty result is not worth keeping
+    if finished and cache["enabled"] and backupTasks:
+        import tempfile
 
-        if error:
-            __exit_critical("Storage critical. Please check: \n\n" + message + " |" + prefdata)
-        elif warning:
-            __exit_warning("Storage warning. Please check: \n\n" + message + " |" + prefdata)
+        try:
+            os.makedirs(VZDUMP_CACHE_DIR, exist_ok=True)
+            fd, tmpfile = tempfile.mkstemp(dir=VZDUMP_CACHE_DIR, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"upid": task["upid"], "time": time.time(), "tasks": backupTasks}, f)
+            os.replace(tmpfile, filename)
+            pruneBackupTasksCache()
+        except OSError:
+            pass
+    return backupTasks
+
+def pruneBackupTasksCache():
+    expired = time.time() - VZDUMP_CACHE_MAX_AGE
+    for entry in os.scandir(VZDUMP_CACHE_DIR):
+        try:
+            if entry.stat().st_mtime < expired:
+                os.unlink(entry.path)
+        except OSError:
+            pass
+
+def getValuesFromProxmox(urls, workers, append=""):
+    # fetch several API paths concurrently, the result list keeps the order of urls
+    from ncm_plugin import parallel
+
+    return parallel.mapConcurrently(lambda url: getValueFromProxmox(url, append), urls, workers)
+
+def parseCacheTTL(value):
+    pattern, sep, ttl = value.rpartition("=")
+    if not sep or not pattern or not ttl.isdigit():
+        raise argparse.ArgumentTypeError("expected PATH=SECONDS, got '" + value + "'")
+    return (pattern, int(ttl))
+
+def parseInfo(value):
+    categories = []
+    for category in value.split(","):
+        category = category.strip()
+        if category == "all":
+            categories.extend(CATEGORIES)
+        elif category in CATEGORIES:
+            categories.append(category)
         else:
-            __exit_ok("Storage OK! \n\n" + message + " |" + prefdata)
+            raise argparse.ArgumentTypeError("invalid choice: '" + category + "' (choose from all, " + ", ".join(CATEGORIES) + ")")
+    return list(dict.fromkeys(categories))
+
+def parseThreshold(value):
+    category, sep, thresholds = value.partition("=")
+    warning, sep2, critical = thresholds.partition(",")
+    if not sep or not sep2 or category not in CATEGORIES:
+        raise argparse.ArgumentTypeError("expected CATEGORY=WARNING,CRITICAL, got '" + value + "'")
+    return (category, warning, critical)
+
+def getForecast(metric, used, total, args):
+    from ncm_plugin import history
+
+    # days until full from the local sample history, returns (state, days, text, perfdata);
+    # without --forecast or a forecast threshold the sample is only recorded
+    wanted = args.forecast or args.forecastwarning is not None or args.forecastcritical is not None
+    days = history.daysUntilFull(metric, used, total, args.forecastmethod if wanted else None)
+    if days is None:
+        return OK, None, "", ""
+    state = OK
+    if args.forecastcritical is not None and days < args.forecastcritical:
+        state = CRITICAL
+    elif args.forecastwarning is not None and days < args.forecastwarning:
+        state = WARNING
+    thresholds = ";" + ("" if args.forecastwarning is None else str(args.forecastwarning)) + ";" + ("" if args.forecastcritical is None else str(args.forecastcritical))
+    return state, days, ", Full in " + str(int(days)) + " days", str(round(days, 1)) + thresholds
+
+def getOutput(args):
+    return output.Output(args.maxlines, args.maxperfdata)
+
+def checkHostVersion(args):
+    return OK, os.uname().nodename + " - Proxmox Version: " + getValueFromProxmox("/version")["version"]
 
-    elif args.info == "disk-status":
-        json = getValueFromProxmox("/nodes/$hostname$/disks/list")
+def checkClusterStatus(args):
+    values = getValueFromProxmox("/cluster/status")
+    result = getOutput(args)
+    for entry in values:
+        if entry["type"] == "node":
+            line = entry["name"] + " with IP " + entry["ip"] + " is "
+            if entry["online"] == 1:
+                result.add(OK, line + "online")
+            else:
+                result.add(CRITICAL, line + "offline")
+    if result.getState() == CRITICAL:
+        return CRITICAL, result.render("One or more host(s) are offline!")
+    return OK, result.render("Alle host(s) are ok!")
+
+def checkCephStatus(args):
+    values = fetchFromCeph({"prefix": "status"}, lambda: getValueFromProxmox("/cluster/ceph/status"))
+    if values["health"]["status"] == "HEALTH_OK":
+        return OK, "Ceph is healthy!"
+    elif values["health"]["status"] == "HEALTH_WARN":
+        message = ""
+        for key in values["health"]["checks"].keys():
+            message += "Warning: " + key + " Message: " + values["health"]["checks"][key]["summary"]["message"] + "\n"
+        return WARNING, "Ceph is in warn state. Please check: \n\n" + message
+    elif values["health"]["status"] == "HEALTH_ERR":
         message = ""
-        error = False
-        for entry in json:
-            line = "Name: " + entry["vendor"].replace(" ", "") + " " + entry["model"] + ", Size: " + str(round(entry["size"] / 1024 / 1024 / 1024)) + " GB, Path: " + entry["devpath"] 
-            if entry["health"] == "OK" or entry["health"] == "PASSED":
-                message += "[OK] " + line + "\n"
-            elif entry["health"] == "UNKNOWN":
-                message += "[OK] " + line + " (RAID Controller, no SMART values!)\n" 
+        for key in values["health"]["checks"].keys():
+            message += "Error: " + key + " Message: " + values["health"]["checks"][key]["summary"]["message"] + "\n"
+        return WARNING, "Ceph is in error state. Please check: \n\n" + message
+    return UNKNOWN, "Unable to get ceph health status!"
+
+def checkStorageStatus(args):
+    if args.warning == None or args.critical == None:
+        return UNKNOWN, "Commandline incomplete!"
+    values = getValueFromProxmox("/nodes/$hostname$/storage")
+    result = getOutput(args)
+    for entry in values:
+        if entry["active"] == 1:
+            usage = round((entry["used"] / entry["total"]) * 100)
+            forecastState, days, forecast, forecastData = getForecast("proxmox/storage/" + os.uname().nodename + "/" + entry["storage"], entry["used"], entry["total"], args)
+            line = "Name: " + entry["storage"] + ", Usage: " + str(usage) + "% (" + str(round(entry["used"] / 1024 / 1024 / 1024)) + " GB / " + str(round(entry["total"] / 1024 / 1024 / 1024)) + " GB)" + forecast
+
+            result.addPerfdata(entry["storage"], round(entry["used"] / 1024 / 1024 / 1024, 2), "",
+                round(entry["total"] * (int(args.warning) / 100) / 1024 / 1024 / 1024, 2),
+                round(entry["total"] * (int(args.critical) / 100) / 1024 / 1024 / 1024, 2),
+                0, round(entry["total"] / 1024 / 1024 / 1024, 2), group="storage_used")
+            if days is not None:
+                result.addPerfdata(entry["storage"] + "_full", round(days, 1), "", args.forecastwarning, args.forecastcritical, group="storage_full")
+
+            if usage >= int(args.warning) and usage < int(args.critical):
+                result.add(WARNING, line)
+            elif usage >= int(args.critical):
+                result.add(CRITICAL, line)
             else:
-                message += "[CRITICAL] " + line + "\n"
-                error = True
+                result.add(forecastState, line)
+
+    state = result.getState()
+    if state == CRITICAL:
+        return CRITICAL, result.render("Storage critical. Please check:")
+    elif state == WARNING:
+        return WARNING, result.render("Storage warning. Please check:")
+    return OK, result.render("Storage OK!")
 
-        if error:
-            __exit_critical("One or more disk are in error state. Please check: \n\n" + message)
+def checkDiskStatus(args):
+    values = getValueFromProxmox("/nodes/$hostname$/disks/list")
+    result = getOutput(args)
+    for entry in values:
+        line = "Name: " + entry["vendor"].replace(" ", "") + " " + entry["model"] + ", Size: " + str(round(entry["size"] / 1024 / 1024 / 1024)) + " GB, Path: " + entry["devpath"]
+        if entry["health"] == "OK" or entry["health"] == "PASSED":
+            result.add(OK, line)
+        elif entry["health"] == "UNKNOWN":
+            result.add(OK, line + " (RAID Controller, no SMART values!)")
         else:
-            __exit_ok("All disks are ok! \n\n" + message)
+            result.add(CRITICAL, line)
 
-    elif args.info == "vms-status":
-        if args.warning == None or args.critical == None:
-            __exit_unknown("Commandline incomplete!")
-        json = getValueFromProxmox("/nodes/$hostname$/qemu")
-        message = ""
-        error = False
-        warning = False
-        for entry in json:
-            json2 = getValueFromProxmox("/nodes/$hostname$/qemu/" + str(entry["vmid"]) + "/snapshot")
-            line = "Name: " + entry["name"] + "(" + str(entry["vmid"]) + "), Status: " + entry["status"] + ", Uptime: " + str(datetime.timedelta(seconds=int(entry["uptime"])))
-            if len(json2) > 1:
-                line += ", " + str(len(json2) - 1) + " Snapshot(s): "
-                tmp_error = False
-                tmp_warning = False
-                for snapshot in json2:
-                    if snapshot["name"] != "current":
-                        snapshot_age = datetime.timedelta(seconds=(dt.timestamp(dt.now()) - snapshot["snaptime"]))
-                        line += snapshot["name"] + " (" + str(snapshot_age.days) + " days), "
-                        if snapshot_age.days > int(args.warning):
-                            if snapshot_age.days > int(args.critical):
-                                tmp_error = True
-                            else:
-                                tmp_warning = True
-                if tmp_error:
-                    message += "[CRITICAL] " + line[:-2] + "\n"
-                    error = True
-                elif tmp_warning:
-                    message += "[WARNING] " + line[:-2] + "\n"
-                    warning = True
-                else:
-                    message += "[OK] " + line[:-2] + "\n"
+    if result.getState() == CRITICAL:
+        return CRITICAL, result.render("One or more disk are in error state. Please check:")
+    return OK, result.render("All disks are ok!")
+
+def checkVmsStatus(args):
+    import datetime
+
+    from datetime import datetime as dt
+
+    if args.warning == None or args.critical == None:
+        return UNKNOWN, "Commandline incomplete!"
+    starttime = time.monotonic()
+    values = getValueFromProxmox("/nodes/$hostname$/qemu")
+    # there is no cluster wide snapshot endpoint, so read the guest configs or query all VMs with a bounded worker pool
+    allSnapshots = getSnapshots([entry["vmid"] for entry in values], args.workers)
+    result = getOutput(args)
+    for entry, snapshots in zip(values, allSnapshots):
+        line = "Name: " + entry["name"] + "(" + str(entry["vmid"]) + "), Status: " + entry["status"] + ", Uptime: " + str(datetime.timedelta(seconds=int(entry["uptime"])))
+        if len(snapshots) > 1:
+            line += ", " + str(len(snapshots) - 1) + " Snapshot(s): "
+            tmp_error = False
+            tmp_warning = False
+            for snapshot in snapshots:
+                if snapshot["name"] != "current":
+                    snapshot_age = datetime.timedelta(seconds=(dt.timestamp(dt.now()) - snapshot["snaptime"]))
+                    line += snapshot["name"] + " (" + str(snapshot_age.days) + " days), "
+                    if snapshot_age.days > int(args.warning):
+                        if snapshot_age.days > int(args.critical):
+                            tmp_error = True
+                        else:
+                            tmp_warning = True
+            if tmp_error:
+                result.add(CRITICAL, line[:-2])
+            elif tmp_warning:
+                result.add(WARNING, line[:-2])
             else:
-                message += "[OK] " + line + "\n"
-        if error:
-            __exit_critical("One or more vms have old snapshots. Please check: \n\n" + message)
-        elif warning:
-            __exit_warning("One or more vms have old snapshots. Please check: \n\n" + message)
+                result.add(OK, line[:-2])
         else:
-            __exit_ok("All VMs are OK! \n\n" + message)
-
-    elif args.info == "backup-status":
-        if args.warning == None or args.critical == None:
-            __exit_unknown("Commandline incomplete!")
-        backupPlans = {}
-        for backup in getValueFromProxmox("/cluster/backup"):
-            backupInfos = getValueFromProxmox("/cluster/backup/" + backup["id"])
-            if "starttime" in backupInfos:
-                backupPlans[backupInfos["starttime"]] = backupInfos
-            elif "schedule" in backupInfos:
-                backupPlans[backupInfos["schedule"]] = backupInfos
-
-        json = getValueFromProxmox("/nodes/$hostname$/tasks", "--typefilter vzdump --limit 10")
-        message = ""
-        error = False
-        warning = False
-        critical = False
-
-        for entry in json:
-            if "starttime" in entry:
-                starttime = dt.fromtimestamp(entry["starttime"])
-            elif "schedule" in entry:
-                starttime = dt.fromtimestamp(entry["schedule"])
-            if starttime.strftime('%H:%M') in backupPlans:
-                if "dow" in backupPlans[starttime.strftime('%H:%M')]:
-                    dayschedule = backupPlans[starttime.strftime('%H:%M')]["dow"]
+            result.add(OK, line)
+    result.addPerfdata("runtime", round(time.monotonic() - starttime, 3), "s")
+    result.addPerfdata("vms", len(values))
+    state = result.getState()
+    if state == CRITICAL:
+        return CRITICAL, result.render("One or more vms have old snapshots. Please check:")
+    elif state == WARNING:
+        return WARNING, result.render("One or more vms have old snapshots. Please check:")
+    return OK, result.render("All VMs are OK!")
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+SCHEDULE_KEYWORDS = {
+    "minutely": 60,
+    "hourly": 3600,
+    "daily": 86400,
+    "weekly": 7 * 86400,
+    "monthly": 31 * 86400,
+    "yearly": 366 * 86400,
+    "annually": 366 * 86400,
+}
+
+def getMaxGap(selected, period):
+    # largest distance between two selected positions on a cycle of length period
+    selected = sorted(set(selected))
+    if not selected:
+        return period
+    gaps = [b - a for a, b in zip(selected, selected[1:])] + [selected[0] + period - selected[-1]]
+    return max(gaps)
+
+def parseCalendarValues(value, period):
+    # "*", "*/15", "2,14", "8..18" -> selected positions, None for "*"
+    selected = []
+    for part in value.split(","):
+        step = 1
+        if "/" in part:
+            part, step = part.split("/", 1)
+            step = int(step)
+            if part == "*":
+                part = "0"
+        if part == "*":
+            return None
+        if ".." in part:
+            first, last = part.split("..", 1)
+            selected.extend(range(int(first), int(last) + 1, step))
+        elif step > 1:
+            selected.extend(range(int(part), period, step))
+        else:
+            selected.append(int(part))
+    return selected
+
+def parseWeekdays(value):
+    selected = []
+    for part in value.lower().split(","):
+        if ".." in part:
+            first, last = [WEEKDAYS.index(day[:3]) for day in part.split("..", 1)]
+            selected.extend(range(first, last + 1) if first <= last else list(range(first, 7)) + list(range(0, last + 1)))
+        else:
+            selected.append(WEEKDAYS.index(part[:3]))
+    return selected
+
+def getScheduleInterval(schedule):
+    # longest time between two runs of a systemd-like calendar event ("sat 03:30",
+    # "mon..fri 22:00", "*/15", "hourly", "*-*-01 02:00"), one day if unknown
+    schedule = schedule.strip().lower()
+    if schedule in SCHEDULE_KEYWORDS:
+        return SCHEDULE_KEYWORDS[schedule]
+    try:
+        interval = 86400
+        for part in schedule.split():
+            if part[:3] in WEEKDAYS:
+                interval = max(interval, getMaxGap(parseWeekdays(part), 7) * 86400)
+            elif "-" in part:
+                # a fixed day of month, at most one run per month
+                if part.split("-")[-1] != "*":
+                    interval = max(interval, 31 * 86400)
+            elif ":" in part or part.startswith("*") or part.isdigit():
+                fields = part.split(":")
+                hours = parseCalendarValues(fields[0], 24) if len(fields) > 1 else None
+                minutes = parseCalendarValues(fields[-1], 60)
+                if hours is None and len(fields) > 1:
+                    # every hour, or more often
+                    interval = min(interval, 3600 if minutes is not None and len(set(minutes)) == 1 else getMaxGap(minutes or [0], 60) * 60)
+                elif len(fields) == 1:
+                    # only minutes given ("*/15"), runs every hour
+                    interval = min(interval, getMaxGap(minutes or [0], 60) * 60)
                 else:
-                    dayschedule = "daily"
-                message += "Infos for backup '" + dayschedule + "' at '" + starttime.strftime('%H:%M') + "':\n"
-                now = dt.now()
-                timespanLastBackup = (now - starttime)
-                timespanLastBackup = (timespanLastBackup.seconds / 60 / 60) + (timespanLastBackup.days * 24)
-
-                json2 = getValueFromProxmox("/nodes/$hostname$/tasks/" + entry["upid"] + "/log", "--limit 9999999")
-                backupTasks = {}
-                lastBackupTask = None
-                for line in json2:
-                    if "INFO: Starting Backup of VM" in line["t"]:
-                        pvid = line["t"].replace("INFO: Starting Backup of VM ", "").strip().split(" ")[0]
-                        backupTasks[pvid] = {"name": "n/a", "size": "n/a", "time": "n/a", "rate": "n/a", "reuse": "n/a", "status": "success", "message": ""}
-                        newBackupTask = True
-                        lastBackupTask = pvid
-
-                    if lastBackupTask is not None:
-                        if "INFO: VM Name:" in line["t"]:
-                            backupTasks[lastBackupTask]["name"] = line["t"].replace("INFO: VM Name:", "").strip()
-                        if "INFO: transferred" in line["t"]:
-                            backupTasks[lastBackupTask]["size"] = line["t"].split(" ")[2]
-                            backupTasks[lastBackupTask]["time"] = line["t"].split(" ")[5]
-                            backupTasks[lastBackupTask]["rate"] = line["t"].split(" ")[7].replace("(", "").replace(")", "")
-                        if "INFO: backup was done" in line["t"]:
-                            backupTasks[lastBackupTask]["reuse"] = line["t"].split(" ")[8].replace("(", "").replace(")", "")
-                        if "ERROR: Backup of VM " + lastBackupTask + " failed" in line["t"]:
-                            backupTasks[lastBackupTask]["status"] = "failed"
-                            backupTasks[lastBackupTask]["message"] = line["t"]
-
-                for backup in backupTasks:
-                    if backupTasks[backup]["status"] == "success":
-                        message += "  [OK] " + backupTasks[backup]["name"] + " (" + backup + ") - Transfer " + backupTasks[backup]["size"] + " GiB in " + backupTasks[backup]["time"] + " seconds with " + backupTasks[backup]["rate"] + " MiB/s\n"
-                    else:
-                        message += "  [CRITICAL] " + backupTasks[backup]["name"] + " (" + backup + ") - Message: " + backupTasks[backup]["message"] + "\n"
-                        error = True
-
-                message += "\n\n"
-
-                if timespanLastBackup > int(args.warning):
-                    warning = True
-                elif timespanLastBackup > int(args.critical):
-                    critical = True
+                    interval = min(interval, getMaxGap(hours, 24) * 3600) if len(set(hours)) > 1 else interval
+        return interval
+    except (ValueError, IndexError):
+        return 86400
 
-                break
+def getBackupJobs():
+    # every job definition in one call, legacy jobs have starttime/dow instead of schedule
+    jobs = []
+    for job in getValueFromProxmox("/cluster/backup"):
+        if str(job.get("enabled", 1)) == "0":
+            continue
+        schedule = job.get("schedule")
+        if not schedule:
+            schedule = (job["dow"] + " " if "dow" in job else "") + job.get("starttime", "daily")
+        job["schedule"] = schedule
+        job["interval"] = getScheduleInterval(schedule)
+        jobs.append(job)
+    return jobs
+
+def getJobGuests(job, guests):
+    # vmids of the guests a job backs up (all with exclude, vmid list or pool, optional node)
+    vmids = set(str(vmid) for vmid in guests)
+    if str(job.get("all", 0)) == "1":
+        selected = vmids - set(str(job.get("exclude", "")).replace(" ", "").split(","))
+    elif job.get("pool"):
+        selected = set(vmid for vmid in vmids if guests[vmid].get("pool") == job["pool"])
+    else:
+        selected = vmids & set(str(job.get("vmid", "")).replace(" ", "").split(","))
+    if job.get("node"):
+        selected = set(vmid for vmid in selected if guests[vmid]["node"] == job["node"])
+    return selected
+
+def checkBackupStatus(args):
+    from ncm_plugin import parallel
+
+    if args.warning == None or args.critical == None:
+        return UNKNOWN, "Commandline incomplete!"
+    now = time.time()
+
+    guests = {}
+    for entry in getValueFromProxmox("/cluster/resources", "--type vm"):
+        guests[str(entry["vmid"])] = entry
+    jobs = getBackupJobs()
+
+    # RPO of every guest: thresholds in hours, extended by the interval of jobs running less than daily
+    limits = {}
+    for job in jobs:
+        grace = max(job["interval"] - 86400, 0)
+        for vmid in getJobGuests(job, guests):
+            warning, critical, names = limits.get(vmid, (None, None, []))
+            jobWarning = int(args.warning) * 3600 + grace
+            jobCritical = int(args.critical) * 3600 + grace
+            limits[vmid] = (jobWarning if warning is None else min(warning, jobWarning), jobCritical if critical is None else min(critical, jobCritical), names + [job["id"]])
+    lookback = max([critical for warning, critical, names in limits.values()] or [0])
+
+    # vzdump tasks of all online nodes, only those young enough to matter for a verdict
+    nodes = [entry["name"] for entry in getValueFromProxmox("/cluster/status") if entry["type"] == "node" and entry.get("online") == 1]
+    tasks = []
+    for nodeTasks in getValuesFromProxmox(["/nodes/" + node + "/tasks" for node in nodes], args.workers, "--typefilter vzdump --limit 100"):
+        tasks.extend(task for task in nodeTasks if task.get("starttime", 0) >= now - lookback)
+    tasks.sort(key=lambda task: task["starttime"], reverse=True)
+    results = parallel.mapConcurrently(getBackupTasks, tasks, args.workers)
 
-        if error:
-            __exit_critical("One or more backup(s) failed! Please check the log for more details!\n\n" + message)
+    # single pass from the newest task: first attempt and last success per guest
+    latest = {}
+    success = {}
+    for task, backupTasks in zip(tasks, results):
+        vmids = list(backupTasks)
+        if "endtime" not in task and vmids:
+            # the last guest of a running task may still be in progress
+            if backupTasks[vmids[-1]]["status"] != "failed":
+                vmids = vmids[:-1]
+        for vmid in vmids:
+            backup = dict(backupTasks[vmid], starttime=task["starttime"])
+            latest.setdefault(vmid, backup)
+            if backup["status"] == "success":
+                success.setdefault(vmid, backup)
 
-        if warning:
-            __exit_warning("Last backup was " + str(round(timespanLastBackup, 2)) + " ago and is older than " + args.warning + " hour(s)!\n\n" + message)
-        elif critical:
-            __exit_critical("Last backup was " + str(round(timespanLastBackup, 2)) + " ago and is older than " + args.critical  + " hour(s)!\n\n" + message)
+    result = getOutput(args)
+    states = {}
+    unprotected = 0
+    oldest = 0
+    for vmid in sorted(guests, key=int):
+        guest = guests[vmid]
+        name = guest.get("name", "n/a") + " (" + vmid + ", " + guest["node"] + ")"
+        if vmid not in limits:
+            unprotected += 1
+            continue
+        warning, critical, names = limits[vmid]
+        jobsText = " [" + ", ".join(names) + "]"
+        if vmid in latest and latest[vmid]["status"] == "failed":
+            states[vmid] = CRITICAL
+            result.add(CRITICAL, name + " - last backup failed: " + latest[vmid]["message"] + jobsText)
+            continue
+        if vmid not in success:
+            states[vmid] = CRITICAL
+            result.add(CRITICAL, name + " - no successful backup in the last " + str(round(critical / 3600)) + " hour(s)" + jobsText)
+            continue
+        backup = success[vmid]
+        age = now - backup["starttime"]
+        oldest = max(oldest, age)
+        if age > critical:
+            states[vmid] = CRITICAL
+        elif age > warning:
+            states[vmid] = WARNING
         else:
-            __exit_ok("Backups ok! Last backup was " + str(round(timespanLastBackup, 2)) + " hour(s) ago.\n\n" + message)
+            states[vmid] = OK
+        result.add(states[vmid], name + " - last backup " + str(round(age / 3600, 1)) + " hour(s) ago, transfer " + backup["size"] + " GiB in " + backup["time"] + " seconds with " + backup["rate"] + " MiB/s" + jobsText)
 
-    elif args.info == "osd-status":
-        if args.warning == None or args.critical == None:
-            __exit_unknown("Commandline incomplete!")
+    # worst guests first, then by vmid
+    result.lines.sort(key=lambda line: SEVERITY.index(line[0]), reverse=True)
 
-        osdList = __execute(["sudo", "ceph", "osd", "df", "tree", "-f", "json"])
+    for job in jobs:
+        jobGuests = getJobGuests(job, guests)
+        failing = len([vmid for vmid in jobGuests if states[vmid] != OK])
+        result.addFooter("Job " + job["id"] + ": schedule '" + job["schedule"] + "', every " + str(round(job["interval"] / 3600, 1)) + " hour(s) at most, " + str(len(jobGuests)) + " guest(s), " + str(failing) + " not ok")
 
-        message = ""
-        error = False
-        warning = False
-
-        for osd in osdList["nodes"]:
-            if osd["id"] > 0:
-
-                total = osd["kb"]
-                used = osd["kb_used"]
-                percent = (used / total) * 100
-
-                if osd["status"] == "up":
-                    if percent >= int(args.warning) and percent < int(args.critical):
-                        message += "[CRITICAL] "
-                    elif percent >= int(args.critical):
-                        message += "[WARNING] "
-                    else:
-                        message += "[OK] "
-                else:
-                    message += "[CRITICAL] "
+    counts = {OK: 0, WARNING: 0, CRITICAL: 0}
+    for state in states.values():
+        counts[state] += 1
+    result.addPerfdata("guests", len(guests))
+    result.addPerfdata("guests_ok", counts[OK])
+    result.addPerfdata("guests_warning", counts[WARNING])
+    result.addPerfdata("guests_critical", counts[CRITICAL])
+    result.addPerfdata("guests_unprotected", unprotected)
+    result.addPerfdata("oldest_backup", round(oldest / 3600, 2), "h", args.warning, args.critical)
+    result.addPerfdata("tasks", len(tasks))
 
-                message +=  osd["name"] + " (" + osd["device_class"].upper() + ") - " + str(round(used / 1024 / 1024 / 1024, 2)) + " / " + str(round(total / 1024 / 1024 / 1024, 2)) + " TB = " + str(round(percent, 2)) + "% ussage\n"
+    summary = str(len(limits)) + " guest(s) in " + str(len(jobs)) + " backup job(s): " + str(counts[CRITICAL]) + " critical, " + str(counts[WARNING]) + " warning, " + str(counts[OK]) + " ok"
+    if unprotected:
+        summary += ", " + str(unprotected) + " guest(s) without backup job"
+    state = result.getState()
+    if state == CRITICAL:
+        return CRITICAL, result.render("Backups failed or too old! " + summary)
+    elif state == WARNING:
+        return WARNING, result.render("Backups too old! " + summary)
+    return OK, result.render("Backups ok! " + summary)
 
-        if error:
-            __exit_critical("Some of the OSDs have a problem!\n\n" + message)
-        elif warning:
-            __exit_warning("Some OSDs soon will have a problem!\n\n" + message)
+def getOsdGroups(keys, kb, used, util):
+    # fill, mean, standard deviation and spread of the utilization per group key
+    groups = {}
+    for index, key in enumerate(keys):
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {"osds": 0, "kb": 0, "used": 0, "sum": 0.0, "squares": 0.0, "min": 100.0, "max": 0.0}
+        group["osds"] += 1
+        group["kb"] += kb[index]
+        group["used"] += used[index]
+        group["sum"] += util[index]
+        group["squares"] += util[index] * util[index]
+        group["min"] = min(group["min"], util[index])
+        group["max"] = max(group["max"], util[index])
+    for group in groups.values():
+        mean = group["sum"] / group["osds"]
+        group["fill"] = group["used"] / group["kb"] * 100 if group["kb"] else 0.0
+        group["stddev"] = max(group["squares"] / group["osds"] - mean * mean, 0.0) ** 0.5
+        group["imbalance"] = group["max"] - group["min"]
+    return groups
+
+def checkOsdStatus(args):
+    if args.warning == None or args.critical == None:
+        return UNKNOWN, "Commandline incomplete!"
+
+    osdList = fetchFromCeph({"prefix": "osd df", "output_method": "tree"}, lambda: __execute(["sudo", "ceph", "osd", "df", "tree", "-f", "json"]))
+    osdDump = fetchFromCeph({"prefix": "osd dump"}, lambda: __execute(["sudo", "ceph", "osd", "dump", "-f", "json"]))
+    nearfull = osdDump.get("nearfull_ratio", 0.85) * 100
+    backfillfull = osdDump.get("backfillfull_ratio", 0.90) * 100
+
+    # one pass over the tree into columns, the host of an OSD is its parent bucket
+    hostOf = {}
+    names, classes, kb, used, up, ids = [], [], [], [], [], []
+    for node in osdList["nodes"]:
+        if node["type"] == "host":
+            for child in node.get("children", []):
+                hostOf[child] = node["name"]
+        elif node["type"] == "osd":
+            ids.append(node["id"])
+            names.append(node["name"])
+            classes.append(node.get("device_class", "none"))
+            kb.append(node.get("kb", 0))
+            used.append(node.get("kb_used", 0))
+            up.append(node["status"] == "up")
+    if not names:
+        return OK, "No OSDs found!"
+    hosts = [hostOf.get(osdId, "none") for osdId in ids]
+    # an OSD that is down and out reports 0 kb
+    util = [used[index] / kb[index] * 100 if kb[index] else 0.0 for index in range(len(names))]
+
+    result = getOutput(args)
+    problems = []
+    fullIn = None
+    for index in range(len(names)):
+        forecastState, days, forecast, forecastData = OK, None, "", ""
+        if kb[index]:
+            forecastState, days, forecast, forecastData = getForecast("ceph/osd/" + names[index], used[index], kb[index], args)
+        if days is not None:
+            fullIn = days if fullIn is None else min(fullIn, days)
+        if not up[index]:
+            state = CRITICAL
+        elif util[index] >= int(args.critical):
+            state = CRITICAL
+        elif util[index] >= int(args.warning):
+            state = WARNING
         else:
-            __exit_ok("All OSDs are up!\n\n" + message)
+            state = forecastState
+        if state != OK:
+            problems.append((SEVERITY.index(state), util[index], state, names[index] + " (" + classes[index].upper() + ", " + hosts[index] + ") " + ("up" if up[index] else "down") + " - " + str(round(util[index], 2)) + "% used" + forecast))
 
-    else:
-        __exit_unknown("Commandline incomplete!")
+    # fullest problem OSDs first
+    problems.sort(key=lambda problem: (-problem[0], -problem[1]))
+    for severity, percent, state, line in problems:
+        result.add(state, line)
+
+    cluster = getOsdGroups(["all"] * len(names), kb, used, util)["all"]
+    byClass = getOsdGroups(classes, kb, used, util)
+    byHost = getOsdGroups(hosts, kb, used, util)
+    fullest = max(range(len(names)), key=lambda index: util[index])
+    down = up.count(False)
+
+    summary = str(len(names)) + " OSDs, " + str(down) + " down, fill " + str(round(cluster["fill"], 2)) + "% (stddev " + str(round(cluster["stddev"], 2)) + ", spread " + str(round(cluster["imbalance"], 2)) + "), fullest " + names[fullest] + " " + str(round(util[fullest], 2)) + "%, headroom to nearfull " + str(round(nearfull - util[fullest], 2)) + "%, to backfillfull " + str(round(backfillfull - util[fullest], 2)) + "%"
+    if fullIn is not None:
+        summary += ", first OSD full in " + str(int(fullIn)) + " days"
+
+    result.addFooter("Device classes:")
+    for name in sorted(byClass):
+        group = byClass[name]
+        result.addFooter(" - " + name + ": " + str(group["osds"]) + " OSDs, fill " + str(round(group["fill"], 2)) + "%, stddev " + str(round(group["stddev"], 2)) + ", spread " + str(round(group["imbalance"], 2)))
+    result.addFooter("\nHosts:")
+    for name in sorted(byHost):
+        group = byHost[name]
+        result.addFooter(" - " + name + ": " + str(group["osds"]) + " OSDs, fill " + str(round(group["fill"], 2)) + "%, max " + str(round(group["max"], 2)) + "%")
+
+    result.addPerfdata("osds", len(names))
+    result.addPerfdata("osds_down", down)
+    result.addPerfdata("fill", round(cluster["fill"], 2), "%", args.warning, args.critical, 0, 100)
+    result.addPerfdata("fill_max", round(util[fullest], 2), "%", args.warning, args.critical, 0, 100)
+    result.addPerfdata("stddev", round(cluster["stddev"], 2))
+    result.addPerfdata("spread", round(cluster["imbalance"], 2))
+    result.addPerfdata("nearfull_headroom", round(nearfull - util[fullest], 2), "%")
+    result.addPerfdata("backfillfull_headroom", round(backfillfull - util[fullest], 2), "%")
+    for name in sorted(byClass):
+        group = byClass[name]
+        result.addPerfdata("class_" + name + "_fill", round(group["fill"], 2), "%", "", "", 0, 100)
+        result.addPerfdata("class_" + name + "_stddev", round(group["stddev"], 2))
+        result.addPerfdata("class_" + name + "_spread", round(group["imbalance"], 2))
+    for name in sorted(byHost):
+        result.addPerfdata("host_" + name + "_fill", round(byHost[name]["fill"], 2), "%", "", "", 0, 100, group="host_fill")
+    if fullIn is not None:
+        result.addPerfdata("full_days", round(fullIn, 1))
+
+    state = result.getState()
+    if state == CRITICAL:
+        return CRITICAL, result.render("Some of the OSDs have a problem! " + summary)
+    elif state == WARNING:
+        return WARNING, result.render("Some OSDs soon will have a problem! " + summary)
+    return OK, result.render("All OSDs are up! " + summary)
+
+# HA states in which the resource manager gave up or is recovering the guest
+HA_FAILED = ["error", "fence", "recovery"]
+
+def getGuestProblems(status, hastate, lock, mem, disk, warning, critical):
+    # [(state, text)] of one guest
+    problems = []
+    if status == "unknown":
+        problems.append((WARNING, "status unknown (node offline?)"))
+    elif status not in ("running", "stopped"):
+        problems.append((WARNING, "status " + status))
+    if lock and lock != "backup":
+        problems.append((WARNING, "locked (" + lock + ")"))
+    if hastate in HA_FAILED:
+        problems.append((CRITICAL, "HA state " + hastate))
+    elif hastate == "started" and status == "stopped":
+        problems.append((CRITICAL, "HA state started, but stopped"))
+    elif hastate in ("stopped", "disabled") and status == "running":
+        problems.append((WARNING, "HA state " + hastate + ", but running"))
+    for label, percent in (("memory", mem), ("disk", disk)):
+        if percent is None:
+            continue
+        if percent >= critical:
+            problems.append((CRITICAL, label + " " + str(round(percent, 1)) + "%"))
+        elif percent >= warning:
+            problems.append((WARNING, label + " " + str(round(percent, 1)) + "%"))
+    return problems
+
+def checkGuestHealth(args):
+    import heapq
+
+    if args.warning == None or args.critical == None:
+        return UNKNOWN, "Commandline incomplete!"
+
+    # all QEMU VMs and LXC containers of the cluster in one call, one pass into columns
+    names, types, nodes, status, hastate, locks, vmids = [], [], [], [], [], [], []
+    cores, cpu, mem, memUsed, memTotal, disk = [], [], [], [], [], []
+    templates = 0
+    for entry in getValueFromProxmox("/cluster/resources", "--type vm"):
+        if entry.get("template") == 1:
+            templates += 1
+            continue
+        vmids.append(entry["vmid"])
+        names.append(entry.get("name", "n/a") + " (" + str(entry["vmid"]) + ", " + entry.get("node", "n/a") + ")")
+        types.append(entry.get("type", "qemu"))
+        nodes.append(entry.get("node", "n/a"))
+        status.append(entry.get("status", "unknown"))
+        hastate.append(entry.get("hastate", ""))
+        locks.append(entry.get("lock", ""))
+        # cpu is the used share of the guest's own vCPUs
+        cores.append(entry.get("maxcpu", 0))
+        cpu.append(entry.get("cpu", 0) * 100)
+        memUsed.append(entry.get("mem", 0))
+        memTotal.append(entry.get("maxmem", 0))
+        mem.append(entry["mem"] / entry["maxmem"] * 100 if entry.get("maxmem") and entry.get("mem") is not None else None)
+        # QEMU reports 0 unless the storage knows the usage, only LXC is reliable
+        disk.append(entry["disk"] / entry["maxdisk"] * 100 if entry.get("maxdisk") and entry.get("disk") else None)
+    if not names:
+        return OK, "No guests found!"
+
+    result = getOutput(args)
+    problems = []
+    for index in range(len(names)):
+        guestProblems = getGuestProblems(status[index], hastate[index], locks[index], mem[index], disk[index], int(args.warning), int(args.critical))
+        if guestProblems:
+            state = max([problem[0] for problem in guestProblems], key=SEVERITY.index)
+            problems.append((SEVERITY.index(state), state, names[index] + " " + types[index] + " " + status[index] + " - " + ", ".join(problem[1] for problem in guestProblems)))
+    # worst guests first, then in the order of the cluster
+    problems.sort(key=lambda problem: -problem[0])
+    for severity, state, line in problems:
+        result.add(state, line)
+
+    # top consumers of the running guests, bounded by --top
+    running = [index for index in range(len(names)) if status[index] == "running"]
+    for title, column, text in (
+        ("CPU", cpu, lambda index: str(round(cpu[index], 1)) + "% of " + str(cores[index]) + " vCPU(s)"),
+        ("memory", mem, lambda index: str(round(mem[index], 1)) + "% (" + str(round(memUsed[index] / 1024 / 1024 / 1024, 1)) + " GB / " + str(round(memTotal[index] / 1024 / 1024 / 1024, 1)) + " GB)"),
+        ("disk", disk, lambda index: str(round(disk[index], 1)) + "%"),
+    ):
+        top = heapq.nlargest(args.top, [index for index in running if column[index] is not None], key=lambda index: column[index])
+        if top:
+            result.addFooter(("\n" if result.footer else "") + "Top " + str(len(top)) + " " + title + ":")
+            for index in top:
+                result.addFooter(" - " + names[index] + ": " + text(index))
+
+    counts = {"running": 0, "stopped": 0}
+    for value in status:
+        counts[value] = counts.get(value, 0) + 1
+    other = len(names) - counts["running"] - counts["stopped"]
+    qemu = types.count("qemu")
+
+    result.addPerfdata("guests", len(names))
+    result.addPerfdata("running", counts["running"])
+    result.addPerfdata("stopped", counts["stopped"])
+    result.addPerfdata("other", other)
+    result.addPerfdata("qemu", qemu)
+    result.addPerfdata("lxc", len(names) - qemu)
+    result.addPerfdata("problems", len(problems))
+    result.addPerfdata("cpu_used", round(sum(cpu[index] * cores[index] for index in running) / 100, 2))
+    result.addPerfdata("mem_used", sum(memUsed[index] for index in running), "B", "", "", 0, sum(memTotal[index] for index in running))
+    for index in running:
+        label = str(vmids[index])
+        result.addPerfdata(label + "_cpu", round(cpu[index], 2), "%", "", "", 0, 100, group="guest_cpu")
+        if mem[index] is not None:
+            result.addPerfdata(label + "_mem", round(mem[index], 2), "%", args.warning, args.critical, 0, 100, group="guest_mem")
+        if disk[index] is not None:
+            result.addPerfdata(label + "_disk", round(disk[index], 2), "%", args.warning, args.critical, 0, 100, group="guest_disk")
+
+    summary = str(len(names)) + " guests (" + str(qemu) + " qemu, " + str(len(names) - qemu) + " lxc) on " + str(len(set(nodes))) + " nodes: " + str(counts["running"]) + " running, " + str(counts["stopped"]) + " stopped"
+    if other:
+        summary += ", " + str(other) + " other"
+    if templates:
+        summary += ", " + str(templates) + " template(s) skipped"
+    state = result.getState()
+    if state == CRITICAL:
+        return CRITICAL, result.render("Guests with critical problems! " + summary)
+    elif state == WARNING:
+        return WARNING, result.render("Guests with problems! " + summary)
+    return OK, result.render("All guests are healthy! " + summary)
+
+CHECKS = {
+    "host-version": checkHostVersion,
+    "cluster-status": checkClusterStatus,
+    "ceph-status": checkCephStatus,
+    "storage-status": checkStorageStatus,
+    "disk-status": checkDiskStatus,
+    "vms-status": checkVmsStatus,
+    "backup-status": checkBackupStatus,
+    "osd-status": checkOsdStatus,
+    "guest-health": checkGuestHealth,
+}
+
+def getClusterRole(args):
+    # {"elected", "local", "nodes"} with --cluster-mode elected, the elected
+    # node is the online node with the lowest node ID in /cluster/status
+    if args.clustermode != "elected" or not any(category in CLUSTER_CATEGORIES for category in args.info):
+        return None
+    try:
+        status = getValueFromProxmox("/cluster/status")
+    except Exception:
+        # without the cluster status every node collects for itself, better twice than never
+        return None
+    nodes = [entry for entry in status if entry.get("type") == "node"]
+    online = [entry for entry in nodes if entry.get("online") == 1]
+    local = [entry["name"] for entry in nodes if entry.get("local") == 1]
+    if not online:
+        return None
+    return {
+        "elected": min(online, key=lambda entry: int(entry.get("nodeid", 0)))["name"],
+        "local": local[0] if local else os.uname().nodename,
+        "nodes": [entry["name"] for entry in nodes],
+    }
+
+def isDelegated(category, role):
+    return role is not None and category in CLUSTER_CATEGORIES and role["elected"] != role["local"]
+
+def runCheck(category, args, role=None):
+    from ncm_plugin import passive
+    from ncm_plugin import timing
+
+    if isDelegated(category, role):
+        if not passive.enabled(args):
+            # only batch runs with passive results publish for the other nodes
+            return UNKNOWN, "Delegated to " + role["elected"] + ", but no result arrives here: --cluster-mode elected needs batch runs with --passive-file, --passive-spool or --icinga-api on every node"
+        return OK, "Delegated to " + role["elected"] + " (lowest online node ID of the cluster)"
+    try:
+        with timing.phase("check " + category):
+            return CHECKS[category](args)
+    except Exception as e:
+        # a failing category must not take down the other results of a batch run
+        return UNKNOWN, "Unable to evaluate " + category + ": " + type(e).__name__ + ": " + str(e)
+
+def runBatch(args):
+    from ncm_plugin import passive
+
+    thresholds = {}
+    for category, warning, critical in args.thresholds:
+        thresholds[category] = (warning, critical)
+
+    role = getClusterRole(args)
+    results = []
+    for category in args.info:
+        checkArgs = argparse.Namespace(**vars(args))
+        if category in thresholds:
+            checkArgs.warning, checkArgs.critical = thresholds[category]
+        state, message = runCheck(category, checkArgs, role)
+        results.append({
+            "host": args.host,
+            "service": args.serviceformat.replace("{info}", category),
+            "category": category,
+            "state": state,
+            "output": message,
+            "time": time.time(),
+            "delegated": isDelegated(category, role),
+        })
+
+    # the elected node publishes its cluster-wide results for the other nodes as well
+    published = []
+    if role is not None and role["elected"] == role["local"]:
+        for node in role["nodes"]:
+            if node == role["local"]:
+                continue
+            for result in results:
+                if result["category"] in CLUSTER_CATEGORIES:
+                    published.append(dict(result, host=args.clusterhostformat.replace("{node}", node)))
+
+    try:
+        # delegated results would overwrite what the elected node published for this node
+        passive.submit(args, [result for result in results if not result["delegated"]] + published)
+    except Exception as e:
+        output.exitUnknown("Unable to submit passive check results: " + type(e).__name__ + ": " + str(e))
+
+    worst = OK
+    summary = ""
+    for result in results:
+        if SEVERITY.index(result["state"]) > SEVERITY.index(worst):
+            worst = result["state"]
+        summary += "[" + STATES[result["state"]] + "] " + result["service"] + ": " + result["output"].split("\n", 1)[0].split("|", 1)[0].strip() + "\n"
+    if published and passive.enabled(args):
+        summary += "\n" + str(len(published)) + " result(s) published for " + str(len(role["nodes"]) - 1) + " other node(s)\n"
+    output.exitWith(worst, str(len(results)) + " categories evaluated. \n\n" + summary)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-i', '--info', help='Info category to choose, "all" or a comma separated list for a batch run', required = True, type=parseInfo, metavar="{all," + ",".join(CATEGORIES) + "}", dest='info')
+    parser.add_argument('-w', '--warning', help='Warning in percent', dest='warning')
+    parser.add_argument('-c', '--critical', help='Critical in percent', dest='critical')
+    parser.add_argument('--forecast-warning', help='storage-status/osd-status: warning if the local usage history predicts full in less than this many days', dest='forecastwarning', type=float)
+    parser.add_argument('--forecast-critical', help='storage-status/osd-status: critical if the local usage history predicts full in less than this many days', dest='forecastcritical', type=float)
+    parser.add_argument('--forecast', help='storage-status/osd-status: show the days until full of the local usage history without forecast thresholds', dest='forecast', action='store_true')
+    parser.add_argument('--forecast-method', help='Regression of the usage history (default: robust)', dest='forecastmethod', choices=["robust", "linear"], default="robust")
+    parser.add_argument('--max-lines', help='Show only the worst n lines of the long output, 0 = all (default: 0)', dest='maxlines', type=int, default=0)
+    parser.add_argument('--max-perfdata', help='Aggregate per-object perfdata (min/max/avg/count) above n values, 0 = never (default: 0)', dest='maxperfdata', type=int, default=0)
+    parser.add_argument('--top', help='guest-health: number of guests in the top CPU, memory and disk lists (default: 5)', dest='top', type=int, default=5)
+    parser.add_argument('--workers', help='Number of parallel pvesh calls, e.g. for the snapshots of vms-status (default: 8)', dest='workers', type=int, default=8)
+    parser.add_argument('--timeout', help='Seconds after which a hung pvesh/ceph call is killed (default: 50)', dest='timeout', type=float)
+    parser.add_argument('--backend', help='Data source: pveproxy API with token, pvesh or auto (API if configured, pvesh as fallback)', dest='backend', choices=["auto", "api", "pvesh"], default="auto")
+    parser.add_argument('--api-config', help='Config file of the API backend', dest='apiconfig', default=API_CONFIG)
+    parser.add_argument('--ceph-backend', help='Source of ceph-status/osd-status: python3-rados, ceph CLI/pvesh or auto (rados if a keyring for --ceph-user is readable)', dest='cephbackend', choices=["auto", "rados", "cli"], default="auto")
+    parser.add_argument('--ceph-conf', help='Ceph config of the rados backend (default: /etc/ceph/ceph.conf)', dest='cephconf')
+    parser.add_argument('--ceph-user', help='Ceph client of the rados backend, the keyring is /etc/ceph/ceph.client.<user>.keyring (default: ncm)', dest='cephuser')
+    parser.add_argument('--pmxcfs', help='Read cluster-status and the snapshots of vms-status from the files in /etc/pve: on, off or auto (if /etc/pve/.members is readable)', dest='pmxcfs', choices=["auto", "on", "off"], default="auto")
+    parser.add_argument('--pmxcfs-dir', help='Directory of the pmxcfs files (default: /etc/pve)', dest='pmxcfsdir')
+    parser.add_argument('--no-cache', help='Always query pvesh, bypass the shared response cache', dest='nocache', action='store_true')
+    parser.add_argument('--cache-dir', help='Directory of the shared response cache', dest='cachedir', default=CACHE_DIR)
+    parser.add_argument('--cache-ttl', help='Cache TTL for an API path as PATH=SECONDS (fnmatch pattern, 0 disables caching, can be repeated)', dest='cachettl', action='append', type=parseCacheTTL, default=[])
+    parser.add_argument('--threshold', help='Batch run: thresholds for one category as CATEGORY=WARNING,CRITICAL (can be repeated)', dest='thresholds', action='append', type=parseThreshold, default=[])
+    parser.add_argument('--host', help='Batch run: host name of the passive check results', dest='host', default=os.uname().nodename)
+    parser.add_argument('--service-format', help='Batch run: service name of the passive check results, {info} is replaced by the category', dest='serviceformat', default="proxmox-{info}")
+    parser.add_argument('--cluster-mode', help='all = every node collects every category, elected = only the online node with the lowest node ID collects ' + ", ".join(CLUSTER_CATEGORIES) + ', the others report "delegated" (default: all)', dest='clustermode', choices=["all", "elected"], default="all")
+    parser.add_argument('--cluster-host-format', help='Batch run with --cluster-mode elected: host name of the results published for the other nodes, {node} is replaced by the node name (default: {node})', dest='clusterhostformat', default="{node}")
+    from ncm_plugin import passive
+
+    passive.addArguments(parser)
+    args = parser.parse_args()
+
+    cache["enabled"] = not args.nocache
+    cache["dir"] = args.cachedir
+    cache["ttl"] = args.cachettl + list(CACHE_TTL)
+    api["backend"] = args.backend
+    api["config"] = args.apiconfig
+    api["workers"] = args.workers
+    cephBackend["backend"] = args.cephbackend
+    cephBackend["conf"] = args.cephconf
+    cephBackend["user"] = args.cephuser
+    pmxcfsBackend["backend"] = args.pmxcfs
+    pmxcfsBackend["dir"] = args.pmxcfsdir
+    commands["timeout"] = args.timeout
+    # not needed for --help, the timing report counts from here
+    from ncm_plugin import timing
+    timing.install()
+
+    if len(args.info) == 1 and not passive.enabled(args):
+        role = getClusterRole(args)
+        if isDelegated(args.info[0], role):
+            output.exitWith(*runCheck(args.info[0], args, role))
+        try:
+            with timing.phase("check " + args.info[0]):
+                state, message = CHECKS[args.info[0]](args)
+        except Exception as e:
+            from ncm_plugin import process
+
+            if isinstance(e, process.CommandError):
+                output.exitUnknown(str(e))
+            # e.g. the API refused the login with --backend api
+            output.exitUnknown("Unable to evaluate " + args.info[0] + ": " + type(e).__name__ + ": " + str(e))
+        output.exitWith(state, message)
+
+    runBatch(args)
 
 
 if __name__=="__main__":
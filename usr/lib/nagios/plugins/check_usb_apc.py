@@ -10,68 +10,182 @@
 ###################################################
 
 import argparse
-import os
-import subprocess
+
+from ncm_plugin import apcupsd
+from ncm_plugin import collector
+from ncm_plugin import output
+from ncm_plugin import parallel
+from ncm_plugin import process
+from ncm_plugin import ranges
+from ncm_plugin import replay
+from ncm_plugin import timing
 
 def __execute(command):
-    res = subprocess.Popen(command, stdout=subprocess.PIPE)
-    res.wait()
-    return { "return_code": res.returncode, "output": res.stdout.read().decode("utf-8") }
+    result = replay.call(command, lambda: __run(command))
+    return { "return_code": result["returncode"], "output": result["stdout"] }
+
+def __run(command):
+    # ask the resident collector first, run the command ourselves if it is not running
+    result = collector.execute(command)
+    if result is not None:
+        return result
+    return process.run(command)
+
+APCACCESS = "/usr/sbin/apcaccess"
+
+FIELDS = ["VERSION", "MODEL", "STATUS", "LINEV", "LOADPCT", "BCHARGE", "TIMELEFT", "BATTDATE"]
+
+def parseInfo(value):
+    fields = [field.strip().upper() for field in value.split(",") if field.strip()]
+    for field in fields:
+        if field not in FIELDS:
+            raise argparse.ArgumentTypeError("invalid choice: '" + field + "' (choose from " + ", ".join(FIELDS) + ")")
+    return fields
+
+def isNumber(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+def getRanges(warning, critical, reverse):
+    # plain numbers are upper limits, reversed lower limits ("20" -> "20:")
+    if reverse and isNumber(warning) and isNumber(critical):
+        return str(warning) + ":", str(critical) + ":"
+    return str(warning), str(critical)
+
+def parseThreshold(value):
+    # FIELD=WARNING,CRITICAL as numbers or Nagios ranges, numbers with
+    # warning above critical mean lower values are worse
+    try:
+        field, limits = value.split("=", 1)
+        warning, critical = limits.split(",", 1)
+        ranges.parseRange(warning)
+        ranges.parseRange(critical)
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected FIELD=WARNING,CRITICAL, got '" + value + "'")
+    if field.upper() not in FIELDS:
+        raise argparse.ArgumentTypeError("unknown field '" + field + "'")
+    reverse = isNumber(warning) and isNumber(critical) and float(warning) > float(critical)
+    return (field.upper(),) + getRanges(warning, critical, reverse)
+
+def parseRangeArgument(value):
+    try:
+        ranges.parseRange(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid range '" + value + "'")
+    return value
+
+def getStatusFromApcaccess(fields, apcaccess=APCACCESS):
+    # one apcaccess call per field, only for the local apcupsd
+    status = {}
+    for field in fields:
+        result = __execute([apcaccess, "-p", field])
+        if result["return_code"] != 0:
+            raise RuntimeError("apcaccess -p " + field + " failed")
+        status[field] = result["output"].strip()
+    return status
 
-def __exit_ok(message):
-    print("OK - " + message)
-    exit(0)
+def getStatus(host, args):
+    name, port = apcupsd.parseHost(host)
+    if args.backend != "apcaccess":
+        try:
+            return replay.call(["apcupsd", name, str(port)], lambda: apcupsd.getCachedStatus(name, port, args.timeout, args.cachettl, args.cachedir))
+        except Exception:
+            # apcaccess talks to the same NIS port, it only helps with a local apcupsd
+            if args.backend == "nis" or name not in ("127.0.0.1", "localhost", "::1") or port != apcupsd.PORT:
+                raise
+    return getStatusFromApcaccess(args.info, args.apcaccess)
 
-def __exit_warning(message):
-    print("WARNING - " + message)
-    exit(1)
+def getStatuses(args):
+    # {host: status record or exception}, all hosts polled concurrently
+    def poll(host):
+        try:
+            return getStatus(host, args)
+        except Exception as e:
+            return e
 
-def __exit_critical(message):
-    print("CRITICAL - " + message)
-    exit(2)
+    return dict(zip(args.hosts, parallel.mapConcurrently(poll, args.hosts, args.workers)))
 
-def __exit_unknown(message):
-    print("UNKNOWN - " + message)
-    exit(3)
+def checkSingle(args, status):
+    # one field of one UPS, output as with apcaccess -p
+    value = status[args.info[0]].split(" ")[0]
+    message = "Value = " + status[args.info[0]]
+    if args.prefdata:
+        message += " | " + args.info[0].lower() + "=" + str(value)
+
+    if args.warning and args.critical:
+        if args.prefdata:
+            message += ";" + str(args.warning) + ";" + str(args.critical)
+        warning, critical = getRanges(args.warning, args.critical, args.reverse)
+        output.exitWith(ranges.getState(float(value), warning, critical), message)
+    output.exitOk(message)
+
+def checkMultiple(args, statuses):
+    thresholds = dict((field, (warning, critical)) for field, warning, critical in args.thresholds)
+    if args.warning and args.critical:
+        for field in args.info:
+            thresholds.setdefault(field, getRanges(args.warning, args.critical, args.reverse))
+
+    result = output.Output()
+    for host in args.hosts:
+        status = statuses[host]
+        prefix = host + " " if len(args.hosts) > 1 else ""
+        if isinstance(status, Exception):
+            result.add(output.UNKNOWN, host + " not reachable: " + type(status).__name__ + ": " + str(status))
+            continue
+        for field in args.info:
+            if field not in status:
+                result.add(output.UNKNOWN, prefix + field + " not reported")
+                continue
+            line = prefix + field + " = " + status[field]
+            if field not in thresholds:
+                result.add(output.OK, line)
+                continue
+            warning, critical = thresholds[field]
+            try:
+                value = float(status[field].split(" ")[0])
+            except ValueError:
+                result.add(output.UNKNOWN, line + " (not a number)")
+                continue
+            result.add(ranges.getState(value, warning, critical), line)
+            if args.prefdata:
+                result.addPerfdata((prefix.strip() + "_" if prefix else "") + field.lower(), value, "", warning, critical)
+
+    summary = str(len(args.hosts)) + " UPS, " + str(len(args.info)) + " field(s): " + result.getCounts(result.lines)
+    output.exitWith(result.getState(), result.render(summary))
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument('-i', '--info', help='Info category to choose', required = True, choices=["VERSION", "MODEL", "STATUS", "LINEV", "LOADPCT", "BCHARGE", "TIMELEFT", "BATTDATE"], dest='info')
-    parser.add_argument('-w', '--warning', help='Warning value', dest='warning', type=int)
-    parser.add_argument('-c', '--critical', help='Critical value', dest='critical', type=int)
+    parser.add_argument('-i', '--info', help='Info category to choose, several as comma separated list (' + ",".join(FIELDS) + ')', required = True, type=parseInfo, dest='info')
+    parser.add_argument('-w', '--warning', help='Warning value or Nagios range', dest='warning', type=parseRangeArgument)
+    parser.add_argument('-c', '--critical', help='Critical value or Nagios range', dest='critical', type=parseRangeArgument)
     parser.add_argument('-r', '--reverse', help='Reverse the result', dest='reverse', action='store_true')
     parser.add_argument('-p', '--prefdata', help='Store prefdata', dest='prefdata', action='store_true')
+    parser.add_argument('-H', '--host', help='apcupsd to ask as HOST[:PORT] (can be repeated, default: 127.0.0.1:3551)', dest='hosts', action='append', default=[])
+    parser.add_argument('--threshold', help='Thresholds for one field as FIELD=WARNING,CRITICAL (numbers or Nagios ranges), warning above critical means lower is worse (can be repeated)', dest='thresholds', action='append', type=parseThreshold, default=[])
+    parser.add_argument('--backend', help='nis (network information server), apcaccess or auto = nis with apcaccess as fallback (default: auto)', dest='backend', choices=['auto', 'nis', 'apcaccess'], default='auto')
+    parser.add_argument('--apcaccess', help='apcaccess binary of the apcaccess backend (default: ' + APCACCESS + ')', dest='apcaccess', default=APCACCESS)
+    parser.add_argument('--timeout', help='NIS and apcaccess timeout in seconds (default: 10)', dest='timeout', type=float, default=apcupsd.TIMEOUT)
+    parser.add_argument('--workers', help='UPS polled in parallel (default: 8)', dest='workers', type=int, default=8)
+    parser.add_argument('--cache-ttl', help='Seconds a status record is shared with other checks of the same UPS, 0 disables (default: 10)', dest='cachettl', type=int, default=apcupsd.CACHE_TTL)
+    parser.add_argument('--cache-dir', help='Directory of the status record cache', dest='cachedir', default=apcupsd.CACHE_DIR)
     args = parser.parse_args()
+    if not args.hosts:
+        args.hosts = ["127.0.0.1"]
+    process.setDefaults(timeout=args.timeout)
+    timing.install()
 
-    result = __execute(["/usr/sbin/apcaccess", "-p", args.info])
-
-    if result["return_code"] == 0:
-        value = result["output"].split(" ")[0]
-        message = "Value = " + result["output"].replace("\n", "")
-        if args.prefdata:
-            message += " | " + args.info.lower() + "=" + str(value)
-
-        if args.warning and args.critical:
-            if args.prefdata:
-                message += ";" + str(args.warning) + ";" + str(args.critical)
-            if args.reverse:
-                if float(value) < args.warning:
-                    if float(value) < args.critical:
-                        __exit_critical(message)
-                    else:
-                        __exit_warning(message)
-                __exit_ok(message)
-            else:
-                if float(value) > args.warning:
-                    if float(value) > args.critical:
-                        __exit_critical(message)
-                    else:
-                        __exit_warning(message)
-                __exit_ok(message)
-        else:
-            __exit_ok(message)
-    __exit_unknown("Could not get value. Please check if apcaccess is installed and configured!")
+    with timing.phase("poll"):
+        statuses = getStatuses(args)
+    if len(args.hosts) == 1 and len(args.info) == 1 and not args.thresholds:
+        status = statuses[args.hosts[0]]
+        if isinstance(status, Exception) or args.info[0] not in status:
+            output.exitUnknown("Could not get value. Please check if apcupsd is running and its network information server is reachable!")
+        checkSingle(args, status)
+    checkMultiple(args, statuses)
 
 
 if __name__=="__main__":
-    main()
\ No newline at end of file
+    main()
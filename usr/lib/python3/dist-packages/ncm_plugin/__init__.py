@@ -0,0 +1,10 @@
+###################################################
+#
+# Name: ncm_plugin
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Shared code of the NCM monitoring plugins in
+# /usr/lib/nagios/plugins.
+#
+###################################################
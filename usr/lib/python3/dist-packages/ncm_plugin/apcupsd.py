@@ -0,0 +1,107 @@
+###################################################
+#
+# Name: ncm_plugin/apcupsd.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Client for the network information server of apcupsd (NIS, TCP 3551),
+# the protocol apcaccess speaks: every message is a 2 byte big-endian
+# length plus text, the answer to "status" is one message per
+# "KEY : VALUE" line and ends with an empty message. The whole status
+# record is fetched at once and kept a few seconds, so the checks of all
+# fields of one UPS share a single query.
+#
+###################################################
+
+import json
+import os
+import socket
+import struct
+import time
+
+PORT = 3551
+TIMEOUT = 10
+CACHE_DIR = "/var/cache/ni-ncm-agent/apcupsd"
+CACHE_TTL = 10
+
+def parseHost(value):
+    # "host", "host:port" or "[v6]:port"
+    if value.startswith("["):
+        host, sep, port = value[1:].partition("]")
+        return host, int(port.lstrip(":") or PORT)
+    if value.count(":") == 1:
+        host, port = value.split(":")
+        return host, int(port)
+    return value, PORT
+
+def receive(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("apcupsd closed the connection")
+        data += chunk
+    return data
+
+def query(host="127.0.0.1", port=PORT, timeout=TIMEOUT, command="status"):
+    # lines of the answer to one NIS command
+    with socket.create_connection((host, port), timeout) as sock:
+        sock.sendall(struct.pack(">H", len(command)) + command.encode("ascii"))
+        lines = []
+        while True:
+            length = struct.unpack(">H", receive(sock, 2))[0]
+            if length == 0:
+                return lines
+            lines.append(receive(sock, length).decode("utf-8", "replace").rstrip("\n"))
+
+def parseStatus(lines):
+    # {"STATUS": "ONLINE", "LINEV": "231.0 Volts", ...}
+    status = {}
+    for line in lines:
+        key, sep, value = line.partition(":")
+        if sep:
+            status[key.strip()] = value.strip()
+    return status
+
+def getStatus(host="127.0.0.1", port=PORT, timeout=TIMEOUT):
+    status = parseStatus(query(host, port, timeout))
+    if not status:
+        raise ValueError("Empty status record from apcupsd on " + host + ":" + str(port))
+    return status
+
+def getCacheFile(host, port, directory=CACHE_DIR):
+    return os.path.join(directory, host.replace("/", "_") + "_" + str(port) + ".json")
+
+def getCachedStatus(host="127.0.0.1", port=PORT, timeout=TIMEOUT, ttl=CACHE_TTL, directory=CACHE_DIR):
+    # the status record of the last ttl seconds, a broken cache only costs a query
+    import fcntl
+    import tempfile
+
+    if ttl <= 0 or not directory:
+        return getStatus(host, port, timeout)
+    filename = getCacheFile(host, port, directory)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        lock = open(filename[:-5] + ".lock", "a")
+    except OSError:
+        return getStatus(host, port, timeout)
+
+    with lock:
+        # checks of the same UPS started together wait for the first query
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(filename, "r") as f:
+                entry = json.load(f)
+            if 0 <= time.time() - entry["time"] <= ttl:
+                return entry["status"]
+        except (OSError, ValueError, KeyError):
+            pass
+        status = getStatus(host, port, timeout)
+        try:
+            fd, tmpfile = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+            with os.fdopen(fd, "w") as f:
+                json.dump({"time": time.time(), "status": status}, f)
+            os.replace(tmpfile, filename)
+        except OSError:
+            pass
+        return status
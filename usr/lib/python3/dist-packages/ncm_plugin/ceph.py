@@ -0,0 +1,66 @@
+###################################################
+#
+# Name: ncm_plugin/ceph.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Mon commands through the python3-rados bindings, one connection per run
+# instead of one "ceph" client (and monitor authentication) per command.
+# NCM_RADOS_MODULE names a replacement for the rados module (tools/fake_rados.py).
+#
+###################################################
+
+import json
+import os
+
+CEPH_CONF = "/etc/ceph/ceph.conf"
+CEPH_USER = "ncm"
+TIMEOUT = 10
+
+connection = {"cluster": None}
+
+def getModule():
+    import importlib
+
+    return importlib.import_module(os.environ.get("NCM_RADOS_MODULE", "rados"))
+
+def getKeyring(user, conffile=CEPH_CONF):
+    # next to ceph.conf, /etc/ceph/ceph.client.<user>.keyring by default
+    return os.path.join(os.path.dirname(conffile), "ceph.client." + user + ".keyring")
+
+def available(conffile=CEPH_CONF, user=CEPH_USER):
+    # rados bindings installed and a keyring the plugin user can read
+    if not os.access(conffile, os.R_OK) or not os.access(getKeyring(user, conffile), os.R_OK):
+        return False
+    try:
+        getModule()
+    except ImportError:
+        return False
+    return True
+
+def connect(conffile=CEPH_CONF, user=CEPH_USER):
+    if connection["cluster"] is None:
+        import atexit
+
+        rados = getModule()
+        cluster = rados.Rados(conffile=conffile, name="client." + user, conf={"keyring": getKeyring(user, conffile)})
+        cluster.connect(timeout=TIMEOUT)
+        connection["cluster"] = cluster
+        atexit.register(shutdown)
+    return connection["cluster"]
+
+def shutdown():
+    if connection["cluster"] is not None:
+        connection["cluster"].shutdown()
+        connection["cluster"] = None
+
+def monCommand(command, conffile=CEPH_CONF, user=CEPH_USER):
+    # command like {"prefix": "osd df", "output_method": "tree"}, returns the parsed JSON
+    cluster = connect(conffile, user)
+    ret, outbuf, outs = cluster.mon_command(json.dumps(dict(command, format="json")), b"", timeout=TIMEOUT)
+    if ret != 0:
+        raise OSError(-ret, "ceph " + command["prefix"] + " failed: " + outs)
+    try:
+        return json.loads(outbuf.decode("utf-8"))
+    except ValueError:
+        raise ValueError("ceph " + command["prefix"] + " returned invalid JSON: " + outbuf[:80].decode("utf-8", "replace"))
@@ -0,0 +1,95 @@
+###################################################
+#
+# Name: ncm_plugin/collector.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Client and protocol of the ni-ncm-collector daemon. The plugins ask the
+# daemon for the output of their data commands. If the daemon is not running
+# or its result is older than MAX_AGE, every function returns None and the
+# plugin runs the command itself.
+#
+###################################################
+
+import json
+import os
+
+SOCKET = "/run/ni-ncm-agent/collector.sock"
+TIMEOUT = 5
+# oldest result a plugin accepts from the daemon, in seconds
+MAX_AGE = 120
+
+# Read-only commands the daemon is allowed to run for its clients
+# (argv prefix, allowed values of the next argument or None for any).
+ALLOWED_COMMANDS = [
+    (["sudo", "pvesh", "get"], None),
+    (["sudo", "ceph"], [["osd", "df", "tree"], ["status"], ["osd", "tree"], ["osd", "dump"]]),
+    (["sudo", "/usr/sbin/proxmox-backup-manager"], None),
+    (["sudo", "proxmox-backup-debug", "api", "get"], None),
+    (["/usr/sbin/apcaccess"], None),
+]
+
+# proxmox-backup-manager subcommands are only allowed with these methods
+PBS_MANAGER_METHODS = ["list", "versions"]
+
+SOURCES = ["docker-containers"]
+
+def getSocket():
+    return os.environ.get("NCM_COLLECTOR_SOCKET", SOCKET)
+
+def isAllowed(command):
+    for prefix, subcommands in ALLOWED_COMMANDS:
+        if command[:len(prefix)] != prefix:
+            continue
+        rest = command[len(prefix):]
+        if prefix[-1] == "/usr/sbin/proxmox-backup-manager":
+            return len(rest) >= 1 and (rest[0] in PBS_MANAGER_METHODS or len(rest) >= 2 and rest[1] in PBS_MANAGER_METHODS)
+        if subcommands is None:
+            return True
+        for subcommand in subcommands:
+            if rest[:len(subcommand)] == subcommand:
+                return True
+    return False
+
+def query(request):
+    path = getSocket()
+    if not path or not os.path.exists(path):
+        return None
+
+    import socket
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(TIMEOUT)
+            client.connect(path)
+            client.sendall(json.dumps(request).encode("utf-8") + b"\n")
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = client.recv(65536)
+                if not chunk:
+                    break
+                data += chunk
+        response = json.loads(data.decode("utf-8"))
+    except (OSError, ValueError):
+        return None
+    if response.get("status") != "ok":
+        return None
+    import time
+
+    # a stalled daemon must not keep old data alive
+    if not 0 <= time.time() - response.get("time", 0) <= MAX_AGE:
+        return None
+    return response
+
+def execute(command):
+    # returns {"returncode": ..., "stdout": ...} or None if the daemon can not answer
+    if not isAllowed(command):
+        return None
+    return query({"command": command})
+
+def getSource(name, names=None):
+    # names: objects the source has to look at in detail, e.g. the containers of check_docker.py --name
+    response = query({"source": name, "names": names or []})
+    if response is None:
+        return None
+    return response["data"]
@@ -0,0 +1,46 @@
+###################################################
+#
+# Name: ncm_plugin/containers.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Container list for check_docker.py and the collector daemon. Uses one
+# /containers/json request with a fixed API version (no /version
+# negotiation, no /images/{id}/json per container) and keeps only the
+# fields the check needs. Only the containers given by name are inspected
+# for their exact start time, the others carry their creation time from
+# the list.
+#
+###################################################
+
+# oldest API version every supported docker daemon still accepts
+API_VERSION = "1.24"
+
+def getCreated(container):
+    # creation time of the list entry in the format of StartedAt
+    import time
+
+    if not container.get("Created"):
+        return None
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(container["Created"])) + ".000000000Z"
+
+def listContainers(names=None, stopped=False):
+    # names: containers whose exact start time is needed (one inspect each), None = none
+    # stopped: also exited and created containers (all=1), not only running ones
+    import docker
+
+    client = docker.from_env(version=API_VERSION).api
+    containers = []
+    for container in client.containers(all=stopped):
+        name = container["Names"][0].lstrip("/") if container.get("Names") else container["Id"][:12]
+        record = {
+            "id": container["Id"],
+            "name": name,
+            "image": container["Image"],
+            "status": container["State"],
+            "started": getCreated(container),
+        }
+        if names and name in names:
+            record["started"] = client.inspect_container(container["Id"])["State"]["StartedAt"]
+        containers.append(record)
+    return containers
@@ -0,0 +1,157 @@
+###################################################
+#
+# Name: ncm_plugin/events.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Per-container state table built from the docker /events stream by
+# ni-ncm-docker-events and read by check_docker.py --events.
+#
+#   {"updated": ..., "since": ..., "seen": [...], "containers": {id: {
+#       "name", "image", "status", "started", "last_start", "last_die",
+#       "last_exit_code", "restarts": [timestamps], "restart_count",
+#       "oom_kills": [timestamps], "oom_count"}}}
+#
+# "since" is the timeNano of the last applied event, "seen" the events
+# applied at exactly that nanosecond. The daemon replays from "since"
+# inclusive after a reconnect, apply() skips what is already counted.
+#
+###################################################
+
+import json
+import os
+import time
+
+EVENTS_FILE = "/var/cache/ni-ncm-agent/docker-events.json"
+
+# restart/OOM timestamps older than this are dropped, at most MAX_HISTORY are kept
+HISTORY_RETENTION = 60 * 60 * 24
+MAX_HISTORY = 1000
+
+def createTable():
+    return {"updated": 0, "since": 0, "seen": [], "containers": {}}
+
+def load(filename=EVENTS_FILE):
+    try:
+        with open(filename, "r") as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        return None
+    table.setdefault("seen", [])
+    return table
+
+def save(table, filename=EVENTS_FILE):
+    import tempfile
+
+    table["updated"] = time.time()
+    directory = os.path.dirname(filename)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmpfile = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(table, f)
+        os.chmod(tmpfile, 0o644)
+        os.replace(tmpfile, filename)
+    except OSError:
+        os.unlink(tmpfile)
+        raise
+
+def getEntry(table, containerId, name="", image=""):
+    entry = table["containers"].get(containerId)
+    if entry is None:
+        entry = {
+            "name": name,
+            "image": image,
+            "status": "unknown",
+            "started": None,
+            "last_start": None,
+            "last_die": None,
+            "last_exit_code": None,
+            "restarts": [],
+            "restart_count": 0,
+            "oom_kills": [],
+            "oom_count": 0,
+        }
+        table["containers"][containerId] = entry
+    if name:
+        entry["name"] = name
+    if image:
+        entry["image"] = image
+    return entry
+
+def addHistory(history, timestamp):
+    history.append(timestamp)
+    expired = timestamp - HISTORY_RETENTION
+    while history and (history[0] < expired or len(history) > MAX_HISTORY):
+        history.pop(0)
+
+def seed(table, containers):
+    # all containers from ncm_plugin.containers.listContainers(stopped=True),
+    # restart and OOM history of known containers is kept, only removed
+    # containers are dropped
+    current = set(container["id"] for container in containers)
+    for containerId in [containerId for containerId in table["containers"] if containerId not in current]:
+        del table["containers"][containerId]
+    for container in containers:
+        entry = getEntry(table, container["id"], container["name"], container["image"])
+        entry["status"] = container["status"]
+        entry["started"] = container["started"]
+
+def getSince(table):
+    # "seconds.nanoseconds" for the since parameter of /events, None = no replay
+    if not table["since"]:
+        return None
+    return "%d.%09d" % divmod(table["since"], 1000000000)
+
+def apply(table, event):
+    # returns True if the event changed the table
+    if event.get("Type") != "container":
+        return False
+    action = event.get("Action", "").split(":", 1)[0]
+    actor = event.get("Actor", {})
+    attributes = actor.get("Attributes", {})
+    nano = event.get("timeNano") or event.get("time", 0) * 1000000000
+    key = str(actor.get("ID")) + ":" + event.get("Action", "")
+    if nano < table["since"] or nano == table["since"] and key in table["seen"]:
+        # replayed after a reconnect, already counted
+        return False
+    if nano > table["since"]:
+        table["since"] = nano
+        table["seen"] = []
+    table["seen"].append(key)
+    timestamp = nano / 1e9
+
+    if action == "destroy":
+        return table["containers"].pop(actor.get("ID"), None) is not None
+    if action not in ("create", "start", "die", "oom", "rename", "stop", "pause", "unpause"):
+        return False
+
+    entry = getEntry(table, actor.get("ID"), attributes.get("name", ""), attributes.get("image", ""))
+    if action == "create":
+        entry["status"] = "created"
+    elif action == "start":
+        # a start after a die of the same container is a restart (policy or docker restart)
+        if entry["last_die"] is not None:
+            entry["restart_count"] += 1
+            addHistory(entry["restarts"], timestamp)
+        entry["status"] = "running"
+        entry["last_start"] = timestamp
+        entry["started"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(timestamp)) + ".000000000Z"
+    elif action == "die":
+        entry["status"] = "exited"
+        entry["last_die"] = timestamp
+        if attributes.get("exitCode", "").lstrip("-").isdigit():
+            entry["last_exit_code"] = int(attributes["exitCode"])
+    elif action == "oom":
+        entry["oom_count"] += 1
+        addHistory(entry["oom_kills"], timestamp)
+    elif action == "pause":
+        entry["status"] = "paused"
+    elif action == "unpause":
+        entry["status"] = "running"
+    return True
+
+def countSince(history, window, now=None):
+    if now is None:
+        now = time.time()
+    return sum(1 for timestamp in history if now - timestamp <= window)
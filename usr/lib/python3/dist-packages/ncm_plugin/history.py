@@ -0,0 +1,207 @@
+###################################################
+#
+# Name: ncm_plugin/history.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Local history of used/total samples for capacity forecasts. Every metric
+# is one ring buffer file of fixed size, appended and read via mmap:
+#
+#   header: magic "NCMH", version, slots, count (number of appends)
+#   slot:   timestamp, used, total (3 doubles)
+#   fit:    count and method it was computed for, slope, intercept,
+#           start, total
+#
+# Slot count % slots is written next, so appending is O(1) and a metric
+# never takes more than HEADER.size + slots * SLOT.size + FIT.size bytes.
+# The regression only changes with a new sample (once per INTERVAL), every
+# other check reuses the fit stored behind the slots. Files with another
+# magic, version or size are treated as broken.
+#
+###################################################
+
+import math
+import os
+import re
+import struct
+import time
+
+HISTORY_DIR = "/var/lib/ni-ncm-agent/history"
+
+MAGIC = b"NCMH"
+VERSION = 2
+HEADER = struct.Struct("<4sIIQ12x")
+SLOT = struct.Struct("<ddd")
+FIT = struct.Struct("<QB7xdddd")
+
+# method numbers in the fit section, 0 = no fit stored
+METHODS = ["", "robust", "linear"]
+
+# 720 hourly samples = 30 days per metric (17 KB)
+SLOTS = 720
+INTERVAL = 3600
+
+# a forecast needs at least this many samples over this many seconds
+MIN_SAMPLES = 6
+MIN_SPAN = 6 * 3600
+
+# Theil-Sen takes the median of all pairwise slopes, more points are thinned out
+MAX_ROBUST_POINTS = 120
+
+def getDirectory():
+    # NCM_HISTORY_DIR overrides the directory, empty disables the history
+    return os.environ.get("NCM_HISTORY_DIR", HISTORY_DIR)
+
+def getFile(metric, directory=HISTORY_DIR):
+    return os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", metric) + ".ring")
+
+def openRing(filename, slots=SLOTS):
+    # returns (file, mmap), creates the ring buffer file if needed
+    import mmap
+
+    fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o644)
+    f = os.fdopen(fd, "r+b")
+    if os.fstat(fd).st_size == 0:
+        f.write(HEADER.pack(MAGIC, VERSION, slots, 0) + b"\0" * (slots * SLOT.size + FIT.size))
+        f.flush()
+    elif os.fstat(fd).st_size < HEADER.size:
+        f.close()
+        raise ValueError("Invalid history file " + filename)
+    buffer = mmap.mmap(f.fileno(), 0)
+    magic, version, fileSlots, count = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION or len(buffer) != HEADER.size + fileSlots * SLOT.size + FIT.size:
+        buffer.close()
+        f.close()
+        raise ValueError("Invalid history file " + filename)
+    return f, buffer
+
+def getLast(buffer):
+    magic, version, slots, count = HEADER.unpack_from(buffer, 0)
+    if count == 0:
+        return None
+    return SLOT.unpack_from(buffer, HEADER.size + ((count - 1) % slots) * SLOT.size)
+
+def append(buffer, timestamp, used, total):
+    magic, version, slots, count = HEADER.unpack_from(buffer, 0)
+    SLOT.pack_into(buffer, HEADER.size + (count % slots) * SLOT.size, timestamp, used, total)
+    HEADER.pack_into(buffer, 0, magic, version, slots, count + 1)
+
+def read(buffer):
+    # all samples, oldest first
+    magic, version, slots, count = HEADER.unpack_from(buffer, 0)
+    first = max(count - slots, 0)
+    return [SLOT.unpack_from(buffer, HEADER.size + (index % slots) * SLOT.size) for index in range(first, count)]
+
+def record(metric, used, total, now=None, directory=HISTORY_DIR, interval=INTERVAL, method=None):
+    # store a sample if the last one is older than interval; with a method
+    # returns the days until full, without nothing is read back
+    import fcntl
+
+    if now is None:
+        now = time.time()
+    os.makedirs(directory, exist_ok=True)
+    f, buffer = openRing(getFile(metric, directory))
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        last = getLast(buffer)
+        if last is None or now - last[0] >= interval or now < last[0]:
+            append(buffer, now, used, total)
+        if method is None:
+            return None
+        fit = getFit(buffer, method)
+        return None if fit is None else getDays(fit, now)
+    finally:
+        buffer.close()
+        f.close()
+
+def getFit(buffer, method):
+    # fit of the samples in the buffer, computed once per sample count and method
+    magic, version, slots, count = HEADER.unpack_from(buffer, 0)
+    offset = HEADER.size + slots * SLOT.size
+    cached = FIT.unpack_from(buffer, offset)
+    if cached[0] == count and cached[1] == METHODS.index(method):
+        return None if math.isnan(cached[2]) else cached[2:]
+    fit = fitSamples(read(buffer), method)
+    # NaN marks "too little data", that is not worth a new regression either
+    FIT.pack_into(buffer, offset, count, METHODS.index(method), *(fit or (math.nan,) * 4))
+    return fit
+
+def load(metric, directory=HISTORY_DIR):
+    filename = getFile(metric, directory)
+    if not os.path.exists(filename):
+        return []
+    f, buffer = openRing(filename)
+    try:
+        return read(buffer)
+    finally:
+        buffer.close()
+        f.close()
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+def fitLinear(points):
+    # least squares, returns (slope, intercept)
+    n = len(points)
+    meanX = sum(x for x, y in points) / n
+    meanY = sum(y for x, y in points) / n
+    variance = sum((x - meanX) ** 2 for x, y in points)
+    if variance == 0:
+        return 0.0, meanY
+    slope = sum((x - meanX) * (y - meanY) for x, y in points) / variance
+    return slope, meanY - slope * meanX
+
+def fitRobust(points):
+    # Theil-Sen, not thrown off by single outliers like a deleted backup
+    if len(points) > MAX_ROBUST_POINTS:
+        step = len(points) / MAX_ROBUST_POINTS
+        points = [points[int(i * step)] for i in range(MAX_ROBUST_POINTS)] + [points[-1]]
+    slopes = []
+    for i in range(len(points)):
+        for j in range(i + 1, len(points)):
+            if points[j][0] != points[i][0]:
+                slopes.append((points[j][1] - points[i][1]) / (points[j][0] - points[i][0]))
+    if not slopes:
+        return 0.0, median(y for x, y in points)
+    slope = median(slopes)
+    return slope, median(y - slope * x for x, y in points)
+
+def fitSamples(samples, method="robust"):
+    # (slope, intercept, start, total) of used over time, None if there is too little data
+    if len(samples) < MIN_SAMPLES or samples[-1][0] - samples[0][0] < MIN_SPAN:
+        return None
+    # relative to the first sample, the epoch seconds would cost precision
+    start = samples[0][0]
+    points = [(timestamp - start, used) for timestamp, used, total in samples]
+    slope, intercept = (fitRobust if method == "robust" else fitLinear)(points)
+    return slope, intercept, start, samples[-1][2]
+
+def getDays(fit, now):
+    # days until used reaches total, None without growth
+    slope, intercept, start, total = fit
+    if slope <= 0:
+        return None
+    used = slope * (now - start) + intercept
+    return max((total - used) / slope / 86400, 0.0)
+
+def forecast(samples, method="robust", now=None):
+    # days until used reaches total, None if there is too little data or no growth
+    if now is None:
+        now = time.time()
+    fit = fitSamples(samples, method)
+    return None if fit is None else getDays(fit, now)
+
+def daysUntilFull(metric, used, total, method="robust"):
+    # record the current sample and forecast from the history of the metric,
+    # method None only records, a broken or unwritable history must never break the check
+    directory = getDirectory()
+    if not directory:
+        return None
+    try:
+        return record(metric, used, total, directory=directory, method=method)
+    except (OSError, ValueError):
+        return None
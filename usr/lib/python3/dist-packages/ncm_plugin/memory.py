@@ -0,0 +1,86 @@
+###################################################
+#
+# Name: ncm_plugin/memory.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Memory figures of the local kernel for check_linux_memory: each of
+# /proc/meminfo, /proc/vmstat and /proc/pressure/memory is read once and
+# parsed into a flat dict. Counters like pswpin only mean something as a
+# rate, so the values of the previous run are kept in a small state file.
+#
+###################################################
+
+import json
+import os
+import time
+
+MEMINFO = "/proc/meminfo"
+VMSTAT = "/proc/vmstat"
+PRESSURE = "/proc/pressure/memory"
+STATE_FILE = "/var/cache/ni-ncm-agent/memory.json"
+
+def readKeyValues(filename):
+    # "MemTotal:  16314480 kB" and "pswpin 42" -> {"MemTotal": 16314480, "pswpin": 42}, meminfo in kB
+    values = {}
+    with open(filename, "r") as f:
+        content = f.read()
+    for line in content.splitlines():
+        fields = line.split()
+        if len(fields) >= 2:
+            try:
+                values[fields[0].rstrip(":")] = int(fields[1])
+            except ValueError:
+                pass
+    return values
+
+def readPressure(filename=PRESSURE):
+    # {"some_avg10": 0.0, ..., "full_total": 0}, None without PSI (kernel < 4.20 or psi=0)
+    try:
+        with open(filename, "r") as f:
+            content = f.read()
+    except OSError:
+        return None
+    values = {}
+    for line in content.splitlines():
+        fields = line.split()
+        for field in fields[1:]:
+            key, sep, value = field.partition("=")
+            if sep:
+                values[fields[0] + "_" + key] = int(value) if key == "total" else float(value)
+    return values
+
+def getRates(counters, filename=STATE_FILE, now=None):
+    # per second change of the counters since the last run, None on the
+    # first run, after a reboot (counter went down) or without state file
+    import tempfile
+
+    now = time.time() if now is None else now
+    if not filename:
+        return None
+    previous = None
+    try:
+        with open(filename, "r") as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        pass
+    try:
+        directory = os.path.dirname(filename) or "."
+        fd, tmpfile = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"time": now, "counters": counters}, f)
+        os.replace(tmpfile, filename)
+    except OSError:
+        pass
+
+    if not isinstance(previous, dict) or "time" not in previous or "counters" not in previous:
+        return None
+    seconds = now - previous["time"]
+    if seconds <= 0:
+        return None
+    rates = {}
+    for key, value in counters.items():
+        if key not in previous["counters"] or value < previous["counters"][key]:
+            return None
+        rates[key] = (value - previous["counters"][key]) / seconds
+    return rates
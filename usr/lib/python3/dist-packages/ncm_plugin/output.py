@@ -0,0 +1,139 @@
+###################################################
+#
+# Name: ncm_plugin/output.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Output builder of the plugins: long output lines and perfdata are
+# collected in lists and joined once. Optional limits keep the output of
+# big clusters small:
+#
+#   maxLines     only the worst n lines, then a count of the rest
+#   maxPerfdata  more per-object values (with group) than this are
+#                replaced by min/max/avg/count per group
+#
+# exitWith() and friends print "STATE - message" and end the plugin with
+# the state as exit code.
+#
+###################################################
+
+OK = 0
+WARNING = 1
+CRITICAL = 2
+UNKNOWN = 3
+
+STATES = ["OK", "WARNING", "CRITICAL", "UNKNOWN"]
+SEVERITY = [OK, UNKNOWN, WARNING, CRITICAL]
+
+def exitWith(state, message):
+    import sys
+
+    if state not in (OK, WARNING, CRITICAL):
+        state = UNKNOWN
+    print(STATES[state] + " - " + message)
+    sys.exit(state)
+
+def exitOk(message):
+    exitWith(OK, message)
+
+def exitWarning(message):
+    exitWith(WARNING, message)
+
+def exitCritical(message):
+    exitWith(CRITICAL, message)
+
+def exitUnknown(message):
+    exitWith(UNKNOWN, message)
+
+def formatLabel(label):
+    # labels with blanks, quotes or "=" have to be quoted
+    if any(char in label for char in " '="):
+        return "'" + label.replace("'", "''") + "'"
+    return label
+
+def formatNumber(value):
+    if value is None or value == "":
+        return ""
+    if isinstance(value, float):
+        return str(round(value, 3))
+    return str(value)
+
+def formatPerfdata(label, value, uom="", warning="", critical="", minimum="", maximum=""):
+    fields = [formatNumber(warning), formatNumber(critical), formatNumber(minimum), formatNumber(maximum)]
+    while fields and fields[-1] == "":
+        fields.pop()
+    return ";".join([formatLabel(label) + "=" + formatNumber(value) + uom] + fields)
+
+class Output:
+    def __init__(self, maxLines=0, maxPerfdata=0):
+        self.maxLines = maxLines
+        self.maxPerfdata = maxPerfdata
+        self.lines = []
+        self.footer = []
+        self.perfdata = []
+
+    def add(self, state, text):
+        self.lines.append((state, text))
+
+    def addFooter(self, text):
+        # plain text after the state lines, never cut by maxLines
+        self.footer.append(text)
+
+    def addPerfdata(self, label, value, uom="", warning="", critical="", minimum="", maximum="", group=None):
+        # group marks one value of many objects (e.g. group "osd_fill" for every OSD)
+        self.perfdata.append((label, value, uom, warning, critical, minimum, maximum, group))
+
+    def getState(self, default=OK):
+        states = [state for state, text in self.lines]
+        if not states:
+            return default
+        return max(states, key=SEVERITY.index)
+
+    def getCounts(self, lines):
+        counts = {}
+        for state, text in lines:
+            counts[state] = counts.get(state, 0) + 1
+        return ", ".join(str(counts[state]) + " " + STATES[state].lower() for state in sorted(counts, key=SEVERITY.index, reverse=True))
+
+    def getLongOutput(self):
+        lines = self.lines
+        rest = []
+        if self.maxLines and len(lines) > self.maxLines:
+            # worst first, the order of equal states is kept
+            lines = sorted(lines, key=lambda line: SEVERITY.index(line[0]), reverse=True)
+            lines, rest = lines[:self.maxLines], lines[self.maxLines:]
+        output = ["[" + STATES[state] + "] " + text for state, text in lines]
+        if rest:
+            output.append("... " + str(len(rest)) + " more (" + self.getCounts(rest) + ")")
+        return "\n".join(output)
+
+    def getPerfdata(self):
+        grouped = [entry for entry in self.perfdata if entry[7] is not None]
+        if not self.maxPerfdata or len(grouped) <= self.maxPerfdata:
+            return " ".join(formatPerfdata(*entry[:7]) for entry in self.perfdata)
+
+        perfdata = [formatPerfdata(*entry[:7]) for entry in self.perfdata if entry[7] is None]
+        groups = {}
+        for entry in grouped:
+            groups.setdefault(entry[7], []).append(entry)
+        for group, entries in groups.items():
+            values = [entry[1] for entry in entries]
+            # thresholds and range only if they are the same for all objects of the group
+            uom, warning, critical, minimum, maximum = [entries[0][index] if all(entry[index] == entries[0][index] for entry in entries) else "" for index in range(2, 7)]
+            perfdata.append(formatPerfdata(group + "_min", min(values), uom, warning, critical, minimum, maximum))
+            perfdata.append(formatPerfdata(group + "_max", max(values), uom, warning, critical, minimum, maximum))
+            perfdata.append(formatPerfdata(group + "_avg", sum(values) / len(values), uom, warning, critical, minimum, maximum))
+            perfdata.append(formatPerfdata(group + "_count", len(values)))
+        return " ".join(perfdata)
+
+    def render(self, summary):
+        message = summary
+        longOutput = self.getLongOutput()
+        if longOutput:
+            message += "\n\n" + longOutput + "\n"
+        if self.footer:
+            message += "\n" + "\n".join(self.footer) + "\n"
+        perfdata = self.getPerfdata()
+        if perfdata:
+            message += " | " + perfdata
+        return message
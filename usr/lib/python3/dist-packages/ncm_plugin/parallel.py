@@ -0,0 +1,22 @@
+###################################################
+#
+# Name: ncm_plugin/parallel.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Bounded worker pool of the plugins: one call per value, at most
+# "workers" of them at the same time. With one worker or one value
+# everything runs in the calling thread, without starting a pool.
+#
+###################################################
+
+def mapConcurrently(function, values, workers):
+    # results in the order of values, the first exception is raised
+    values = list(values)
+    if workers <= 1 or len(values) <= 1:
+        return [function(value) for value in values]
+
+    import concurrent.futures
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(workers, len(values))) as executor:
+        return list(executor.map(function, values))
@@ -0,0 +1,101 @@
+###################################################
+#
+# Name: ncm_plugin/passive.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Passive check results of the batch modes. A result is a dict with
+# host, service, state, output (including "| perfdata") and time; all
+# results of a run are written together:
+#
+#   --passive-file   PROCESS_SERVICE_CHECK_RESULT lines (file or command pipe)
+#   --passive-spool  one checkresult file per service (Nagios spool format,
+#                    Nagios/Naemon only, Icinga2 has no spool directory)
+#   --icinga-api     /v1/actions/process-check-result, one keep-alive session
+#
+###################################################
+
+import os
+
+def addArguments(parser, prefix="Batch run: "):
+    parser.add_argument('--passive-file', help=prefix + 'append results as external commands to this file or the icinga2 command pipe', dest='passivefile')
+    parser.add_argument('--passive-spool', help=prefix + 'write one checkresult file per service into this Nagios/Naemon check_result_path (not read by Icinga2, use --icinga-api there)', dest='passivespool')
+    parser.add_argument('--icinga-api', help=prefix + 'submit results to this Icinga2 API (e.g. https://localhost:5665)', dest='icingaapi')
+    parser.add_argument('--icinga-user', help=prefix + 'Icinga2 API user', dest='icingauser')
+    parser.add_argument('--icinga-password', help=prefix + 'Icinga2 API password', dest='icingapassword')
+    parser.add_argument('--icinga-ca', help=prefix + 'CA certificate to verify the Icinga2 API', dest='icingaca')
+
+def enabled(args):
+    return bool(args.passivefile or args.passivespool or args.icingaapi)
+
+def escapeOutput(message):
+    return message.strip().replace("\\", "\\\\").replace("\n", "\\n")
+
+def writeFile(filename, results):
+    # external command format, works for a plain file as well as the icinga2 command pipe
+    lines = []
+    for result in results:
+        lines.append("[" + str(int(result["time"])) + "] PROCESS_SERVICE_CHECK_RESULT;" + result["host"] + ";" + result["service"] + ";" + str(result["state"]) + ";" + escapeOutput(result["output"]) + "\n")
+    with open(filename, "a") as f:
+        f.write("".join(lines))
+
+def writeSpool(directory, results):
+    import hashlib
+    import tempfile
+
+    from datetime import datetime as dt
+
+    # one checkresult file per service in the classic Nagios spool format
+    os.makedirs(directory, exist_ok=True)
+    for result in results:
+        content = "### Nagios Service Check Result ###\n"
+        content += "# Time: " + dt.fromtimestamp(result["time"]).strftime("%a %b %d %H:%M:%S %Y") + "\n"
+        content += "host_name=" + result["host"] + "\n"
+        content += "service_description=" + result["service"] + "\n"
+        content += "check_type=1\n"
+        content += "scheduled_check=0\n"
+        content += "reschedule_check=0\n"
+        content += "latency=0\n"
+        content += "start_time=" + str(result["time"]) + "\n"
+        content += "finish_time=" + str(result["time"]) + "\n"
+        content += "early_timeout=0\n"
+        content += "exited_ok=1\n"
+        content += "return_code=" + str(result["state"]) + "\n"
+        content += "output=" + escapeOutput(result["output"]) + "\n"
+
+        fd, tmpfile = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        filename = "c" + hashlib.sha1((result["host"] + ";" + result["service"]).encode("utf-8")).hexdigest()[:12]
+        os.replace(tmpfile, os.path.join(directory, filename))
+        open(os.path.join(directory, filename + ".ok"), "w").close()
+
+def submitAPI(url, user, password, ca, results):
+    import requests
+
+    session = requests.Session()
+    session.auth = (user, password)
+    session.verify = ca if ca else False
+    session.headers["Accept"] = "application/json"
+    for result in results:
+        message, sep, perfdata = result["output"].partition("|")
+        payload = {
+            "type": "Service",
+            "filter": "host.name==\"" + result["host"] + "\" && service.name==\"" + result["service"] + "\"",
+            "exit_status": result["state"],
+            "plugin_output": message.strip(),
+            "check_source": os.uname().nodename,
+        }
+        if perfdata.strip():
+            payload["performance_data"] = perfdata.split()
+        response = session.post(url.rstrip("/") + "/v1/actions/process-check-result", json=payload, timeout=10)
+        response.raise_for_status()
+
+def submit(args, results):
+    # all targets given on the command line, exceptions are left to the plugin
+    if args.passivefile:
+        writeFile(args.passivefile, results)
+    if args.passivespool:
+        writeSpool(args.passivespool, results)
+    if args.icingaapi:
+        submitAPI(args.icingaapi, args.icingauser, args.icingapassword, args.icingaca, results)
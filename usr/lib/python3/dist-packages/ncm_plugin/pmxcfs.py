@@ -0,0 +1,141 @@
+###################################################
+#
+# Name: ncm_plugin/pmxcfs.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Cluster facts straight from the Proxmox cluster file system instead of
+# "sudo pvesh get": /etc/pve/.members (nodes, online state, IPs),
+# /etc/pve/.vmlist (guests with node and config version) and the
+# snapshot sections of the guest configs. The parsed snapshots are kept
+# in a small cache; a config is only read again when its version in
+# .vmlist changed or pmxcfs was restarted (starttime in .version).
+#
+# pmxcfs exposes these files as root:www-data 0640, the nagios user
+# needs to be in the www-data group.
+#
+###################################################
+
+import json
+import os
+
+PVE_DIR = "/etc/pve"
+CACHE_FILE = "/var/cache/ni-ncm-agent/pmxcfs.json"
+
+def available(directory=PVE_DIR):
+    return os.access(os.path.join(directory, ".members"), os.R_OK)
+
+def readJson(name, directory=PVE_DIR):
+    with open(os.path.join(directory, name), "r") as f:
+        return json.load(f)
+
+def getClusterStatus(directory=PVE_DIR):
+    # same entries as /cluster/status, None on a node without cluster
+    # (.members has no nodelist there, pvesh knows the IP)
+    members = readJson(".members", directory)
+    if not members.get("nodelist"):
+        return None
+    status = []
+    cluster = members.get("cluster")
+    if cluster:
+        status.append({
+            "type": "cluster",
+            "id": "cluster",
+            "name": cluster.get("name", ""),
+            "nodes": cluster.get("nodes", len(members["nodelist"])),
+            "quorate": cluster.get("quorate", 0),
+            "version": cluster.get("version", 0),
+        })
+    for name, node in sorted(members["nodelist"].items(), key=lambda item: item[1].get("id", 0)):
+        status.append({
+            "type": "node",
+            "id": "node/" + name,
+            "name": name,
+            "nodeid": node.get("id", 0),
+            "ip": node.get("ip", ""),
+            "online": node.get("online", 0),
+            "local": 1 if name == members.get("nodename") else 0,
+            "level": "",
+        })
+    return status
+
+def parseGuestConfig(content):
+    # snapshots of a qemu-server/lxc config like the snapshot endpoint,
+    # "current" first, [PENDING] and [special:...] are no snapshots
+    current = {"name": "current", "description": "You are here!"}
+    snapshots = []
+    section = current
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith("[") and line.endswith("]"):
+            name = line[1:-1]
+            section = {"name": name, "description": ""} if name != "PENDING" and not name.startswith("special:") else {}
+            if section:
+                snapshots.append(section)
+            continue
+        if not section or line.startswith("#") or ":" not in line:
+            continue
+        key, value = [part.strip() for part in line.split(":", 1)]
+        if key == "parent":
+            section["parent"] = value
+        elif key == "snaptime":
+            section["snaptime"] = int(value)
+        elif key == "vmstate":
+            section["vmstate"] = 1
+    return [current] + snapshots
+
+def getConfigPath(node, vmid, guestType="qemu", directory=PVE_DIR):
+    folder = "lxc" if guestType == "lxc" else "qemu-server"
+    return os.path.join(directory, "nodes", node, folder, str(vmid) + ".conf")
+
+def loadCache(filename):
+    try:
+        with open(filename, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def saveCache(filename, data):
+    import tempfile
+
+    try:
+        fd, tmpfile = tempfile.mkstemp(dir=os.path.dirname(filename) or ".", prefix=".tmp-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmpfile, filename)
+    except OSError:
+        pass
+
+def getSnapshots(node, vmids, directory=PVE_DIR, cacheFile=CACHE_FILE):
+    # list of snapshot lists in the order of vmids, only changed configs are read
+    cache = loadCache(cacheFile) if cacheFile else {}
+    starttime = readJson(".version", directory).get("starttime")
+    changed = cache.get("starttime") != starttime
+    if changed:
+        cache = {"starttime": starttime}
+    ids = readJson(".vmlist", directory).get("ids", {})
+    known = cache.setdefault("snapshots", {})
+    results = []
+    for vmid in vmids:
+        vmid = str(vmid)
+        guest = ids.get(vmid, {})
+        version = [guest.get("node", node), guest.get("version")]
+        entry = known.get(vmid)
+        if entry is None or entry["version"] != version or version[1] is None:
+            try:
+                with open(getConfigPath(version[0], vmid, guest.get("type", "qemu"), directory), "r") as f:
+                    snapshots = parseGuestConfig(f.read())
+            except FileNotFoundError:
+                # guest removed since the guest list was fetched
+                snapshots = [{"name": "current", "description": "You are here!"}]
+            entry = {"version": version, "data": snapshots}
+            known[vmid] = entry
+            changed = True
+        results.append(entry["data"])
+    if cacheFile and changed:
+        # forget guests that are gone
+        for vmid in list(known):
+            if vmid not in ids:
+                del known[vmid]
+        saveCache(cacheFile, cache)
+    return results
@@ -0,0 +1,142 @@
+###################################################
+#
+# Name: ncm_plugin/process.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Backend commands with a deadline. Every command runs in its own process
+# group; when the deadline passes, the group gets SIGTERM and after a
+# short grace period SIGKILL. sudo can not be killed by the nagios user
+# once its child runs as root, but it passes SIGTERM on to that child,
+# so a hung "sudo pvesh" ends as well and no check is left behind.
+# Output beyond a limit aborts the command instead of filling the memory.
+#
+###################################################
+
+import os
+import signal
+import subprocess
+import threading
+import time
+
+from ncm_plugin import timing
+
+# below the 60 seconds after which Icinga/Nagios kill the check themselves,
+# so the plugin can still report what hung
+TIMEOUT = 50
+GRACE = 2
+MAX_OUTPUT = 256 * 1024 * 1024
+
+defaults = {
+    "timeout": TIMEOUT,
+    "maxOutput": MAX_OUTPUT,
+}
+
+class CommandError(Exception):
+    def __init__(self, command, message):
+        super().__init__(" ".join(command) + ": " + message)
+        self.command = command
+
+class CommandTimeout(CommandError):
+    def __init__(self, command, timeout):
+        super().__init__(command, "no result after " + str(timeout) + " seconds")
+        self.timeout = timeout
+
+def setDefaults(timeout=None, maxOutput=None):
+    if timeout is not None:
+        defaults["timeout"] = timeout
+    if maxOutput is not None:
+        defaults["maxOutput"] = maxOutput
+
+def killGroup(process, grace=GRACE):
+    # SIGTERM first, sudo relays it to the command it started
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+        try:
+            process.wait(grace)
+            return
+        except subprocess.TimeoutExpired:
+            pass
+
+class Watchdog:
+    # kills the process group of a command once the deadline has passed
+    def __init__(self, process, timeout):
+        self.process = process
+        self.expired = False
+        self.timer = threading.Timer(timeout, self.expire)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def expire(self):
+        self.expired = True
+        killGroup(self.process)
+
+    def cancel(self):
+        self.timer.cancel()
+
+def getName(command):
+    # "sudo pvesh get /nodes" for the timing report
+    return " ".join(command[:4])
+
+def start(command, stdout=subprocess.PIPE):
+    try:
+        return subprocess.Popen(command, stdout=stdout, stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL, start_new_session=True)
+    except OSError as e:
+        # e.g. apcaccess or docker not installed
+        raise CommandError(command, e.strerror or str(e))
+
+def run(command, timeout=None, maxOutput=None):
+    # {"returncode": ..., "stdout": ...} like the replay fixtures
+    timeout = defaults["timeout"] if timeout is None else timeout
+    maxOutput = defaults["maxOutput"] if maxOutput is None else maxOutput
+    with timing.phase("exec " + getName(command)):
+        process = start(command)
+        watchdog = Watchdog(process, timeout)
+        chunks = []
+        size = 0
+        try:
+            # read while the command writes, a full pipe would block it forever
+            for chunk in iter(lambda: process.stdout.read(65536), b""):
+                size += len(chunk)
+                if size > maxOutput:
+                    killGroup(process)
+                    raise CommandError(command, "more than " + str(maxOutput) + " bytes of output")
+                chunks.append(chunk)
+            process.wait()
+        finally:
+            watchdog.cancel()
+            process.stdout.close()
+        if watchdog.expired:
+            raise CommandTimeout(command, timeout)
+        return {"returncode": process.returncode, "stdout": b"".join(chunks).decode("utf-8", "replace")}
+
+def stream(command, timeout=None):
+    # yields the output in text chunks while the command is running
+    import codecs
+
+    timeout = defaults["timeout"] if timeout is None else timeout
+    startTime = time.perf_counter()
+    process = start(command)
+    watchdog = Watchdog(process, timeout)
+    decoder = codecs.getincrementaldecoder("utf-8")("replace")
+    try:
+        # read1 returns what is there, read would wait for 64 KiB or the end
+        for chunk in iter(lambda: process.stdout.read1(65536), b""):
+            yield decoder.decode(chunk)
+        yield decoder.decode(b"", True)
+        process.wait()
+    finally:
+        watchdog.cancel()
+        if process.poll() is None:
+            # the consumer stopped early
+            killGroup(process)
+        process.stdout.close()
+        timing.add("stream " + getName(command), time.perf_counter() - startTime)
+    if watchdog.expired:
+        raise CommandTimeout(command, timeout)
+    if process.returncode != 0:
+        # the output so far is incomplete or an error message
+        raise CommandError(command, "exit code " + str(process.returncode))
@@ -0,0 +1,58 @@
+###################################################
+#
+# Name: ncm_plugin/ranges.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Threshold ranges as in the Nagios plugin guidelines, the range says
+# which values are fine, everything else raises an alert:
+#
+#   10      alert if < 0 or > 10
+#   10:     alert if < 10
+#   ~:10    alert if > 10
+#   10:20   alert if < 10 or > 20
+#   @10:20  alert if >= 10 and <= 20
+#
+###################################################
+
+from ncm_plugin import output
+
+class Range:
+    def __init__(self, text):
+        self.text = str(text).strip()
+        value = self.text
+        self.inside = value.startswith("@")
+        if self.inside:
+            value = value[1:]
+        start, sep, end = value.rpartition(":")
+        if not sep:
+            start = "0"
+        self.start = None if start == "~" else float(start or 0)
+        self.end = float(end) if end != "" else None
+        if self.start is not None and self.end is not None and self.start > self.end:
+            raise ValueError("Invalid range " + self.text + ": start is above end")
+
+    def alert(self, value):
+        outside = (self.start is not None and value < self.start) or (self.end is not None and value > self.end)
+        return not outside if self.inside else outside
+
+    def __str__(self):
+        return self.text
+
+def parseRange(text):
+    # None and "" are no threshold
+    if text is None or str(text).strip() == "":
+        return None
+    return Range(text)
+
+def getState(value, warning=None, critical=None):
+    # warning and critical as Range, text or None
+    if not isinstance(critical, Range):
+        critical = parseRange(critical)
+    if not isinstance(warning, Range):
+        warning = parseRange(warning)
+    if critical is not None and critical.alert(value):
+        return output.CRITICAL
+    if warning is not None and warning.alert(value):
+        return output.WARNING
+    return output.OK
@@ -0,0 +1,68 @@
+###################################################
+#
+# Name: ncm_plugin/replay.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Recorder/player for the backend calls of the plugins, keyed on argv.
+#
+#   NCM_RECORD=<dir>  run the commands and store their results in <dir>
+#   NCM_REPLAY=<dir>  answer every call from <dir>, nothing is executed
+#   NCM_REPLAY_LOG=<file>  append every replayed argv to <file>
+#
+# The local host name in argv is stored as "{hostname}", so fixtures
+# recorded on one node can be replayed everywhere.
+#
+###################################################
+
+import hashlib
+import json
+import os
+import re
+
+HOSTNAME = "{hostname}"
+
+def getRecordDir():
+    return os.environ.get("NCM_RECORD", "")
+
+def getReplayDir():
+    return os.environ.get("NCM_REPLAY", "")
+
+def active():
+    return bool(getReplayDir())
+
+def normalize(key):
+    # only whole path segments, "pve" must not turn "pvesh" into "{hostname}sh"
+    hostname = os.uname().nodename
+    names = sorted(set([hostname, hostname.split(".", 1)[0]]), key=len, reverse=True)
+    pattern = re.compile(r"(^|/)(?:" + "|".join(re.escape(name) for name in names) + r")(?=/|$)")
+    return [pattern.sub(lambda match: match.group(1) + HOSTNAME, part) for part in key]
+
+def getFixtureFile(directory, key):
+    return os.path.join(directory, hashlib.sha1(json.dumps(normalize(key)).encode("utf-8")).hexdigest() + ".json")
+
+def load(key):
+    filename = getFixtureFile(getReplayDir(), key)
+    if not os.path.exists(filename):
+        raise FileNotFoundError("No fixture for " + json.dumps(normalize(key)) + " in " + getReplayDir())
+    with open(filename, "r") as f:
+        result = json.load(f)["result"]
+    if os.environ.get("NCM_REPLAY_LOG"):
+        with open(os.environ["NCM_REPLAY_LOG"], "a") as f:
+            f.write(json.dumps(normalize(key)) + "\n")
+    return result
+
+def save(directory, key, result):
+    os.makedirs(directory, exist_ok=True)
+    with open(getFixtureFile(directory, key), "w") as f:
+        json.dump({"argv": normalize(key), "result": result}, f)
+
+def call(key, fetch):
+    # key is the argv of a command (or a source name like ["docker-containers"]),
+    # fetch() returns its JSON serializable result
+    if active():
+        return load(key)
+    result = fetch()
+    if getRecordDir():
+        save(getRecordDir(), key, result)
+    return result
@@ -0,0 +1,205 @@
+###################################################
+#
+# Name: ncm_plugin/scalelite.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Server status of a Scalelite cluster without "rake status" (which boots
+# the whole Rails app): the server list comes from the Scalelite Redis,
+# meetings, users, videos and version from the getMeetings API of every
+# online BBB server, queried in parallel with keep-alive connections.
+# The result has the fields of the rake status table; a server Scalelite
+# considers online whose API fails has status "degraded" and the reason
+# in "error".
+#
+###################################################
+
+import hashlib
+import socket
+import xml.etree.ElementTree as ElementTree
+
+from ncm_plugin import parallel
+
+REDIS_URL = "redis://127.0.0.1:6379/0"
+TIMEOUT = 5
+WORKERS = 8
+
+class RedisError(Exception):
+    pass
+
+def parseRedisUrl(url):
+    # redis://[:password@]host[:port][/db] or unix:///path/redis.sock[?db=n]
+    from urllib.parse import urlsplit, parse_qs
+
+    parts = urlsplit(url)
+    if parts.scheme == "unix":
+        db = int(parse_qs(parts.query).get("db", ["0"])[0])
+        return parts.path, None, db, parts.password
+    if parts.scheme != "redis":
+        raise ValueError("Unsupported redis url " + url)
+    db = int(parts.path.strip("/") or 0)
+    return parts.hostname or "127.0.0.1", parts.port or 6379, db, parts.password
+
+def encodeCommand(args):
+    data = [b"*" + str(len(args)).encode() + b"\r\n"]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode("utf-8")
+        data.append(b"$" + str(len(arg)).encode() + b"\r\n" + arg + b"\r\n")
+    return b"".join(data)
+
+def readReply(f):
+    line = f.readline()
+    if not line.endswith(b"\r\n"):
+        raise RedisError("Connection closed")
+    kind, value = line[:1], line[1:-2]
+    if kind == b"+":
+        return value.decode("utf-8")
+    if kind == b"-":
+        raise RedisError(value.decode("utf-8"))
+    if kind == b":":
+        return int(value)
+    if kind == b"$":
+        if int(value) < 0:
+            return None
+        data = f.read(int(value) + 2)
+        return data[:-2].decode("utf-8")
+    if kind == b"*":
+        if int(value) < 0:
+            return None
+        return [readReply(f) for i in range(int(value))]
+    raise RedisError("Invalid reply " + repr(line))
+
+class Redis:
+    # minimal RESP client, a pipeline sends all commands in one write
+    def __init__(self, url=REDIS_URL, timeout=TIMEOUT):
+        host, port, db, password = parseRedisUrl(url)
+        if port is None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(timeout)
+            self.socket.connect(host)
+        else:
+            self.socket = socket.create_connection((host, port), timeout)
+        self.file = self.socket.makefile("rb")
+        if password:
+            self.command("AUTH", password)
+        if db:
+            self.command("SELECT", db)
+
+    def pipeline(self, commands):
+        self.socket.sendall(b"".join(encodeCommand(args) for args in commands))
+        return [readReply(self.file) for args in commands]
+
+    def command(self, *args):
+        return self.pipeline([args])[0]
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+def getServers(url=REDIS_URL, timeout=TIMEOUT):
+    # servers as stored by Scalelite: set "servers", hash "server:<id>",
+    # load in the sorted sets "server_load" (enabled) and "cordoned_server_load"
+    redis = Redis(url, timeout)
+    try:
+        ids = sorted(redis.command("SMEMBERS", "servers"))
+        commands = []
+        for serverId in ids:
+            commands.append(("HGETALL", "server:" + serverId))
+            commands.append(("ZSCORE", "server_load", serverId))
+            commands.append(("ZSCORE", "cordoned_server_load", serverId))
+        replies = redis.pipeline(commands)
+    finally:
+        redis.close()
+
+    servers = []
+    for index, serverId in enumerate(ids):
+        fields, load, cordonedLoad = replies[index * 3:index * 3 + 3]
+        values = dict(zip(fields[0::2], fields[1::2]))
+        if not values:
+            continue
+        # "state" since Scalelite 1.1, older versions only know "enabled"
+        state = values.get("state") or ("enabled" if values.get("enabled") == "true" else "disabled")
+        if load is None:
+            load = cordonedLoad
+        servers.append({
+            "id": serverId,
+            "url": values.get("url", ""),
+            "secret": values.get("secret", ""),
+            "state": state,
+            "online": values.get("online") == "true",
+            "load": load if load is not None else values.get("load"),
+        })
+    return servers
+
+def getApiUrl(url, action, query, secret, algorithm="sha1"):
+    checksum = hashlib.new(algorithm, (action + query + secret).encode("utf-8")).hexdigest()
+    return url.rstrip("/") + "/" + action + "?" + (query + "&" if query else "") + "checksum=" + checksum
+
+def getMeetings(session, server, timeout=TIMEOUT, algorithm="sha1"):
+    # (meetings, users, largest meeting, videos) of one BBB server
+    response = session.get(getApiUrl(server["url"], "getMeetings", "", server["secret"], algorithm), timeout=timeout)
+    response.raise_for_status()
+    root = ElementTree.fromstring(response.content)
+    if root.findtext("returncode") != "SUCCESS":
+        raise RuntimeError("getMeetings of " + server["url"] + " failed: " + str(root.findtext("message")))
+    meetings = root.findall("meetings/meeting")
+    users = [int(meeting.findtext("participantCount") or 0) for meeting in meetings]
+    videos = sum(int(meeting.findtext("videoCount") or 0) for meeting in meetings)
+    return len(meetings), sum(users), max(users or [0]), videos
+
+def getVersion(session, server, timeout=TIMEOUT):
+    # API root, "bbbVersion" since BBB 2.6, otherwise only the API version
+    response = session.get(server["url"].rstrip("/"), timeout=timeout)
+    response.raise_for_status()
+    root = ElementTree.fromstring(response.content)
+    return root.findtext("bbbVersion") or root.findtext("version") or "n/a"
+
+def getHostname(url):
+    from urllib.parse import urlsplit
+
+    return (urlsplit(url).hostname or url).split(".")[0]
+
+def getSession(servers, workers=WORKERS, verify=True):
+    import requests
+
+    session = requests.Session()
+    # one pool per BBB server, so both requests of a server share the connection
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max(len(servers), 1), pool_maxsize=max(workers, 1))
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if verify is False:
+        session.verify = False
+        requests.packages.urllib3.disable_warnings()
+    elif verify is not True:
+        session.verify = verify
+    return session
+
+def getServerStatus(session, server, timeout=TIMEOUT, algorithm="sha1"):
+    status = {
+        "hostname": getHostname(server["url"]),
+        "state": server["state"],
+        "status": "online" if server["online"] else "offline",
+        "meetings": "0",
+        "users": "0",
+        "largestmeeting": "0",
+        "videos": "0",
+        "load": str(server["load"] if server["load"] is not None else 0),
+        "version": "n/a",
+    }
+    if not server["online"]:
+        return status
+    try:
+        meetings, users, largest, videos = getMeetings(session, server, timeout, algorithm)
+        status["meetings"], status["users"], status["largestmeeting"], status["videos"] = str(meetings), str(users), str(largest), str(videos)
+        status["version"] = getVersion(session, server, timeout)
+    except Exception as e:
+        # Scalelite still sends meetings there, the zero counts are not real
+        status["status"] = "degraded"
+        status["error"] = type(e).__name__ + ": " + str(e)
+    return status
+
+def getStatus(url=REDIS_URL, timeout=TIMEOUT, workers=WORKERS, verify=True, algorithm="sha1"):
+    servers = getServers(url, timeout)
+    session = getSession(servers, workers, verify)
+    return parallel.mapConcurrently(lambda server: getServerStatus(session, server, timeout, algorithm), servers, workers)
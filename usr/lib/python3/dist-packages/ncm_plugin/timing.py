@@ -0,0 +1,59 @@
+###################################################
+#
+# Name: ncm_plugin/timing.py
+# Date: 18.10.2026
+# Author: lukas.spitznagel@netzint.de
+#
+# Per-phase timing of a plugin run. Backend commands are recorded by
+# ncm_plugin.process, plugins mark their own phases with
+#
+#   with timing.phase("evaluate"):
+#       ...
+#
+# With NCM_TIMING=1 the phases are written to stderr when the plugin ends,
+# the check output itself stays untouched.
+#
+###################################################
+
+import contextlib
+import os
+import sys
+import time
+
+STARTED = time.perf_counter()
+
+# (name, seconds), appended from several threads in concurrent fetches
+phases = []
+
+def enabled():
+    return os.environ.get("NCM_TIMING", "") not in ("", "0")
+
+recording = enabled()
+
+def add(name, seconds):
+    # nothing is kept without NCM_TIMING, the collector daemon runs for weeks
+    if recording:
+        phases.append((name, seconds))
+
+@contextlib.contextmanager
+def phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add(name, time.perf_counter() - start)
+
+def getReport():
+    lines = ["%8.1f ms  %s" % (seconds * 1000, name) for name, seconds in phases]
+    lines.append("%8.1f ms  total since import of ncm_plugin.timing" % ((time.perf_counter() - STARTED) * 1000))
+    return "\n".join(lines)
+
+def printReport():
+    print(getReport(), file=sys.stderr)
+
+def install():
+    # called once by every plugin, prints the report at exit if requested
+    if enabled():
+        import atexit
+
+        atexit.register(printReport)